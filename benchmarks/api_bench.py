@@ -0,0 +1,350 @@
+"""
+Сценарный бенчмарк API: поиск, постраничный список, выдача и возврат книги.
+Результат — JSON с p50/p95/p99 и пропускной способностью по сценариям,
+его удобно хранить рядом с релизом и сравнивать.
+
+    python manage.py seed_catalog --authors 100k --books 2M --borrows 5M
+    python benchmarks/api_bench.py run --serve -u admin -p admin -o before.json
+    python benchmarks/api_bench.py run --base-url http://localhost:8000 \\
+        -u admin -p admin -c 16 -d 30 -o after.json
+    python benchmarks/api_bench.py compare before.json after.json
+
+``--serve`` поднимает Django test server (WSGI, поток на запрос) на текущих
+настройках и базе; лимиты запросов для него отключаются. Против внешнего
+сервера поднимите ``THROTTLE_STAFF`` — иначе сценарии упрутся в 429.
+Пользователь (``-u``) должен быть staff: выдачу оформляет персонал.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import queue
+import re
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from http_load import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ("search", "list", "borrow")
+
+
+class Client:
+    """HTTP/1.1 keep-alive клиент одного потока, тело — JSON."""
+
+    def __init__(self, base_url, token=None):
+        parts = urlsplit(base_url)
+        cls = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.conn = cls(parts.netloc, timeout=30)
+        self.prefix = parts.path.rstrip("/")
+        self.headers = {"Accept": "application/json"}
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+
+    def request(self, method, path, body=None):
+        """-> (status, json | None, секунды)."""
+        if path.startswith("http"):
+            parts = urlsplit(path)
+            path = parts.path + (f"?{parts.query}" if parts.query else "")
+        else:
+            path = self.prefix + path
+        headers = dict(self.headers)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        started = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            raw = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            return 0, None, time.perf_counter() - started
+        elapsed = time.perf_counter() - started
+        try:
+            data = json.loads(raw) if raw else None
+        except ValueError:
+            data = None
+        return response.status, data, elapsed
+
+    def close(self):
+        self.conn.close()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, latencies, errors):
+        with self.lock:
+            self.latencies.setdefault(name, []).extend(latencies)
+            self.errors[name] = self.errors.get(name, 0) + errors
+
+    def summary(self, name, elapsed):
+        values = sorted(v * 1000 for v in self.latencies.get(name, []))
+        result = {
+            "requests": len(values),
+            "errors": self.errors.get(name, 0),
+            "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        }
+        if values:
+            result["latency_ms"] = {
+                "mean": round(statistics.fmean(values), 2),
+                "p50": round(percentile(values, 50), 2),
+                "p95": round(percentile(values, 95), 2),
+                "p99": round(percentile(values, 99), 2),
+                "max": round(values[-1], 2),
+            }
+        return result
+
+
+def login(base_url, username, password):
+    status, data, _ = Client(base_url).request(
+        "POST",
+        "/api/auth/jwt/create/",
+        {"username": username, "password": password},
+    )
+    if status != 200:
+        sys.exit(f"Не удалось войти как {username!r}: HTTP {status}")
+    return data["access"]
+
+
+def collect(client, path, field, limit):
+    """Значения ``field`` со страниц списка (по ссылкам ``next``)."""
+    values = []
+    while path and len(values) < limit:
+        status, data, _ = client.request("GET", path)
+        if status != 200:
+            sys.exit(f"GET {path}: HTTP {status}")
+        values += [row[field] for row in data["results"]]
+        path = data.get("next")
+    return values[:limit]
+
+
+def search_terms(client, limit=30):
+    titles = collect(client, "/api/books/?fields=title&page_size=100", "title", 500)
+    words = {w.lower() for t in titles for w in re.findall(r"\w{4,}", t)}
+    if not words:
+        sys.exit("Каталог пуст — сначала manage.py seed_catalog")
+    return sorted(words)[:limit]
+
+
+def run_phase(concurrency, duration, work):
+    """``work(deadline, index)`` в ``concurrency`` потоках; -> секунды."""
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=work, args=(deadline, i)) for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started
+
+
+def bench_search(args, token, recorder):
+    terms = search_terms(Client(args.base_url, token))
+
+    def work(deadline, index):
+        client, latencies, errors = Client(args.base_url, token), [], 0
+        i = index
+        while time.perf_counter() < deadline:
+            term = terms[i % len(terms)]
+            i += 1
+            status, _, elapsed = client.request(
+                "GET", f"/api/books/?{urlencode({'q': term})}"
+            )
+            if status == 200:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+        client.close()
+        recorder.add("search", latencies, errors)
+
+    return {"search": run_phase(args.concurrency, args.duration, work)}
+
+
+def bench_list(args, token, recorder):
+    first = f"/api/books/?page_size={args.page_size}"
+
+    def work(deadline, index):
+        client, latencies, errors = Client(args.base_url, token), [], 0
+        path, depth = first, 0
+        while time.perf_counter() < deadline:
+            status, data, elapsed = client.request("GET", path)
+            if status != 200:
+                errors += 1
+                path, depth = first, 0
+                continue
+            latencies.append(elapsed)
+            # листаем вглубь по курсору, затем снова с первой страницы
+            depth += 1
+            path = data.get("next") if depth < args.pages else None
+            if not path:
+                path, depth = first, 0
+        client.close()
+        recorder.add("list", latencies, errors)
+
+    return {"list": run_phase(args.concurrency, args.duration, work)}
+
+
+def bench_borrow(args, token, recorder):
+    # свой набор свободных книг на каждый поток — без конфликтов 409
+    free = queue.Queue()
+    path = "/api/books/?available=true&fields=id&page_size=100"
+    client = Client(args.base_url, token)
+    for book_id in collect(client, path, "id", args.concurrency * 4):
+        free.put(book_id)
+    if free.empty():
+        sys.exit("Нет свободных книг для сценария borrow")
+    due_at = (datetime.now(timezone.utc) + timedelta(days=14)).isoformat()
+
+    def work(deadline, index):
+        client = Client(args.base_url, token)
+        created, returned, errors = [], [], {"borrow_create": 0, "borrow_return": 0}
+        while time.perf_counter() < deadline:
+            book_id = free.get()
+            try:
+                status, data, elapsed = client.request(
+                    "POST", "/api/borrows/", {"book": book_id, "due_at": due_at}
+                )
+                if status != 201:
+                    errors["borrow_create"] += 1
+                    continue
+                created.append(elapsed)
+                status, _, elapsed = client.request(
+                    "POST", f"/api/borrows/{data['id']}/return_book/"
+                )
+                if status != 200:
+                    errors["borrow_return"] += 1
+                    continue
+                returned.append(elapsed)
+            finally:
+                free.put(book_id)
+        client.close()
+        recorder.add("borrow_create", created, errors["borrow_create"])
+        recorder.add("borrow_return", returned, errors["borrow_return"])
+
+    elapsed = run_phase(args.concurrency, args.duration, work)
+    return {"borrow_create": elapsed, "borrow_return": elapsed}
+
+
+PHASES = {"search": bench_search, "list": bench_list, "borrow": bench_borrow}
+
+
+def serve():
+    """Django test server в фоновом потоке; -> base URL."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    for scope in ("ANON", "USER", "STAFF", "LOGIN"):
+        os.environ.setdefault(f"THROTTLE_{scope}", "1000000/min")
+    sys.path.insert(0, str(ROOT))
+
+    import django
+
+    django.setup()
+
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+    httpd.set_app(get_wsgi_application())
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{httpd.server_port}"
+
+
+def cmd_run(args):
+    if args.serve:
+        args.base_url = serve()
+    token = login(args.base_url, args.username, args.password)
+    recorder, elapsed = Recorder(), {}
+    for name in args.scenarios:
+        print(f"{name}: {args.concurrency} потоков, {args.duration} с", file=sys.stderr)
+        elapsed.update(PHASES[name](args, token, recorder))
+
+    result = {
+        "meta": {
+            "base_url": args.base_url,
+            "served": args.serve,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+        },
+        "scenarios": {name: recorder.summary(name, t) for name, t in elapsed.items()},
+    }
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    print(output)
+
+
+def cmd_compare(args):
+    old = json.loads(Path(args.old).read_text(encoding="utf-8"))["scenarios"]
+    new = json.loads(Path(args.new).read_text(encoding="utf-8"))["scenarios"]
+    print(f"{'scenario':<16}{'metric':<16}{'old':>10}{'new':>10}{'change':>9}")
+    for name in sorted(old.keys() & new.keys()):
+        rows = [("throughput_rps", old[name], new[name])]
+        rows += [
+            (metric, old[name].get("latency_ms", {}), new[name].get("latency_ms", {}))
+            for metric in ("p50", "p95", "p99")
+        ]
+        for metric, a, b in rows:
+            if metric not in a or metric not in b:
+                continue
+            change = (b[metric] - a[metric]) / a[metric] * 100 if a[metric] else 0.0
+            print(
+                f"{name:<16}{metric:<16}{a[metric]:>10.1f}{b[metric]:>10.1f}"
+                f"{change:>+8.1f}%"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="прогнать сценарии")
+    target = run.add_mutually_exclusive_group(required=True)
+    target.add_argument("--base-url")
+    target.add_argument("--serve", action="store_true")
+    run.add_argument("-u", "--username", required=True)
+    run.add_argument("-p", "--password", required=True)
+    run.add_argument("-c", "--concurrency", type=int, default=8)
+    run.add_argument("-d", "--duration", type=float, default=10.0)
+    run.add_argument("--page-size", type=int, default=20)
+    run.add_argument("--pages", type=int, default=5, help="глубина листания")
+    run.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    run.add_argument("-o", "--output", help="куда записать JSON")
+    run.set_defaults(handler=cmd_run)
+
+    compare = commands.add_parser("compare", help="сравнить два JSON-результата")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.set_defaults(handler=cmd_compare)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
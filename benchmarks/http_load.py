@@ -0,0 +1,108 @@
+"""
+Простой HTTP load test без зависимостей: N потоков с keep-alive
+бьют в один или несколько URL заданное время, в конце — RPS и перцентили.
+
+    python benchmarks/http_load.py http://localhost:8000/api/books/ \\
+        -c 32 -d 30 --header "Authorization: Bearer <token>"
+
+Сравнение профилей (одна и та же БД и данные):
+
+    DJANGO_SERVER=runserver docker compose up web   # как было
+    DJANGO_SERVER=wsgi docker compose up web        # gunicorn + gthread
+    DJANGO_SERVER=asgi docker compose up web        # gunicorn + uvicorn
+"""
+
+import argparse
+import http.client
+import itertools
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def worker(urls, headers, deadline, latencies, errors, lock):
+    connections = {}
+    local_latencies = []
+    local_errors = 0
+    for url in itertools.cycle(urls):
+        if time.perf_counter() >= deadline:
+            break
+        parts = urlsplit(url)
+        conn = connections.get(parts.netloc)
+        if conn is None:
+            cls = (
+                http.client.HTTPSConnection
+                if parts.scheme == "https"
+                else http.client.HTTPConnection
+            )
+            conn = connections[parts.netloc] = cls(parts.netloc, timeout=30)
+        target = parts.path + (f"?{parts.query}" if parts.query else "")
+        started = time.perf_counter()
+        try:
+            conn.request("GET", target, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                local_errors += 1
+        except (OSError, http.client.HTTPException):
+            local_errors += 1
+            conn.close()
+            connections.pop(parts.netloc, None)
+            continue
+        local_latencies.append(time.perf_counter() - started)
+    for conn in connections.values():
+        conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        errors[0] += local_errors
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    parser.add_argument("--header", action="append", default=[])
+    args = parser.parse_args()
+
+    headers = {"Accept": "application/json"}
+    for raw in args.header:
+        name, _, value = raw.partition(":")
+        headers[name.strip()] = value.strip()
+
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(
+            target=worker, args=(args.urls, headers, deadline, latencies, errors, lock)
+        )
+        for _ in range(args.concurrency)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    print(f"requests:   {len(latencies)} ({errors[0]} errors) in {elapsed:.1f}s")
+    print(f"throughput: {len(latencies) / elapsed:.1f} req/s")
+    if ms:
+        print(
+            f"latency ms: mean {statistics.fmean(ms):.1f}  "
+            f"p50 {percentile(ms, 50):.1f}  p95 {percentile(ms, 95):.1f}  "
+            f"p99 {percentile(ms, 99):.1f}  max {ms[-1]:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
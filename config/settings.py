@@ -1,3 +1,4 @@
+import copy
 import os
 from datetime import timedelta
 from pathlib import Path
@@ -20,12 +21,15 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "drf_spectacular",
     "library",
 ]
 
 MIDDLEWARE = [
+    # первым — чтобы общее время и SQL покрывали все остальные слои
+    "library.middleware.perf_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -33,6 +37,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "library.middleware.ratelimit_headers_middleware",
+    "library.middleware.replica_pin_middleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -63,9 +69,95 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "library_pass"),
         "HOST": os.getenv("POSTGRES_HOST", "localhost"),
         "PORT": os.getenv("POSTGRES_PORT", "5432"),
+        # постоянные соединения: не открываем новое на каждый запрос,
+        # перед переиспользованием проверяем, что оно живо
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Пул соединений psycopg 3 (pip install "psycopg[binary,pool]"); нужен под
+# ASGI, где постоянные соединения по потокам не переиспользуются.
+if os.getenv("DB_POOL", "0") == "1":
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            "timeout": int(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }
+    }
+
+# Реплики только для чтения: DB_REPLICA_HOSTS=host1,host2:5433 — алиасы
+# replica_1, replica_2 с остальными параметрами основной БД. Читают с них
+# каталог, статистика и выгрузки (library/replicas.py); после записи клиент
+# DB_PIN_SECONDS секунд читает с основной.
+DATABASE_REPLICAS = []
+for number, address in enumerate(
+    filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), start=1
+):
+    host, _, port = address.strip().partition(":")
+    alias = f"replica_{number}"
+    DATABASES[alias] = copy.deepcopy(DATABASES["default"])
+    DATABASES[alias].update(HOST=host, PORT=port or DATABASES["default"]["PORT"])
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["library.replicas.ReplicaRouter"]
+DB_PIN_SECONDS = int(os.getenv("DB_PIN_SECONDS", "5"))
+
+
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Async list/retrieve авторов и книг (имеет смысл под ASGI, см. gunicorn.conf.py)
+ASYNC_CATALOG_READS = os.getenv("ASYNC_CATALOG_READS", "0") == "1"
+
+# Откуда брать доступность книги: "subquery" (по Borrow) или "pointer"
+# (денормализованный Book.active_borrow — O(1) на больших объёмах)
+AVAILABILITY_SOURCE = os.getenv("AVAILABILITY_SOURCE", "subquery")
+
+# Куда отправлять напоминания о просрочке (manage.py scan_overdue)
+OVERDUE_NOTIFIER = os.getenv("OVERDUE_NOTIFIER", "library.notifiers.ConsoleNotifier")
+
+# Сколько хранить ответы по Idempotency-Key (повторы выдачи/возврата)
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24")))
+
+# Сколько часов книга ждёт читателя, подошедшего по очереди брони
+RESERVATION_HOLD_HOURS = int(os.getenv("RESERVATION_HOLD_HOURS", "72"))
+
+# Лента /api/changes/: предел long polling (?wait=) и шаг опроса журнала, сек
+CHANGES_MAX_WAIT = int(os.getenv("CHANGES_MAX_WAIT", "30"))
+CHANGES_POLL_INTERVAL = float(os.getenv("CHANGES_POLL_INTERVAL", "0.5"))
+
+# Поток доступности /api/books/stream/: чем процессы сообщают друг другу о
+# выдачах — library.live.PostgresBroker (LISTEN/NOTIFY), RedisBroker или
+# InMemoryBroker (один процесс); ping раз в N секунд
+AVAILABILITY_BROKER = os.getenv("AVAILABILITY_BROKER", "library.live.PostgresBroker")
+AVAILABILITY_REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+AVAILABILITY_STREAM_HEARTBEAT = int(os.getenv("AVAILABILITY_STREAM_HEARTBEAT", "15"))
+
+# Фоновые задачи (manage.py run_worker): аренда задачи, база и потолок
+# экспоненциальной паузы между повторами, сек; TASKS_EAGER=1 — выполнять
+# сразу в запросе, без воркера
+TASKS_EAGER = os.getenv("TASKS_EAGER", "0") == "1"
+TASKS_LEASE_SECONDS = int(os.getenv("TASKS_LEASE_SECONDS", "300"))
+TASKS_RETRY_BASE = int(os.getenv("TASKS_RETRY_BASE", "10"))
+TASKS_RETRY_MAX = int(os.getenv("TASKS_RETRY_MAX", "3600"))
+
+# Кэш ответов каталога (книги/авторы)
+CATALOG_CACHE_ALIAS = "default"
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", "300"))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -100,20 +192,44 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "library.authentication.ClaimsJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "library.pagination.KeysetPagination",
     "PAGE_SIZE": 5,
     "DEFAULT_FILTER_BACKENDS": [
         "rest_framework.filters.SearchFilter",
         "rest_framework.filters.OrderingFilter",
     ],
+    # token bucket в общем кэше (library/throttling.py)
+    "DEFAULT_THROTTLE_CLASSES": [
+        "library.throttling.RoleRateThrottle",
+        "library.throttling.EndpointRateThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": os.getenv("THROTTLE_ANON", "120/min"),
+        "user": os.getenv("THROTTLE_USER", "600/min"),
+        "staff": os.getenv("THROTTLE_STAFF", "3000/min"),
+        # дорогие эндпоинты (хэширование пароля) — отдельно и строже
+        "login": os.getenv("THROTTLE_LOGIN", "10/min"),
+        "register": os.getenv("THROTTLE_REGISTER", "5/hour"),
+    },
 }
 
+# Кэш для бакетов лимитов: с Redis лимиты общие для всех воркеров
+THROTTLE_CACHE_ALIAS = "default"
+
+# Замеры запросов: Server-Timing, /metrics и бюджет SQL (library/perf.py)
+PERF_INSTRUMENTATION = os.getenv("PERF_INSTRUMENTATION", "1") == "1"
+PERF_SERVER_TIMING = os.getenv("PERF_SERVER_TIMING", "1") == "1"
+# больше SQL на запрос — предупреждение в лог library.perf (0 — без проверки)
+PERF_QUERY_BUDGET = int(os.getenv("PERF_QUERY_BUDGET", "20"))
+# пусто — /metrics открыт (закрывайте на прокси)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Library API",
     "DESCRIPTION": "API для управления библиотекой",
@@ -128,4 +244,12 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(
         days=int(os.getenv("SIMPLEJWT_REFRESH_LIFETIME_DAYS", "30"))
     ),
+    # claims username / is_staff / ver — см. library/authentication.py
+    "TOKEN_OBTAIN_SERIALIZER": "library.serializers.TokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "library.serializers.TokenRefreshSerializer",
 }
+
+# Сколько секунд процесс доверяет закэшированной версии токенов пользователя:
+# столько максимум действует отозванный токен. 0 — проверять каждый запрос.
+AUTH_TOKEN_VERSION_TTL = int(os.getenv("AUTH_TOKEN_VERSION_TTL", "30"))
+AUTH_TOKEN_VERSION_CACHE_SIZE = 10_000
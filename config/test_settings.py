@@ -1,7 +1,33 @@
+import os
+
 from .settings import *  # noqa: F401,F403
 
-# Тесты гоняем на SQLite (в памяти)
-DATABASES["default"] = {  # noqa: F405
-    "ENGINE": "django.db.backends.sqlite3",
-    "NAME": ":memory:",
+# Тесты гоняем на SQLite (в памяти).
+# DJANGO_TEST_POSTGRES=1 — на PostgreSQL из settings (тесты конкурентности,
+# полнотекстовый поиск): docker compose up db
+if os.getenv("DJANGO_TEST_POSTGRES") != "1":
+    DATABASES["default"] = {  # noqa: F405
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+    }
+
+# Вторая БД под видом реплики (tests/test_replicas.py); отдельная, а не
+# зеркало — видно, откуда прочитаны данные. Маршрутизация на неё включается
+# только в тех тестах (DATABASE_REPLICAS), остальные читают default.
+DATABASES["replica"] = dict(DATABASES["default"])  # noqa: F405
+if os.getenv("DJANGO_TEST_POSTGRES") == "1":
+    DATABASES["replica"]["TEST"] = {"NAME": "test_library_replica"}  # noqa: F405
+DATABASE_REPLICAS = []
+
+# Кэш — в памяти процесса, без Redis
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
 }
+
+# Поток доступности — через память процесса
+AVAILABILITY_BROKER = "library.live.InMemoryBroker"
+
+# Фоновые задачи выполняются сразу, без воркера
+TASKS_EAGER = True
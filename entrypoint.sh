@@ -0,0 +1,15 @@
+#!/bin/sh
+# Запуск контейнера: миграции, затем сервер по DJANGO_SERVER
+# (wsgi | asgi — gunicorn, см. gunicorn.conf.py; runserver — для разработки).
+set -e
+
+python manage.py migrate --noinput
+
+if [ -n "$DJANGO_SUPERUSER_USERNAME" ]; then
+    python manage.py createsuperuser --noinput || true
+fi
+
+if [ "${DJANGO_SERVER:-wsgi}" = "runserver" ]; then
+    exec python manage.py runserver 0.0.0.0:8000
+fi
+exec gunicorn -c gunicorn.conf.py
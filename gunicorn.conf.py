@@ -0,0 +1,41 @@
+"""
+Продакшен-конфигурация gunicorn: ``gunicorn -c gunicorn.conf.py``.
+
+Режим выбирается переменной DJANGO_SERVER:
+- ``wsgi`` (по умолчанию) — gthread-воркеры, ``config.wsgi``, постоянные
+  соединения (CONN_MAX_AGE) на поток;
+- ``asgi`` — uvicorn-воркеры, ``config.asgi``, async-чтение каталога и пул
+  соединений psycopg 3. Имеет смысл при медленной БД и большом числе
+  одновременных соединений; на быстрых ответах из кэша gthread быстрее —
+  сравнивайте на своих данных (benchmarks/http_load.py).
+"""
+
+import multiprocessing
+import os
+
+mode = os.getenv("DJANGO_SERVER", "wsgi")
+cpus = multiprocessing.cpu_count()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = timeout
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# периодический перезапуск воркера — страховка от утечек памяти
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+
+if mode == "asgi":
+    wsgi_app = "config.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    workers = int(os.getenv("WEB_CONCURRENCY", cpus + 1))
+    # воркеры наследуют окружение мастера
+    os.environ.setdefault("ASYNC_CATALOG_READS", "1")
+    os.environ.setdefault("DB_POOL", "1")
+elif mode == "wsgi":
+    wsgi_app = "config.wsgi:application"
+    worker_class = "gthread"
+    workers = int(os.getenv("WEB_CONCURRENCY", cpus * 2 + 1))
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
+else:
+    raise RuntimeError(f"DJANGO_SERVER={mode!r}: ожидается asgi или wsgi")
@@ -1,6 +1,7 @@
 from django.contrib import admin
+from django.utils import timezone
 
-from .models import Author, Book, Borrow
+from .models import Author, Book, Borrow, Task
 
 
 @admin.register(Author)
@@ -21,3 +22,14 @@ class BorrowAdmin(admin.ModelAdmin):
     list_display = ("book", "user", "borrowed_at", "due_at", "returned_at")
     list_filter = ("returned_at",)
     search_fields = ("book__title", "user__username")
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "attempts", "run_after", "created_at")
+    list_filter = ("status", "name")
+    actions = ["retry"]
+
+    @admin.action(description="Повторить выбранные задачи")
+    def retry(self, request, queryset):
+        queryset.update(status=Task.Status.QUEUED, attempts=0, run_after=timezone.now())
@@ -0,0 +1,175 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import path
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+
+from .cache import aget_generations, conditional_response, get_cache, make_entry
+from .live import MAX_STREAM_BOOKS, availability_events
+from .replicas import replica_reads
+from .views import AuthorViewSet, BookViewSet
+
+LIST_ACTIONS = {"get": "list", "post": "create"}
+DETAIL_ACTIONS = {
+    "get": "retrieve",
+    "put": "update",
+    "patch": "partial_update",
+    "delete": "destroy",
+}
+
+
+class AsyncCatalogReadView(View):
+    """
+    Async GET для list/retrieve каталога (под ASGI).
+
+    Читает тем же fast-path (``FastReader``) и тем же кэшем, что и ViewSet,
+    но запросы идут через async ORM и async API кэша. Аутентификация и
+    права — синхронные ``initial()`` ViewSet'а в потоке. Записи, HTML
+    (browsable API) и любые ошибки отдаются самому ViewSet'у, поэтому
+    ответы совпадают с синхронным путём.
+    """
+
+    viewset_class = None
+    actions = None
+    basename = None
+    detail = False
+    sync_view = None
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # тот же ViewSet, что зарегистрировал бы роутер, — для записей и ошибок
+        initkwargs["sync_view"] = initkwargs["viewset_class"].as_view(
+            initkwargs["actions"],
+            basename=initkwargs["basename"],
+            detail=initkwargs.get("detail", cls.detail),
+        )
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def fallback(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    post = put = patch = delete = options = fallback
+
+    def make_viewset(self, request, *args, **kwargs):
+        view = self.viewset_class(basename=self.basename, detail=self.detail)
+        view.action_map = self.actions
+        view.args, view.kwargs = args, kwargs
+        view.request = view.initialize_request(request, *args, **kwargs)
+        view.headers = view.default_response_headers
+        return view
+
+    async def get(self, request, *args, **kwargs):
+        view = self.make_viewset(request, *args, **kwargs)
+        drf_request = view.request
+        try:
+            await sync_to_async(view.initial)(drf_request, *args, **kwargs)
+            if not isinstance(drf_request.accepted_renderer, JSONRenderer):
+                return await self.fallback(request, *args, **kwargs)
+            # initial() выбрал реплику в потоке — его контекст сюда не вернётся
+            with replica_reads(view.read_alias):
+                entry = await self.cached_entry(view)
+        except APIException:
+            return await self.fallback(request, *args, **kwargs)
+
+        renderer = drf_request.accepted_renderer
+        content = renderer.render(
+            entry["data"],
+            drf_request.accepted_media_type,
+            {"request": drf_request, "view": view},
+        )
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        response = HttpResponse(content, content_type=content_type)
+        for name, value in view.headers.items():
+            response[name] = value
+        return conditional_response(request, entry, response)
+
+    async def cached_entry(self, view):
+        generations = await aget_generations(view.cache_models)
+        key = view.get_cache_key(view.request, generations)
+        cache = get_cache()
+        entry = await cache.aget(key)
+        if entry is None:
+            entry = make_entry(await self.read(view))
+            timeout = await sync_to_async(view.get_cache_timeout)()
+            await cache.aset(key, entry, timeout)
+        return entry
+
+    async def read(self, view):
+        reader = view.get_fast_reader()
+        if view.action == "retrieve":
+            lookup = view.lookup_url_kwarg or view.lookup_field
+            queryset = view.filter_queryset(view.get_queryset())
+            row = (
+                await queryset.filter(**{view.lookup_field: view.kwargs[lookup]})
+                .values(*reader.paths)
+                .afirst()
+            )
+            if row is None:
+                raise NotFound()
+            return reader.to_representation(row)
+
+        rows = view.get_fast_rows(reader)
+        paginator = view.paginator
+        if paginator is None:
+            return [reader.to_representation(row) async for row in rows]
+        page = await paginator.apaginate_queryset(rows, view.request, view=view)
+        data = [reader.to_representation(row) for row in page]
+        return paginator.get_paginated_response(data).data
+
+
+def catalog_urlpatterns():
+    """Маршруты list/detail авторов и книг на async-представления."""
+    urls = []
+    for prefix, viewset, basename in (
+        ("authors", AuthorViewSet, "author"),
+        ("books", BookViewSet, "book"),
+    ):
+        for route, actions, detail, suffix in (
+            (f"{prefix}/", LIST_ACTIONS, False, "list"),
+            (f"{prefix}/<int:pk>/", DETAIL_ACTIONS, True, "detail"),
+        ):
+            view = AsyncCatalogReadView.as_view(
+                viewset_class=viewset, actions=actions, detail=detail, basename=basename
+            )
+            urls.append(path(route, view, name=f"{basename}-{suffix}"))
+    return urls
+
+
+@require_GET
+async def availability_stream(request):
+    """
+    GET /api/books/stream/?books=1,2,3 — Server-Sent Events с доступностью
+    книг (см. live.py): событие ``availability`` с ``available_copies``,
+    ``is_available`` и ``current_due_at`` сразу и при каждой выдаче/возврате.
+    Каталог публичный, как и GET /api/books/{id}/.
+    """
+    parts = [p.strip() for p in request.GET.get("books", "").split(",") if p.strip()]
+    book_ids = {int(p) for p in parts if p.isdigit()}
+    if not book_ids or len(book_ids) != len(set(parts)):
+        return JsonResponse(
+            {"books": [f"Id книг через запятую, до {MAX_STREAM_BOOKS}."]}, status=400
+        )
+    if len(book_ids) > MAX_STREAM_BOOKS:
+        return JsonResponse(
+            {"books": [f"Не больше {MAX_STREAM_BOOKS} книг на поток."]}, status=400
+        )
+    if not isinstance(request, ASGIRequest):
+        # под WSGI бесконечный поток занял бы поток воркера целиком
+        return JsonResponse(
+            {"detail": "Поток доступен только под ASGI (DJANGO_SERVER=asgi)."},
+            status=501,
+        )
+    response = StreamingHttpResponse(
+        availability_events(book_ids), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # nginx: не буферизовать поток
+    response["X-Accel-Buffering"] = "no"
+    return response
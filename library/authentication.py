@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import TokenVersion
+
+# Claims, которые кладём в токен при выдаче (см. serializers.TokenObtainPairSerializer)
+VERSION_CLAIM = "ver"
+USER_CLAIMS = ("username", "is_staff")
+
+
+class TokenVersionCache:
+    """
+    LRU версий токенов в памяти процесса с коротким TTL.
+
+    Отзыв (новая версия в БД) другой процесс увидит не позже чем через
+    ``AUTH_TOKEN_VERSION_TTL`` секунд; этот же процесс — сразу (``forget``).
+    """
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        # в токене user_id — строка, в forget() приходит pk модели
+        user_id = str(user_id)
+        with self._lock:
+            item = self._data.get(user_id)
+            if item is None:
+                return None
+            version, expires = item
+            if expires <= time.monotonic():
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            return version
+
+    def set(self, user_id, version):
+        ttl = settings.AUTH_TOKEN_VERSION_TTL
+        if ttl <= 0:
+            return
+        user_id = str(user_id)
+        with self._lock:
+            self._data[user_id] = (version, time.monotonic() + ttl)
+            self._data.move_to_end(user_id)
+            while len(self._data) > settings.AUTH_TOKEN_VERSION_CACHE_SIZE:
+                self._data.popitem(last=False)
+
+    def forget(self, user_id):
+        with self._lock:
+            self._data.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+token_versions = TokenVersionCache()
+
+
+def load_token_version(user_id):
+    """
+    Текущая версия токенов из БД; ``None`` — пользователя нет.
+    Деактивированный пользователь тоже даёт ``None``.
+    """
+    User = get_user_model()
+    rows = list(
+        User.objects.filter(pk=user_id, is_active=True).values_list(
+            "token_version__version", flat=True
+        )[:1]
+    )
+    if not rows:
+        return None
+    return rows[0] or 0
+
+
+def get_token_version(user_id):
+    version = token_versions.get(user_id)
+    if version is None:
+        version = load_token_version(user_id)
+        if version is not None:
+            token_versions.set(user_id, version)
+    return version
+
+
+def revoke_tokens(user_id):
+    """Отзывает все выданные пользователю JWT (access и refresh)."""
+    updated = TokenVersion.objects.filter(user_id=user_id).update(
+        version=F("version") + 1
+    )
+    if not updated:
+        TokenVersion.objects.get_or_create(user_id=user_id, defaults={"version": 1})
+    token_versions.forget(user_id)
+
+
+def user_from_claims(validated_token):
+    """
+    ``User`` без запроса к БД: id, username и is_staff из подписанного
+    токена, остальные поля отложены (загрузятся при первом обращении).
+    """
+    User = get_user_model()
+    # simplejwt кладёт user_id строкой — приводим к типу pk
+    user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+    return User.from_db(
+        router.db_for_read(User),
+        ["id", "username", "is_staff", "is_active"],
+        [
+            user_id,
+            validated_token["username"],
+            validated_token["is_staff"],
+            True,
+        ],
+    )
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT без SELECT пользователя на каждый запрос.
+
+    Пользователь строится из claims токена; проверяется только версия
+    (``ver``) по LRU-кэшу процесса, в БД идём раз в
+    ``AUTH_TOKEN_VERSION_TTL`` на пользователя. Смена пароля, прав или
+    деактивация увеличивают версию (см. ``signals.py``) — старые токены
+    отклоняются. Токены без ``ver`` (выданные до этой схемы) проверяются
+    как раньше, через БД.
+    """
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token or any(
+            claim not in validated_token for claim in USER_CLAIMS
+        ):
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken("Токен не содержит идентификатор пользователя") from exc
+
+        version = get_token_version(user_id)
+        if version is None:
+            raise AuthenticationFailed(
+                "Пользователь не найден или неактивен", code="user_inactive"
+            )
+        if validated_token[VERSION_CLAIM] != version:
+            raise AuthenticationFailed("Токен отозван", code="token_revoked")
+        return user_from_claims(validated_token)
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def generation_key(model):
+    return f"catalog:gen:{model._meta.label_lower}"
+
+
+def written_key(model):
+    return f"catalog:written:{model._meta.label_lower}"
+
+
+def recently_written(models):
+    """Была ли запись в модели за последние ``DB_PIN_SECONDS`` (см. replicas.py)."""
+    if not models or not settings.DATABASE_REPLICAS:
+        return False
+    return bool(get_cache().get_many([written_key(m) for m in models]))
+
+
+def _initial_generation():
+    # Счётчик стартует со времени, а не с 1: если ключ вытеснят из Redis,
+    # старые записи с прежним поколением не «оживут».
+    return int(time.time() * 1000)
+
+
+def get_generations(models):
+    cache = get_cache()
+    keys = [generation_key(m) for m in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_generation(), timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+async def aget_generations(models):
+    """``get_generations`` для async-представлений."""
+    cache = get_cache()
+    keys = [generation_key(m) for m in models]
+    found = await cache.aget_many(keys)
+    for key in keys:
+        if key not in found:
+            await cache.aadd(key, _initial_generation(), timeout=None)
+            found[key] = await cache.aget(key)
+    return [found[key] for key in keys]
+
+
+def make_entry(data):
+    """Запись кэша: данные ответа + ETag + время формирования."""
+    body = json.dumps(data, sort_keys=True, default=str)
+    return {
+        "data": data,
+        "etag": hashlib.md5(body.encode()).hexdigest(),
+        "last_modified": int(time.time()),
+    }
+
+
+def conditional_response(request, entry, response):
+    """ETag / Last-Modified из записи кэша; 304, если клиент уже видел её."""
+    etag = "W/" + quote_etag(entry["etag"])
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(entry["last_modified"])
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=entry["last_modified"],
+        response=response,
+    )
+
+
+def bump_generation(*models):
+    """Инвалидирует все закэшированные ответы, зависящие от моделей."""
+    cache = get_cache()
+    if settings.DATABASE_REPLICAS:
+        # до нового поколения: ответ под ним должен читаться с основной БД,
+        # пока реплики не догнали запись
+        cache.set_many({written_key(m): 1 for m in models}, settings.DB_PIN_SECONDS)
+    for model in models:
+        key = generation_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, _initial_generation(), timeout=None):
+                cache.incr(key)
+
+
+class CachedReadMixin:
+    """
+    Кэш list/retrieve для ViewSet'ов каталога.
+
+    Ключ: basename + action + поколения ``cache_models`` + нормализованный
+    URL (query-параметры отсортированы). Запись на любую из моделей
+    увеличивает её поколение (см. ``signals.py``), старые ключи просто
+    перестают читаться и истекают по TTL. В ответ добавляются ETag и
+    Last-Modified, условные запросы получают 304.
+    """
+
+    cache_models = ()
+
+    def get_cache_timeout(self):
+        return settings.CATALOG_CACHE_TIMEOUT
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_read(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_read(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_key(self, request, generations=None):
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        )
+        raw = f"{request.get_host()}{request.path}?{urlencode(params)}"
+        digest = hashlib.sha1(raw.encode()).hexdigest()
+        if generations is None:
+            generations = get_generations(self.cache_models)
+        generations = ".".join(str(g) for g in generations)
+        return f"catalog:resp:{self.basename}:{self.action}:{generations}:{digest}"
+
+    def cached_read(self, handler, request, *args, **kwargs):
+        cache = get_cache()
+        key = self.get_cache_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = make_entry(response.data)
+            cache.set(key, entry, self.get_cache_timeout())
+        return conditional_response(request, entry, Response(entry["data"]))
@@ -0,0 +1,85 @@
+"""
+Лента изменений ``/api/changes/`` поверх журнала ChangeEvent.
+
+Курсор — строка ``"<txid>.<id>"``, события идут по ``(txid, id)``.
+Порядок ``id`` сам по себе не годится: транзакция, взявшая id раньше,
+может зафиксироваться позже, и потребитель, ушедший курсором вперёд,
+её событие пропустил бы. Поэтому на PostgreSQL лента отдаёт только
+события транзакций с ``txid`` ниже горизонта снимка
+(``pg_snapshot_xmin``): все они уже завершены, а любые будущие события
+получат ``txid`` не меньше горизонта, то есть лягут после курсора.
+Цена — задержка ленты на время самой долгой открытой транзакции.
+На SQLite писатель один, txid всегда 0 и курсор сводится к id.
+"""
+
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import ChangeEvent
+
+START = "0.0"
+LATEST = "latest"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(event):
+    return f"{event.txid}.{event.pk}"
+
+
+def decode_cursor(raw):
+    """``"txid.id"`` -> (txid, id); ``InvalidCursor`` на мусор."""
+    txid, dot, pk = raw.partition(".")
+    if not dot or not txid.isdigit() or not pk.isdigit():
+        raise InvalidCursor(raw)
+    return int(txid), int(pk)
+
+
+def visible_events():
+    """События завершённых транзакций (см. docstring модуля)."""
+    events = ChangeEvent.objects.all()
+    if connection.vendor == "postgresql":
+        horizon = RawSQL("pg_snapshot_xmin(pg_current_snapshot())::text::bigint", [])
+        events = events.filter(txid__lt=horizon)
+    return events
+
+
+def latest_cursor():
+    """Курсор последнего видимого события: подписка «с этого момента»."""
+    last = visible_events().only("pk", "txid").order_by("-txid", "-id").first()
+    return encode_cursor(last) if last else START
+
+
+def read_changes(since, limit, entity=None):
+    """
+    События после курсора ``since`` по индексу ``(txid, id)``
+    -> (события, курсор следующего запроса, есть ли ещё).
+    """
+    txid, pk = decode_cursor(since)
+    events = visible_events().filter(Q(txid__gt=txid) | Q(txid=txid, id__gt=pk))
+    if entity:
+        events = events.filter(entity=entity)
+    page = list(events.order_by("txid", "id")[: limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    return page, encode_cursor(page[-1]) if page else since, has_more
+
+
+def wait_for_changes(since, limit, entity=None, timeout=0):
+    """
+    Long polling: ``read_changes``, а пока пусто — повторять раз в
+    ``CHANGES_POLL_INTERVAL`` секунд, но не дольше ``timeout``.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        page, cursor, has_more = read_changes(since, limit, entity)
+        left = deadline - time.monotonic()
+        if page or left <= 0:
+            return page, cursor, has_more
+        time.sleep(min(settings.CHANGES_POLL_INTERVAL, left))
@@ -0,0 +1,47 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Конфликт с текущим состоянием ресурса."
+    default_code = "conflict"
+
+
+class BookUnavailable(Conflict):
+    default_detail = "Свободных экземпляров нет (все выданы)."
+    default_code = "book_unavailable"
+
+
+class BookOnHold(Conflict):
+    default_detail = "Книга отложена для другого читателя по брони."
+    default_code = "book_on_hold"
+
+
+class AlreadyReserved(Conflict):
+    default_detail = "У вас уже есть бронь на эту книгу."
+    default_code = "already_reserved"
+
+
+class BatchRejected(Conflict):
+    """Пакет в режиме ``atomic`` отклонён целиком; в ``items`` — причины."""
+
+    default_detail = "Пакет отклонён целиком: ничего не сохранено."
+    default_code = "batch_rejected"
+
+    def __init__(self, items):
+        super().__init__()
+        # как есть, без приведения чисел к строкам ErrorDetail
+        self.detail = {"detail": str(self.detail), "items": items}
+
+
+class AlreadyReturned(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Книга уже возвращена."
+    default_code = "already_returned"
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "Idempotency-Key уже использован с другим запросом."
+    default_code = "idempotency_key_reused"
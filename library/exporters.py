@@ -0,0 +1,120 @@
+import csv
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Book
+
+FORMATS = ("csv", "jsonl", "ndjson")
+
+# Колонки совпадают с форматом import_catalog — выгрузку можно загрузить обратно
+COLUMNS = [
+    ("id", "id"),
+    ("book_id", "book_id"),
+    ("title", "title"),
+    ("author_first_name", "author__first_name"),
+    ("author_last_name", "author__last_name"),
+    ("author_birth_year", "author__birth_year"),
+    ("published_year", "published_year"),
+    ("pages", "pages"),
+    ("genre", "genre"),
+    ("description", "description"),
+    ("updated_at", "updated_at"),
+]
+HEADER = [name for name, _ in COLUMNS]
+
+
+def parse_updated_since(value):
+    """ISO-дата или дата-время; наивное время считается в TIME_ZONE."""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError("Ожидается дата в формате ISO 8601.")
+        moment = timezone.datetime(day.year, day.month, day.day)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_rows(updated_since=None, chunk_size=2000, using=None):
+    """
+    Кортежи книг (``values_list``, без модельных объектов) по возрастанию id.
+    ``.iterator()`` на PostgreSQL читает через server-side cursor, так что
+    память не зависит от размера каталога.
+    """
+    qs = Book.objects.all()
+    if using:
+        qs = qs.using(using)
+    if updated_since is not None:
+        # смена имени автора тоже меняет выгружаемую строку
+        qs = qs.filter(
+            Q(updated_at__gte=updated_since) | Q(author__updated_at__gte=updated_since)
+        )
+    return (
+        qs.order_by("id")
+        .values_list(*(path for _, path in COLUMNS))
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _dump(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(rows, lines_per_chunk=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for n, row in enumerate(rows, start=1):
+        writer.writerow([_dump(v) for v in row])
+        if n % lines_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_jsonl(rows, lines_per_chunk=500):
+    lines = []
+    for row in rows:
+        record = dict(zip(HEADER, (_dump(v) for v in row)))
+        lines.append(json.dumps(record, ensure_ascii=False))
+        if len(lines) >= lines_per_chunk:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def iter_export(fmt, rows):
+    if fmt == "csv":
+        return iter_csv(rows)
+    if fmt in ("jsonl", "ndjson"):
+        return iter_jsonl(rows)
+    raise ValueError(f"Неизвестный формат: {fmt}")
+
+
+async def aiter_export(fmt, rows):
+    """
+    ``iter_export`` для ASGI. Синхронный итератор Django под ASGI сначала
+    собирает целиком (``sync_to_async(list)``), поэтому куски тянем из
+    курсора по одному — в памяти не больше куска.
+    """
+    chunks = iter_export(fmt, rows)
+    # thread_sensitive: курсор живёт в соединении одного потока
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # клиент отключился — закрываем генератор и серверный курсор
+        await sync_to_async(chunks.close)()
@@ -0,0 +1,114 @@
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField
+from rest_framework.response import Response
+
+# Поля, у которых to_representation для значений из БД — тождество
+PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField)
+
+
+class FastReader:
+    """
+    Чтение по описанию ModelSerializer без его полевой машинерии.
+
+    Колонки берутся из ``serializer.fields`` один раз; строки читаются
+    через ``.values()`` ровно этих колонок, dict собирается напрямую.
+    Нетривиальные поля (даты и т.п.) по-прежнему форматирует сам
+    DRF-field, поэтому JSON совпадает с обычным сериализатором.
+    Вложенный ModelSerializer (``?expand=``) читается через JOIN
+    в том же запросе.
+    """
+
+    def __init__(self, serializer, prefix=""):
+        if isinstance(serializer, type):
+            serializer = serializer()
+        self.columns = []
+        self.paths = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = prefix + "__".join(field.source_attrs)
+            if isinstance(field, serializers.ModelSerializer):
+                nested = FastReader(field, prefix=f"{source}__")
+                # NULL-связь — по FK id родителя
+                path = f"{source}__pk" if "__" in source else f"{source}_id"
+                self.columns.append((name, path, nested.to_representation, True))
+                self.paths += [path, *nested.paths]
+                continue
+            path = self._path(field, source)
+            self.columns.append((name, path, self._converter(field), False))
+            self.paths.append(path)
+        self.paths = list(dict.fromkeys(self.paths))
+
+    @staticmethod
+    def _path(field, source):
+        if isinstance(field, (serializers.BaseSerializer, ManyRelatedField)) or (
+            isinstance(field, serializers.SerializerMethodField) or field.source == "*"
+        ):
+            raise TypeError(f"Поле {field.field_name!r} не поддерживается fast-path")
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            if field.pk_field is not None:
+                raise TypeError(f"pk_field у {field.field_name!r} не поддерживается")
+            return f"{source}__pk" if "__" in source else f"{source}_id"
+        return source
+
+    @staticmethod
+    def _converter(field):
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            return None
+        if type(field) in PASSTHROUGH_FIELDS:
+            return None
+        return field.to_representation
+
+    def to_representation(self, row):
+        result = {}
+        for name, path, convert, whole_row in self.columns:
+            value = row[path]
+            if value is not None and convert is not None:
+                value = convert(row if whole_row else value)
+            result[name] = value
+        return result
+
+
+class FastListMixin:
+    """
+    Включает fast-path для ``list``: ``fast_read = True`` во ViewSet.
+    Остальные действия идут через обычный сериализатор.
+    """
+
+    fast_read = False
+    _fast_readers = {}
+
+    def get_fast_reader(self):
+        # набор полей может зависеть от запроса (?fields=, ?expand=)
+        serializer = self.get_serializer()
+        key = (
+            type(serializer),
+            tuple((name, type(f)) for name, f in serializer.fields.items()),
+        )
+        reader = self._fast_readers.get(key)
+        if reader is None:
+            reader = self._fast_readers[key] = FastReader(serializer)
+        return reader
+
+    def get_fast_rows(self, reader):
+        """``.values()``-queryset для ``list`` (ещё не выполненный)."""
+        queryset = self.filter_queryset(self.get_queryset())
+        # значения полей сортировки нужны keyset-пагинатору для курсора
+        extra = []
+        if self.paginator is not None and hasattr(self.paginator, "get_ordering"):
+            extra = [name for name, _ in self.paginator.get_ordering(queryset)]
+        return queryset.values(*dict.fromkeys(reader.paths + extra))
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_read:
+            return super().list(request, *args, **kwargs)
+
+        reader = self.get_fast_reader()
+        rows = self.get_fast_rows(reader)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.represent_rows(reader, page))
+        return Response(self.represent_rows(reader, rows))
+
+    def represent_rows(self, reader, rows):
+        return [reader.to_representation(row) for row in rows]
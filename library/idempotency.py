@@ -0,0 +1,77 @@
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .exceptions import IdempotencyKeyReused
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+
+
+def request_fingerprint(request):
+    data = request.data
+    if hasattr(data, "lists"):  # QueryDict (form/multipart)
+        data = dict(data.lists())
+    raw = json.dumps(
+        [request.method, request.get_full_path(), data], sort_keys=True, default=str
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def idempotent(handler):
+    """
+    Декоратор метода ViewSet: повтор запроса с тем же ``Idempotency-Key``
+    (в пределах ``IDEMPOTENCY_KEY_TTL``) получает сохранённый ответ,
+    а не выполняется ещё раз.
+
+    Ключ вставляется в начале транзакции операции: параллельный дубль
+    ждёт на уникальном индексе, пока первый не закоммитится, и затем
+    отдаёт его ответ. Ошибки (исключения, 5xx) откатывают и ключ —
+    такой запрос можно повторить.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return handler(self, request, *args, **kwargs)
+
+        fingerprint = request_fingerprint(request)
+        with transaction.atomic():
+            expired = timezone.now() - settings.IDEMPOTENCY_KEY_TTL
+            IdempotencyKey.objects.filter(
+                user=request.user, key=key, created_at__lt=expired
+            ).delete()
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=request.user,
+                        key=key[:255],
+                        fingerprint=fingerprint,
+                        status_code=0,
+                    )
+            except IntegrityError:
+                record = IdempotencyKey.objects.get(user=request.user, key=key[:255])
+                if record.fingerprint != fingerprint:
+                    raise IdempotencyKeyReused()
+                return Response(
+                    record.response,
+                    status=record.status_code,
+                    headers={"Idempotent-Replayed": "true"},
+                )
+
+            response = handler(self, request, *args, **kwargs)
+            if response.status_code >= 500:
+                transaction.set_rollback(True)
+                return response
+            record.status_code = response.status_code
+            record.response = response.data
+            record.save(update_fields=["status_code", "response"])
+        return response
+
+    return wrapper
@@ -0,0 +1,336 @@
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from .cache import bump_generation
+from .models import Author, Book, ChangeEvent, Copy
+
+FORMATS = ("csv", "jsonl")
+
+AUTHOR_FIELDS = {
+    "author_first_name": "first_name",
+    "author_last_name": "last_name",
+    "author_birth_year": "birth_year",
+}
+UPSERT_FIELDS = [
+    "title",
+    "author",
+    "published_year",
+    "pages",
+    "genre",
+    "description",
+    "updated_at",
+]
+
+
+class RowError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def detect_format(name="", content_type=""):
+    name, content_type = (name or "").lower(), (content_type or "").lower()
+    if name.endswith(".csv") or "csv" in content_type:
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")) or any(
+        t in content_type for t in ("ndjson", "jsonl", "jsonlines")
+    ):
+        return "jsonl"
+    return None
+
+
+def iter_rows(stream, fmt):
+    """
+    Построчно читает CSV/JSON Lines из бинарного или текстового потока.
+    Отдаёт ``(номер строки, dict | RowError)`` — файл целиком в память
+    не загружается.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+    if not isinstance(stream.read(0), str):
+        stream = codecs.getreader("utf-8-sig")(stream)
+
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_no, RowError({"non_field_errors": "Некорректный JSON."})
+            continue
+        if not isinstance(row, dict):
+            yield line_no, RowError({"non_field_errors": "Ожидался JSON-объект."})
+            continue
+        author = row.pop("author", None)
+        if isinstance(author, dict):
+            for key, field in AUTHOR_FIELDS.items():
+                row.setdefault(key, author.get(field))
+        yield line_no, row
+
+
+def _text(row, key, errors, required=False):
+    value = row.get(key)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        errors[key] = "Обязательное поле."
+    return value
+
+
+def _int(row, key, errors, low=None, high=None, message=""):
+    value = row.get(key)
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        value = int(str(value).strip())
+    except ValueError:
+        errors[key] = "Ожидается целое число."
+        return None
+    if (low is not None and value < low) or (high is not None and value > high):
+        errors[key] = message
+    return value
+
+
+def clean_row(row):
+    """Те же правила, что в BookSerializer/AuthorSerializer, без DRF-полей."""
+    errors = {}
+    year = timezone.now().year
+    book = {
+        "title": _text(row, "title", errors, required=True),
+        "book_id": _text(row, "book_id", errors, required=True),
+        "genre": _text(row, "genre", errors),
+        "description": _text(row, "description", errors),
+        "published_year": _int(
+            row,
+            "published_year",
+            errors,
+            1400,
+            year + 1,
+            "Год публикации вне допустимого диапазона.",
+        ),
+        "pages": _int(
+            row, "pages", errors, 1, None, "Количество страниц должно быть > 0."
+        ),
+    }
+    author = (
+        _text(row, "author_first_name", errors, required=True),
+        _text(row, "author_last_name", errors, required=True),
+        _int(
+            row,
+            "author_birth_year",
+            errors,
+            1000,
+            year,
+            "Год рождения вне допустимого диапазона.",
+        ),
+    )
+    if len(book["title"]) > 255:
+        errors["title"] = "Не более 255 символов."
+    if len(book["book_id"]) > 50:
+        errors["book_id"] = "Не более 50 символов."
+    if errors:
+        raise RowError(errors)
+    return book, author
+
+
+class CatalogImporter:
+    """
+    Потоковый upsert каталога пачками.
+
+    Авторы ищутся/создаются по ``(first_name, last_name, birth_year)``
+    (как в ``unique_together``) одним запросом на пачку, книги
+    upsert'ятся по ``book_id`` через ``bulk_create(update_conflicts=True)``.
+    Ошибочные строки попадают в отчёт, остальная пачка сохраняется.
+    """
+
+    def __init__(self, batch_size=1000, max_errors=1000, author_cache_size=50_000):
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.author_cache_size = author_cache_size
+        self._authors = {}
+        self.report = {
+            "processed": 0,
+            "upserted": 0,
+            "authors_created": 0,
+            "errors": [],
+            "errors_truncated": 0,
+        }
+
+    def run(self, rows):
+        rows = iter(rows)
+        try:
+            while batch := list(islice(rows, self.batch_size)):
+                self.process_batch(batch)
+        finally:
+            if self.report["upserted"] or self.report["authors_created"]:
+                # bulk-операции не шлют сигналы — сбрасываем кэш каталога сами
+                bump_generation(Book, Author)
+        return self.report
+
+    def add_error(self, line, row, errors):
+        if len(self.report["errors"]) >= self.max_errors:
+            self.report["errors_truncated"] += 1
+            return
+        book_id = row.get("book_id") if isinstance(row, dict) else None
+        self.report["errors"].append(
+            {"line": line, "book_id": book_id, "errors": errors}
+        )
+
+    def process_batch(self, batch):
+        cleaned = {}
+        for line, row in batch:
+            self.report["processed"] += 1
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                book, author = clean_row(row)
+            except RowError as exc:
+                self.add_error(line, row, exc.errors)
+                continue
+            # повтор book_id внутри пачки: побеждает последняя строка
+            cleaned[book["book_id"]] = (line, book, author)
+        if not cleaned:
+            return
+
+        items = list(cleaned.values())
+        try:
+            self._commit(items)
+        except DatabaseError:
+            # изолируем проблемные строки, остальные сохраняем
+            for item in items:
+                try:
+                    self._commit([item])
+                except DatabaseError as exc:
+                    self.add_error(
+                        item[0], item[1], {"non_field_errors": str(exc).strip()}
+                    )
+
+    def _commit(self, items):
+        # счётчики и кэш авторов обновляем только после успешного коммита:
+        # при откате id созданных авторов недействительны
+        with transaction.atomic():
+            author_ids, created = self._resolve_authors(
+                {author for _, _, author in items}
+            )
+            Book.objects.bulk_create(
+                [
+                    Book(author_id=author_ids[author], **book)
+                    for _, book, author in items
+                ],
+                update_conflicts=True,
+                unique_fields=["book_id"],
+                update_fields=UPSERT_FIELDS,
+            )
+            # bulk_create не шлёт post_save и не пишет журнал: новым книгам
+            # (ещё без экземпляров) — первый экземпляр, всем — событие
+            pks, new_books = {}, set()
+            for book_id, pk, has_copy in (
+                Book.objects.filter(
+                    book_id__in=[book["book_id"] for _, book, _ in items]
+                )
+                .annotate(has_copy=Exists(Copy.objects.filter(book=OuterRef("pk"))))
+                .order_by()
+                .values_list("book_id", "pk", "has_copy")
+            ):
+                pks[book_id] = pk
+                if not has_copy:
+                    new_books.add(book_id)
+            Copy.objects.bulk_create(
+                [Copy(book_id=pks[book_id], barcode=book_id) for book_id in new_books]
+            )
+            ChangeEvent.objects.bulk_create(
+                [
+                    ChangeEvent.of(
+                        Book(pk=pks[book["book_id"]], author_id=author_ids[a], **book),
+                        (
+                            ChangeEvent.Action.CREATED
+                            if book["book_id"] in new_books
+                            else ChangeEvent.Action.UPDATED
+                        ),
+                    )
+                    for _, book, a in items
+                ]
+            )
+        self.report["upserted"] += len(items)
+        self.report["authors_created"] += created
+        if len(self._authors) > self.author_cache_size:
+            self._authors.clear()
+        self._authors.update(author_ids)
+
+    def _resolve_authors(self, keys):
+        result = {key: self._authors[key] for key in keys if key in self._authors}
+        created = 0
+        missing = keys - result.keys()
+        if missing:
+            result.update(self._fetch_authors(missing))
+            new = missing - result.keys()
+            if new:
+                new_ids = self._insert_authors(new)
+                created = len(new_ids)
+                # остальных между SELECT и INSERT вставил параллельный импорт:
+                # они не наши — ни в счётчик, ни в журнал
+                result.update(self._fetch_authors(new - new_ids.keys()))
+                ChangeEvent.objects.bulk_create(
+                    [
+                        ChangeEvent.of(
+                            Author(pk=pk, first_name=f, last_name=ln, birth_year=y),
+                            ChangeEvent.Action.CREATED,
+                        )
+                        for (f, ln, y), pk in new_ids.items()
+                    ]
+                )
+                result.update(new_ids)
+        return result, created
+
+    @staticmethod
+    def _insert_authors(keys):
+        """
+        ``INSERT ... ON CONFLICT DO NOTHING RETURNING``: id только реально
+        вставленных авторов. Публичный ``bulk_create(ignore_conflicts=True)``
+        строк не возвращает, поэтому — его же ``_insert``.
+        """
+        opts = Author._meta
+        fields = [f for f in opts.local_concrete_fields if not f.primary_key]
+        returning = [opts.pk] + [
+            opts.get_field(name) for name in ("first_name", "last_name", "birth_year")
+        ]
+        objs = [Author(first_name=f, last_name=ln, birth_year=y) for f, ln, y in keys]
+        # пачками, как bulk_create: у SQLite предел параметров в запросе
+        size = connection.ops.bulk_batch_size(fields, objs) or len(objs)
+        rows = []
+        for start in range(0, len(objs), size):
+            rows += Author.objects._insert(
+                objs[start : start + size],
+                fields=fields,
+                returning_fields=returning,
+                on_conflict=OnConflict.IGNORE,
+            )
+        return {tuple(key): pk for pk, *key in rows}
+
+    @staticmethod
+    def _fetch_authors(keys):
+        # IN по фамилиям/именам (индекс по last_name), точное совпадение
+        # тройки — уже в Python: длинный OR из тысяч условий SQLite не осилит
+        rows = Author.objects.filter(
+            last_name__in={key[1] for key in keys},
+            first_name__in={key[0] for key in keys},
+        ).values_list("id", "first_name", "last_name", "birth_year")
+        found = {}
+        for pk, *key in rows:
+            key = tuple(key)
+            if key in keys:
+                found.setdefault(key, pk)
+        return found
@@ -0,0 +1,292 @@
+"""
+Живая доступность книг для экранов-киосков (Server-Sent Events).
+
+Выдача и возврат после коммита публикуют id книг в брокер
+(``AVAILABILITY_BROKER``): PostgreSQL LISTEN/NOTIFY, Redis pub/sub или
+память процесса (тесты, один воркер). В каждом ASGI-воркере одна задача
+``Hub`` слушает брокер, одним запросом читает состояние изменившихся книг,
+на которые кто-то подписан, и раскладывает его подписчикам. Открытый поток
+— это корутина со словарём ожидающих изменений, без своего потока и без
+соединения с БД, поэтому простаивающих клиентов на воркер могут быть тысячи.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, transaction
+from django.utils.module_loading import import_string
+
+from .models import Book
+
+logger = logging.getLogger("library.live")
+
+CHANNEL = "book_availability"
+MAX_STREAM_BOOKS = 100
+# через сколько переподключаться к брокеру и подсказка клиенту (retry:)
+RECONNECT_DELAY = 1
+RETRY_MS = 3000
+
+_brokers = {}
+
+
+def get_broker(path=None):
+    """Брокер по dotted path (по умолчанию ``AVAILABILITY_BROKER``), один на процесс."""
+    path = path or settings.AVAILABILITY_BROKER
+    if path not in _brokers:
+        _brokers[path] = import_string(path)()
+    return _brokers[path]
+
+
+def publish_availability(book_ids):
+    """
+    После коммита текущей транзакции сообщает подписчикам, что доступность
+    книг изменилась. Сбой брокера выдачу не ломает — только пишется в лог.
+    """
+    ids = sorted(set(book_ids))
+    if ids:
+        transaction.on_commit(lambda: get_broker().publish(ids), robust=True)
+
+
+def _encode(book_ids):
+    return ",".join(map(str, book_ids))
+
+
+def _decode(payload):
+    return [int(part) for part in payload.split(",") if part.isdigit()]
+
+
+class BaseBroker:
+    """
+    Транспорт уведомлений между процессами: ``publish(book_ids)``
+    вызывается из синхронного кода выдачи, ``listen()`` — асинхронный
+    итератор списков id для ``Hub``.
+    """
+
+    def publish(self, book_ids):
+        raise NotImplementedError
+
+    def listen(self):
+        raise NotImplementedError
+
+
+class InMemoryBroker(BaseBroker):
+    """В пределах одного процесса: тесты и runserver."""
+
+    def __init__(self):
+        self._listeners = set()
+        self._lock = threading.Lock()
+
+    def publish(self, book_ids):
+        with self._lock:
+            listeners = list(self._listeners)
+        for loop, queue in listeners:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, list(book_ids))
+            except RuntimeError:
+                # цикл событий уже закрыт
+                with self._lock:
+                    self._listeners.discard((loop, queue))
+
+    async def listen(self):
+        listener = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._listeners.add(listener)
+        try:
+            while True:
+                yield await listener[1].get()
+        finally:
+            with self._lock:
+                self._listeners.discard(listener)
+
+
+class PostgresBroker(BaseBroker):
+    """``pg_notify`` / ``LISTEN`` на основной БД — без отдельной инфраструктуры."""
+
+    def publish(self, book_ids):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, _encode(book_ids)])
+
+    async def listen(self):
+        import psycopg
+
+        db = settings.DATABASES["default"]
+        # отдельное соединение вне пула Django: LISTEN держит его всё время
+        conn = await psycopg.AsyncConnection.connect(
+            dbname=db["NAME"],
+            user=db["USER"],
+            password=db["PASSWORD"],
+            host=db["HOST"],
+            port=db["PORT"],
+            autocommit=True,
+        )
+        async with conn:
+            await conn.execute(f"LISTEN {CHANNEL}")
+            async for notify in conn.notifies():
+                yield _decode(notify.payload)
+
+
+class RedisBroker(BaseBroker):
+    """Redis pub/sub (``AVAILABILITY_REDIS_URL``), если Redis уже есть под кэш."""
+
+    def __init__(self, url=None):
+        self.url = url or settings.AVAILABILITY_REDIS_URL
+        self._client = None
+
+    def publish(self, book_ids):
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(CHANNEL, _encode(book_ids))
+
+    async def listen(self):
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield _decode(message["data"].decode())
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+def _read_availability(book_ids):
+    try:
+        rows = (
+            Book.objects.with_availability()
+            .filter(pk__in=book_ids)
+            .order_by()
+            .values("pk", "available_copies", "is_available", "current_due_at")
+        )
+        return {row.pop("pk"): row for row in rows}
+    finally:
+        # соединение не держим между событиями (под ASGI — вернуть в пул)
+        close_old_connections()
+
+
+# не в потоке запроса: иначе каждый открытый поток держал бы свой поток и
+# соединение с БД до отключения клиента
+read_availability = sync_to_async(_read_availability, thread_sensitive=False)
+
+
+class Subscriber:
+    """Один открытый поток: книги и накопленные, но ещё не отправленные состояния."""
+
+    def __init__(self, book_ids):
+        self.book_ids = frozenset(book_ids)
+        self.pending = {}
+        self.wakeup = asyncio.Event()
+
+    def push(self, book_id, state):
+        self.pending[book_id] = state
+        self.wakeup.set()
+
+    async def changes(self, timeout):
+        """Накопленные изменения; пусто — истёк ``timeout`` (пора слать ping)."""
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except TimeoutError:
+            pass
+        self.wakeup.clear()
+        pending, self.pending = self.pending, {}
+        return pending
+
+
+class Hub:
+    """Pub/sub внутри воркера: одна подписка на брокер на все потоки."""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.subscribers = defaultdict(set)
+        self.task = None
+
+    def subscribe(self, book_ids):
+        subscriber = Subscriber(book_ids)
+        for book_id in subscriber.book_ids:
+            self.subscribers[book_id].add(subscriber)
+        if self.task is None or self.task.done():
+            # пустой контекст: задача переживёт запрос, который её запустил
+            self.task = self.loop.create_task(self.run(), context=contextvars.Context())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        for book_id in subscriber.book_ids:
+            watchers = self.subscribers.get(book_id)
+            if watchers is not None:
+                watchers.discard(subscriber)
+                if not watchers:
+                    del self.subscribers[book_id]
+
+    async def run(self):
+        while True:
+            try:
+                async for book_ids in self.broker.listen():
+                    await self.dispatch(book_ids)
+            except Exception:
+                logger.exception("брокер доступности: переподключение")
+            await asyncio.sleep(RECONNECT_DELAY)
+            # пока не слушали, уведомления могли потеряться
+            await self.dispatch(list(self.subscribers))
+
+    async def dispatch(self, book_ids):
+        watched = [book_id for book_id in book_ids if book_id in self.subscribers]
+        if not watched:
+            return
+        states = await read_availability(watched)
+        for book_id, state in states.items():
+            for subscriber in self.subscribers.get(book_id, ()):
+                subscriber.push(book_id, state)
+
+
+_hub = None
+
+
+def get_hub():
+    """Hub текущего цикла событий (у uvicorn-воркера он один)."""
+    global _hub
+    if _hub is None or _hub.loop is not asyncio.get_running_loop():
+        _hub = Hub(get_broker())
+    return _hub
+
+
+def format_event(book_id, state):
+    data = json.dumps({"book": book_id, **state}, cls=DjangoJSONEncoder)
+    return f"event: availability\ndata: {data}\n\n"
+
+
+async def availability_events(book_ids, heartbeat=None):
+    """
+    Поток SSE: сначала текущее состояние книг, затем изменения и
+    комментарий-ping раз в ``heartbeat`` секунд (чтобы прокси не закрывали
+    простаивающее соединение). Одинаковые состояния подряд не повторяются.
+    """
+    heartbeat = heartbeat or settings.AVAILABILITY_STREAM_HEARTBEAT
+    hub = get_hub()
+    # подписка до снимка: изменение между ними не потеряется
+    subscriber = hub.subscribe(book_ids)
+    sent = {}
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        changes = await read_availability(list(subscriber.book_ids))
+        while True:
+            fresh = {pk: s for pk, s in changes.items() if sent.get(pk) != s}
+            for book_id, state in fresh.items():
+                yield format_event(book_id, state)
+            sent.update(fresh)
+            changes = await subscriber.changes(heartbeat)
+            if not changes:
+                yield ": ping\n\n"
+    finally:
+        hub.unsubscribe(subscriber)
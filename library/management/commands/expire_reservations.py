@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from library.reservations import expire_holds
+
+
+class Command(BaseCommand):
+    help = (
+        "Закрывает брони, которые читатель не забрал вовремя, и передаёт "
+        "книги следующим в очереди."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, batch_size, **opts):
+        if batch_size <= 0:
+            raise CommandError("--batch-size должен быть > 0")
+        expired = expire_holds(batch_size=batch_size)
+        self.stderr.write(f"Истекло броней: {expired}")
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from library.exporters import FORMATS, export_rows, iter_export, parse_updated_since
+from library.replicas import choose_replica
+
+
+class Command(BaseCommand):
+    help = "Потоковая выгрузка каталога книг в CSV или JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="jsonl", dest="fmt")
+        parser.add_argument("--output", "-o", default="-", help="Файл; '-' — stdout")
+        parser.add_argument(
+            "--updated-since", help="Только книги, изменённые с этого момента (ISO)"
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument(
+            "--database", default=None, help="По умолчанию — реплика, если есть"
+        )
+
+    def handle(self, *args, fmt, output, updated_since, chunk_size, database, **opts):
+        try:
+            since = parse_updated_since(updated_since)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        rows = export_rows(
+            updated_since=since,
+            chunk_size=chunk_size,
+            using=database or choose_replica(),
+        )
+        if output == "-":
+            for chunk in iter_export(fmt, rows):
+                self.stdout.write(chunk, ending="")
+            return
+        with open(output, "w", encoding="utf-8", newline="") as stream:
+            for chunk in iter_export(fmt, rows):
+                stream.write(chunk)
+        self.stderr.write(f"Выгрузка записана в {output}")
@@ -0,0 +1,42 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.importers import FORMATS, CatalogImporter, detect_format, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Импорт/upsert книг и авторов из CSV или JSON Lines (путь или '-')."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл с каталогом; '-' — stdin")
+        parser.add_argument("--format", choices=FORMATS, dest="fmt")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--max-errors", type=int, default=1000)
+
+    def handle(self, *args, path, fmt, batch_size, max_errors, **options):
+        fmt = fmt or detect_format(name=path)
+        if fmt is None:
+            raise CommandError("Не удалось определить формат, укажите --format.")
+
+        importer = CatalogImporter(batch_size=batch_size, max_errors=max_errors)
+        if path == "-":
+            report = importer.run(iter_rows(sys.stdin.buffer, fmt))
+        else:
+            try:
+                with open(path, "rb") as stream:
+                    report = importer.run(iter_rows(stream, fmt))
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        for error in report["errors"]:
+            self.stderr.write(json.dumps(error, ensure_ascii=False))
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Обработано: {processed}, сохранено книг: {upserted}, "
+                "новых авторов: {authors_created}, ошибок: {n}".format(
+                    n=len(report["errors"]) + report["errors_truncated"], **report
+                )
+            )
+        )
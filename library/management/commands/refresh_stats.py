@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from library.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобирает агрегаты статистики (DailyBookStat, DailyGenreStat) "
+        "по истории выдач."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since", help="YYYY-MM-DD: пересчитать только с этого дня"
+        )
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, since, database, **opts):
+        day = None
+        if since:
+            day = parse_date(since)
+            if day is None:
+                raise CommandError("--since: ожидается дата YYYY-MM-DD")
+        report = rebuild_stats(since=day, using=database)
+        self.stderr.write(
+            f"Строк по книгам: {report['books']}, по жанрам: {report['genres']}"
+        )
@@ -0,0 +1,68 @@
+import signal
+import threading
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.metrics import CONTENT_TYPE, registry
+from library.taskqueue import Worker
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_metrics(port):
+    """``/metrics`` воркера (library_tasks_total и др.) в фоновом потоке."""
+
+    def app(environ, start_response):
+        start_response("200 OK", [("Content-Type", CONTENT_TYPE)])
+        return [registry.render().encode()]
+
+    server = make_server("", port, app, handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Command(BaseCommand):
+    help = "Выполняет фоновые задачи из очереди (таблица Task)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument(
+            "--sleep", type=float, default=1.0, help="Пауза при пустой очереди, сек"
+        )
+        parser.add_argument(
+            "--burst", action="store_true", help="Выйти, когда очередь опустеет"
+        )
+        parser.add_argument(
+            "--metrics-port", type=int, default=0, help="Порт /metrics (0 — без него)"
+        )
+        parser.add_argument("--report-every", type=int, default=60)
+
+    def handle(self, *args, batch_size, sleep, burst, metrics_port, **opts):
+        if batch_size <= 0:
+            raise CommandError("--batch-size должен быть > 0")
+        worker = Worker(batch_size=batch_size, idle_sleep=sleep)
+        server = serve_metrics(metrics_port) if metrics_port else None
+        # SIGTERM/SIGINT: доделать текущую пачку и выйти
+        previous = {
+            sig: signal.signal(sig, worker.stop)
+            for sig in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            worker.run(
+                burst=burst, report=self.report, report_every=opts["report_every"]
+            )
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+            if server is not None:
+                server.shutdown()
+
+    def report(self, counts, rate):
+        self.stderr.write(
+            f"Задач: выполнено {counts['done']}, повторов {counts['retry']}, "
+            f"ошибок {counts['failed']}; {rate:.1f} в секунду"
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from library.notifiers import get_notifier
+from library.overdue import scan_overdue
+
+
+class Command(BaseCommand):
+    help = "Находит просроченные выдачи и отправляет напоминания пользователям."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--notifier", help="Dotted path бэкенда; по умолчанию OVERDUE_NOTIFIER"
+        )
+        parser.add_argument("--database", default=None)
+
+    def handle(self, *args, batch_size, notifier, database, **opts):
+        if batch_size <= 0:
+            raise CommandError("--batch-size должен быть > 0")
+        try:
+            backend = get_notifier(notifier)
+        except ImportError as exc:
+            raise CommandError(str(exc))
+
+        report = scan_overdue(backend, batch_size=batch_size, using=database)
+        self.stderr.write(
+            f"Просрочено выдач: {report['borrows']}, "
+            f"уведомлений: {report['notices']}, батчей: {report['batches']}"
+        )
@@ -0,0 +1,188 @@
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+# Границы бакетов гистограмм (как у prometheus_client по умолчанию для времени)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name, self.help, self.labels = name, help_text, labels
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.buckets = tuple(buckets)
+        # labels -> [счётчики по бакетам (не накопительные), сумма, количество]
+        self._values = {}
+
+    def observe(self, value, *labels):
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[0][i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        names = (*self.labels, "le")
+        for labels, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                bucket = _labels(names, (*labels, bound))
+                yield f"{self.name}_bucket{bucket} {cumulative}"
+            bucket = _labels(names, (*labels, "+Inf"))
+            yield f"{self.name}_bucket{bucket} {count}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {total:.6f}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {count}"
+
+
+class Registry:
+    """
+    Метрики запросов в памяти процесса, формат Prometheus text.
+
+    У каждого воркера gunicorn свой реестр: Prometheus опрашивает
+    воркеры по отдельности или агрегирует ``sum by (route)``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        route = ("route", "method")
+        self.requests = Counter(
+            "library_http_requests_total",
+            "Количество запросов",
+            (*route, "status"),
+        )
+        self.duration = Histogram(
+            "library_http_request_duration_seconds",
+            "Время обработки запроса",
+            route,
+            SECONDS_BUCKETS,
+        )
+        self.queries = Histogram(
+            "library_db_queries_per_request",
+            "SQL-запросов на HTTP-запрос",
+            route,
+            QUERY_BUCKETS,
+        )
+        self.db_time = Histogram(
+            "library_db_duration_seconds",
+            "Суммарное время SQL за запрос",
+            route,
+            SECONDS_BUCKETS,
+        )
+        self.serialize_time = Histogram(
+            "library_serialize_duration_seconds",
+            "Время сериализации и рендеринга ответа",
+            route,
+            SECONDS_BUCKETS,
+        )
+        self.size = Histogram(
+            "library_response_size_bytes",
+            "Размер тела ответа",
+            route,
+            SIZE_BUCKETS,
+        )
+        self.over_budget = Counter(
+            "library_query_budget_exceeded_total",
+            "Запросы, превысившие бюджет SQL",
+            route,
+        )
+        # фоновые задачи (manage.py run_worker --metrics-port)
+        self.tasks = Counter(
+            "library_tasks_total",
+            "Фоновые задачи по итогу: done, retry, failed",
+            ("task", "outcome"),
+        )
+        self.task_duration = Histogram(
+            "library_task_duration_seconds",
+            "Время выполнения фоновой задачи",
+            ("task",),
+            SECONDS_BUCKETS,
+        )
+
+    def observe(self, route, method, status, perf, total, size):
+        labels = (route, method)
+        with self._lock:
+            self.requests.inc(route, method, str(status))
+            self.duration.observe(total, *labels)
+            self.queries.observe(len(perf.queries), *labels)
+            self.db_time.observe(perf.db_time, *labels)
+            self.serialize_time.observe(perf.serialize_time + perf.render_time, *labels)
+            if size is not None:
+                self.size.observe(size, *labels)
+            if perf.over_budget:
+                self.over_budget.inc(*labels)
+
+    def observe_task(self, name, outcome, seconds):
+        with self._lock:
+            self.tasks.inc(name, outcome)
+            self.task_duration.observe(seconds, name)
+
+    def render(self):
+        metrics = (
+            self.requests,
+            self.duration,
+            self.queries,
+            self.db_time,
+            self.serialize_time,
+            self.size,
+            self.over_budget,
+            self.tasks,
+            self.task_duration,
+        )
+        with self._lock:
+            lines = [line for metric in metrics for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def metrics_view(request):
+    """
+    ``GET /metrics`` для Prometheus. Если задан ``METRICS_TOKEN`` —
+    нужен заголовок ``Authorization: Bearer <token>``.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
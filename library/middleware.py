@@ -0,0 +1,126 @@
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from .metrics import registry
+from .perf import RequestPerf
+from .replicas import pin_response
+
+
+def _add_ratelimit_headers(request, response):
+    state = getattr(request, "ratelimit", None)
+    if state is None:
+        return
+    response["RateLimit-Limit"] = str(state["limit"])
+    response["RateLimit-Remaining"] = str(state["remaining"])
+    response["RateLimit-Reset"] = str(state["reset"])
+    response["RateLimit-Policy"] = state["policy"]
+
+
+@sync_and_async_middleware
+def ratelimit_headers_middleware(get_response):
+    """
+    Заголовки ``RateLimit-Limit / -Remaining / -Reset / -Policy`` по
+    состоянию, которое оставил ``throttling.TokenBucketThrottle``.
+    """
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            response = await get_response(request)
+            _add_ratelimit_headers(request, response)
+            return response
+
+    else:
+
+        def middleware(request):
+            response = get_response(request)
+            _add_ratelimit_headers(request, response)
+            return response
+
+    return middleware
+
+
+@sync_and_async_middleware
+def replica_pin_middleware(get_response):
+    """
+    После успешной записи — cookie и заголовок ``X-DB-Pin``: следующие
+    чтения этого клиента идут на основную БД (см. ``replicas.py``).
+    """
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            response = await get_response(request)
+            pin_response(request, response)
+            return response
+
+    else:
+
+        def middleware(request):
+            response = get_response(request)
+            pin_response(request, response)
+            return response
+
+    return middleware
+
+
+def _route(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else "unmatched"
+
+
+def _response_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+def _finish_perf(request, response, perf, started):
+    total = time.perf_counter() - started
+    route = _route(request)
+    if settings.PERF_SERVER_TIMING:
+        response["Server-Timing"] = perf.server_timing(total)
+    if perf.over_budget:
+        perf.log_budget(request, route)
+    registry.observe(
+        route,
+        request.method,
+        response.status_code,
+        perf,
+        total,
+        _response_size(response),
+    )
+
+
+@sync_and_async_middleware
+def perf_middleware(get_response):
+    """
+    Замеры запроса (см. ``perf.RequestPerf``): заголовок ``Server-Timing``,
+    метрики для ``/metrics``, предупреждение при превышении бюджета SQL.
+    """
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            if not settings.PERF_INSTRUMENTATION:
+                return await get_response(request)
+            started = time.perf_counter()
+            request.perf = perf = RequestPerf()
+            with perf.capture():
+                response = await get_response(request)
+            _finish_perf(request, response, perf, started)
+            return response
+
+    else:
+
+        def middleware(request):
+            if not settings.PERF_INSTRUMENTATION:
+                return get_response(request)
+            started = time.perf_counter()
+            request.perf = perf = RequestPerf()
+            with perf.capture():
+                response = get_response(request)
+            _finish_perf(request, response, perf, started)
+            return response
+
+    return middleware
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                fields=["last_name", "first_name", "id"],
+                name="library_aut_last_na_0d3bd5_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["title", "id"], name="library_boo_title_b4b861_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="borrow",
+            index=models.Index(
+                fields=["-borrowed_at", "-id"], name="library_bor_borrowe_9a3631_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:27
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Вектор собирается триггером, поэтому он актуален и для bulk_create/update().
+# Имя автора денормализовано в вектор книги; при переименовании автора
+# AFTER-триггер «трогает» его книги, и BEFORE-триггер пересчитывает вектор.
+FORWARD_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION library_book_search_vector() RETURNS trigger AS $$
+    DECLARE
+        author_name text;
+    BEGIN
+        SELECT concat_ws(' ', a.first_name, a.last_name) INTO author_name
+        FROM library_author a WHERE a.id = NEW.author_id;
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(author_name, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(author_name, '')), 'B') ||
+            setweight(to_tsvector('russian', coalesce(NEW.genre, '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(NEW.genre, '')), 'C') ||
+            setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'D') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER library_book_search_vector_trg
+    BEFORE INSERT OR UPDATE OF title, genre, description, author_id, search_vector
+    ON library_book
+    FOR EACH ROW EXECUTE FUNCTION library_book_search_vector();
+    """,
+    """
+    CREATE OR REPLACE FUNCTION library_author_search_vector() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.first_name IS DISTINCT FROM OLD.first_name
+           OR NEW.last_name IS DISTINCT FROM OLD.last_name THEN
+            UPDATE library_book SET title = title WHERE author_id = NEW.id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER library_author_search_vector_trg
+    AFTER UPDATE OF first_name, last_name ON library_author
+    FOR EACH ROW EXECUTE FUNCTION library_author_search_vector();
+    """,
+    # заполняем вектор для уже существующих книг
+    "UPDATE library_book SET title = title;",
+    """
+    CREATE INDEX IF NOT EXISTS library_book_search_vector_gin
+    ON library_book USING gin (search_vector);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS library_book_title_trgm
+    ON library_book USING gin (title gin_trgm_ops);
+    """,
+    # под book_id__istartswith / __icontains: Django пишет UPPER(book_id::text)
+    """
+    CREATE INDEX IF NOT EXISTS library_book_book_id_upper_trgm
+    ON library_book USING gin ((UPPER(book_id::text)) gin_trgm_ops);
+    """,
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS library_book_book_id_upper_trgm;",
+    "DROP INDEX IF EXISTS library_book_title_trgm;",
+    "DROP INDEX IF EXISTS library_book_search_vector_gin;",
+    "DROP TRIGGER IF EXISTS library_author_search_vector_trg ON library_author;",
+    "DROP FUNCTION IF EXISTS library_author_search_vector();",
+    "DROP TRIGGER IF EXISTS library_book_search_vector_trg ON library_book;",
+    "DROP FUNCTION IF EXISTS library_book_search_vector();",
+]
+
+
+def _postgres_only(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0002_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="book",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(_postgres_only(FORWARD_SQL), _postgres_only(REVERSE_SQL)),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_active_borrow(apps, schema_editor):
+    Book = apps.get_model("library", "Book")
+    Borrow = apps.get_model("library", "Borrow")
+    active = Borrow.objects.filter(book=OuterRef("pk"), returned_at__isnull=True)
+    Book.objects.update(active_borrow=Subquery(active.values("pk")[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0005_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="active_borrow",
+            field=models.OneToOneField(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="library.borrow",
+            ),
+        ),
+        migrations.RunPython(backfill_active_borrow, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0006_book_active_borrow"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrow",
+            index=models.Index(
+                condition=models.Q(("returned_at__isnull", True)),
+                fields=["due_at", "id"],
+                name="borrow_active_due_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0009_daily_stats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrow",
+            index=models.Index(
+                fields=["user", "-borrowed_at", "-id"], name="borrow_user_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="borrow",
+            index=models.Index(
+                condition=models.Q(("returned_at__isnull", True)),
+                fields=["user"],
+                name="borrow_user_active_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0010_borrow_user_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Reservation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("waiting", "В очереди"),
+                            ("ready", "Ждёт читателя"),
+                            ("fulfilled", "Выдана"),
+                            ("cancelled", "Отменена"),
+                            ("expired", "Истекла"),
+                        ],
+                        default="waiting",
+                        max_length=16,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("ready_until", models.DateTimeField(blank=True, null=True)),
+                ("closed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "book",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reservations",
+                        to="library.book",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reservations",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-id"],
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "waiting")),
+                        fields=["book", "id"],
+                        name="reservation_queue_idx",
+                    ),
+                    models.Index(
+                        condition=models.Q(("status", "ready")),
+                        fields=["ready_until"],
+                        name="reservation_ready_until_idx",
+                    ),
+                    models.Index(fields=["user", "-id"], name="reservation_user_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("status__in", ["waiting", "ready"])),
+                        fields=("book", "user"),
+                        name="uniq_open_reservation_per_user",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("status", "ready")),
+                        fields=("book",),
+                        name="uniq_ready_reservation_per_book",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+
+def create_first_copies(apps, schema_editor):
+    """Книга до миграции = один экземпляр со штрихкодом ``book_id``."""
+    Book = apps.get_model("library", "Book")
+    Borrow = apps.get_model("library", "Borrow")
+    Copy = apps.get_model("library", "Copy")
+    rows = Book.objects.order_by("pk").values_list("pk", "book_id").iterator()
+    batch = []
+    for pk, book_id in rows:
+        batch.append(Copy(book_id=pk, barcode=book_id))
+        if len(batch) >= BATCH_SIZE:
+            Copy.objects.bulk_create(batch)
+            batch = []
+    Copy.objects.bulk_create(batch)
+
+    first_copy = Copy.objects.filter(book=OuterRef("book")).order_by("pk")
+    Borrow.objects.update(copy=Subquery(first_copy.values("pk")[:1]))
+    active = Borrow.objects.filter(book=OuterRef("pk"), returned_at__isnull=True)
+    Book.objects.filter(Exists(active)).update(available_copies=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0011_reservation"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Copy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("barcode", models.CharField(max_length=64, unique=True)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name="borrow",
+            name="uniq_active_borrow_per_book",
+        ),
+        migrations.RemoveConstraint(
+            model_name="reservation",
+            name="uniq_ready_reservation_per_book",
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="available_copies",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name="copy",
+            name="book",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="copies",
+                to="library.book",
+            ),
+        ),
+        migrations.AddField(
+            model_name="borrow",
+            name="copy",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="borrows",
+                to="library.copy",
+            ),
+        ),
+        migrations.RunPython(create_first_copies, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="borrow",
+            index=models.Index(
+                condition=models.Q(("returned_at__isnull", True)),
+                fields=["book", "due_at"],
+                name="borrow_book_active_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="borrow",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("returned_at__isnull", True)),
+                fields=("copy",),
+                name="uniq_active_borrow_per_copy",
+            ),
+        ),
+    ]
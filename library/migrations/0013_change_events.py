@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:17
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+import library.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0012_copies"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("entity", models.CharField(max_length=16)),
+                ("object_id", models.BigIntegerField()),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("created", "Создан"),
+                            ("updated", "Изменён"),
+                            ("deleted", "Удалён"),
+                            ("checked_out", "Выдача"),
+                            ("returned", "Возврат"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                (
+                    "data",
+                    models.JSONField(
+                        default=dict,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "txid",
+                    models.BigIntegerField(
+                        db_default=library.models.CurrentTransactionId(), editable=False
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["txid", "id"],
+                "indexes": [
+                    models.Index(fields=["txid", "id"], name="change_cursor_idx"),
+                    models.Index(
+                        fields=["entity", "txid", "id"], name="change_entity_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:03
+
+from django.db import migrations, models
+
+BATCH_SIZE = 5000
+
+
+def number_queues(apps, schema_editor):
+    """Места в очереди для уже ожидающих броней: по порядку id внутри книги."""
+    Reservation = apps.get_model("library", "Reservation")
+    rows = (
+        Reservation.objects.filter(status="waiting")
+        .order_by("book_id", "pk")
+        .values_list("pk", "book_id")
+        .iterator()
+    )
+    batch, book, position = [], None, 0
+    for pk, book_id in rows:
+        position = position + 1 if book_id == book else 1
+        book = book_id
+        batch.append(Reservation(pk=pk, position=position))
+        if len(batch) >= BATCH_SIZE:
+            Reservation.objects.bulk_update(batch, ["position"])
+            batch = []
+    Reservation.objects.bulk_update(batch, ["position"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0014_tasks"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reservation",
+            name="position",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(number_queues, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:05
+
+from django.db import migrations
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Greatest
+
+
+def subtract_holds(apps, schema_editor):
+    """``available_copies`` теперь без экземпляров, отложенных по брони ``ready``."""
+    Book = apps.get_model("library", "Book")
+    Reservation = apps.get_model("library", "Reservation")
+    ready = Reservation.objects.filter(status="ready")
+    held = (
+        ready.filter(book=OuterRef("pk"))
+        .order_by()
+        .values("book")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    Book.objects.filter(pk__in=ready.values("book")).update(
+        available_copies=Greatest(F("available_copies") - Subquery(held), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0015_reservation_position"),
+    ]
+
+    operations = [
+        migrations.RunPython(subtract_holds, migrations.RunPython.noop),
+    ]
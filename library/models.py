@@ -1,22 +1,141 @@
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import (
+    BooleanField,
+    Count,
+    Exists,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.lookups import GreaterThan
 from django.utils import timezone
 
 
-class Author(models.Model):
+class CurrentTransactionId(models.Func):
+    """
+    Номер текущей транзакции PostgreSQL (``pg_current_xact_id()``, 64 бита,
+    без переполнения) как bigint; на остальных БД — 0.
+    """
+
+    output_field = models.BigIntegerField()
+    allowed_default = True
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return "0", []
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return "pg_current_xact_id()::text::bigint", []
+
+
+class ChangeTracked(models.Model):
+    """
+    ``save()`` и ``delete()`` пишут ChangeEvent в той же транзакции, что
+    и само изменение. ``QuerySet.update()``/``bulk_create`` событий не
+    пишут — для них события создаются явно (см. importers.py).
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        action = (
+            ChangeEvent.Action.CREATED
+            if self._state.adding
+            else ChangeEvent.Action.UPDATED
+        )
+        # savepoint=False: внутри чужой транзакции — без лишних SAVEPOINT
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            ChangeEvent.of(self, action).save()
+
+    def delete(self, *args, **kwargs):
+        event = ChangeEvent.of(self, ChangeEvent.Action.DELETED)
+        with transaction.atomic(savepoint=False):
+            result = super().delete(*args, **kwargs)
+            event.save()
+        return result
+
+
+class Author(ChangeTracked):
     first_name = models.CharField(max_length=120)
     last_name = models.CharField(max_length=120, db_index=True)
     birth_year = models.PositiveIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ["last_name", "first_name"]
         unique_together = [("first_name", "last_name", "birth_year")]
+        # под keyset-пагинацию: (last_name, first_name, id)
+        indexes = [models.Index(fields=["last_name", "first_name", "id"])]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}".strip()
 
 
-class Book(models.Model):
+class BookQuerySet(models.QuerySet):
+    def with_availability(self):
+        """
+        ``is_available`` (есть свободный экземпляр, не отложенный по брони
+        ``ready``) и ``current_due_at`` (ближайший срок возврата) одним
+        запросом.
+
+        По умолчанию — подзапросы к Copy/Reservation/Borrow (их покрывают
+        частичные индексы ``uniq_active_borrow_per_copy`` и
+        ``uniq_open_reservation_per_user``); при
+        ``AVAILABILITY_SOURCE = "pointer"`` — по денормализованным
+        ``Book.available_copies`` и ``Book.active_borrow`` (JOIN по pk).
+        """
+        if settings.AVAILABILITY_SOURCE == "pointer":
+            return self.annotate(
+                is_available=ExpressionWrapper(
+                    Q(available_copies__gt=0), output_field=BooleanField()
+                ),
+                current_due_at=F("active_borrow__due_at"),
+            )
+        active = Borrow.objects.filter(book=OuterRef("pk"), returned_at__isnull=True)
+        return self.annotate(
+            is_available=GreaterThan(_free_copies(), _held_copies()),
+            current_due_at=Subquery(active.order_by("due_at").values("due_at")[:1]),
+        )
+
+    def sync_availability(self):
+        """
+        Пересчитывает ``available_copies`` (свободные экземпляры за вычетом
+        отложенных по брони) и ``active_borrow`` по Copy/Reservation/Borrow
+        одним UPDATE — после bulk-загрузок и выдач, записанных мимо сервисов.
+        """
+        active = Borrow.objects.filter(
+            book=OuterRef("pk"), returned_at__isnull=True
+        ).order_by("due_at", "id")
+        return self.update(
+            available_copies=Greatest(_free_copies() - _held_copies(), 0),
+            active_borrow=Subquery(active.values("pk")[:1]),
+        )
+
+
+def _count(queryset):
+    """COUNT(*) по подзапросу, связанному с книгой (``book=OuterRef("pk")``)."""
+    counted = queryset.order_by().values("book").annotate(n=Count("pk")).values("n")
+    return Coalesce(Subquery(counted), 0)
+
+
+def _free_copies():
+    return _count(Copy.objects.filter(book=OuterRef("pk")).free())
+
+
+def _held_copies():
+    return _count(
+        Reservation.objects.filter(book=OuterRef("pk"), status=Reservation.Status.READY)
+    )
+
+
+class Book(ChangeTracked):
     title = models.CharField(max_length=255, db_index=True)
     author = models.ForeignKey(Author, on_delete=models.PROTECT, related_name="books")
     book_id = models.CharField(
@@ -26,33 +145,387 @@ class Book(models.Model):
     pages = models.PositiveIntegerField(null=True, blank=True)
     genre = models.CharField(max_length=120, blank=True)
     description = models.TextField(blank=True)
+    # заполняется триггером PostgreSQL (см. миграцию 0003), GIN-индекс там же
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # свободные экземпляры и одна из активных выдач (для current_due_at);
+    # ведутся services.checkout/return_borrow. Новая книга приходит
+    # с одним экземпляром (signals.create_first_copy)
+    available_copies = models.PositiveIntegerField(default=1, editable=False)
+    active_borrow = models.OneToOneField(
+        "Borrow",
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+
+    objects = BookQuerySet.as_manager()
 
     class Meta:
         ordering = ["title"]
-        indexes = [models.Index(fields=["title", "genre", "book_id"])]
+        indexes = [
+            models.Index(fields=["title", "genre", "book_id"]),
+            models.Index(fields=["title", "id"]),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.book_id})"
 
 
+BORROW_STATUSES = ("active", "returned", "overdue")
+
+
+class CopyQuerySet(models.QuerySet):
+    def free(self):
+        """Экземпляры без активной выдачи."""
+        return self.exclude(
+            Exists(Borrow.objects.filter(copy=OuterRef("pk"), returned_at__isnull=True))
+        )
+
+
+class Copy(models.Model):
+    """Физический экземпляр книги со своим штрихкодом; Book — само издание."""
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="copies")
+    barcode = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = CopyQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return self.barcode
+
+
+class BorrowQuerySet(models.QuerySet):
+    def with_status(self, status, now=None):
+        """Фильтр по статусу: ``active``, ``returned`` или ``overdue``."""
+        if status == "active":
+            return self.filter(returned_at__isnull=True)
+        if status == "returned":
+            return self.filter(returned_at__isnull=False)
+        if status == "overdue":
+            return self.filter(
+                returned_at__isnull=True, due_at__lt=now or timezone.now()
+            )
+        raise ValueError(status)
+
+    def counts(self, now=None):
+        """``{"total", "active", "returned", "overdue"}`` одним агрегатным запросом."""
+        active = Q(returned_at__isnull=True)
+        counts = self.order_by().aggregate(
+            total=Count("id"),
+            active=Count("id", filter=active),
+            overdue=Count("id", filter=active & Q(due_at__lt=now or timezone.now())),
+        )
+        counts["returned"] = counts["total"] - counts["active"]
+        return counts
+
+
 class Borrow(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="borrows"
     )
     book = models.ForeignKey(Book, on_delete=models.PROTECT, related_name="borrows")
+    # выданный экземпляр; пусто у выдач, записанных мимо services.checkout
+    copy = models.ForeignKey(
+        Copy,
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name="borrows",
+    )
     borrowed_at = models.DateTimeField(default=timezone.now)
     due_at = models.DateTimeField()
     returned_at = models.DateTimeField(null=True, blank=True)
 
+    objects = BorrowQuerySet.as_manager()
+
     class Meta:
         ordering = ["-borrowed_at"]
+        indexes = [
+            models.Index(fields=["-borrowed_at", "-id"]),
+            # история читателя: WHERE user_id = ? ORDER BY borrowed_at DESC, id DESC
+            models.Index(
+                fields=["user", "-borrowed_at", "-id"], name="borrow_user_recent_idx"
+            ),
+            # активные выдачи читателя (счётчики, ?status=active|overdue)
+            models.Index(
+                fields=["user"],
+                condition=models.Q(returned_at__isnull=True),
+                name="borrow_user_active_idx",
+            ),
+            # активные выдачи книги: current_due_at, sync_availability
+            models.Index(
+                fields=["book", "due_at"],
+                condition=models.Q(returned_at__isnull=True),
+                name="borrow_book_active_idx",
+            ),
+            # поиск просроченных: только активные выдачи, обход по (due_at, id)
+            models.Index(
+                fields=["due_at", "id"],
+                condition=models.Q(returned_at__isnull=True),
+                name="borrow_active_due_idx",
+            ),
+        ]
         constraints = [
+            # экземпляр на руках не больше чем у одного читателя
             models.UniqueConstraint(
-                fields=["book"],
+                fields=["copy"],
                 condition=models.Q(returned_at__isnull=True),
-                name="uniq_active_borrow_per_book",
+                name="uniq_active_borrow_per_copy",
             )
         ]
 
     def __str__(self):
         return f"{self.user} -> {self.book} ({'returned' if self.returned_at else 'active'})"  # noqa: E501
+
+
+class Reservation(models.Model):
+    """
+    Очередь на книгу (FIFO по id). На каждый свободный экземпляр голова
+    очереди получает статус ``ready`` и держит его до ``ready_until``;
+    выдать отложенные экземпляры другим читателям нельзя (409). Переходы —
+    в ``reservations.py`` под блокировкой строки книги; там же
+    поддерживается ``position`` (место в очереди у ``waiting``).
+    """
+
+    class Status(models.TextChoices):
+        WAITING = "waiting", "В очереди"
+        READY = "ready", "Ждёт читателя"
+        FULFILLED = "fulfilled", "Выдана"
+        CANCELLED = "cancelled", "Отменена"
+        EXPIRED = "expired", "Истекла"
+
+    OPEN_STATUSES = (Status.WAITING, Status.READY)
+
+    book = models.ForeignKey(
+        Book, on_delete=models.CASCADE, related_name="reservations"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="reservations"
+    )
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.WAITING
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    ready_until = models.DateTimeField(null=True, blank=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    # 1 — следующий; у ready и закрытых — null
+    position = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            # голова и хвост очереди, сдвиг стоящих за ушедшим: book_id, id
+            models.Index(
+                fields=["book", "id"],
+                condition=models.Q(status="waiting"),
+                name="reservation_queue_idx",
+            ),
+            # истёкшие брони: WHERE status = 'ready' AND ready_until < now
+            models.Index(
+                fields=["ready_until"],
+                condition=models.Q(status="ready"),
+                name="reservation_ready_until_idx",
+            ),
+            models.Index(fields=["user", "-id"], name="reservation_user_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book", "user"],
+                condition=models.Q(status__in=["waiting", "ready"]),
+                name="uniq_open_reservation_per_user",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.book_id} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ответ на мутирующий запрос с заголовком ``Idempotency-Key``.
+    Пишется в той же транзакции, что и сама операция.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(null=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="uniq_idempotency_key_per_user"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key}"
+
+
+class TokenVersion(models.Model):
+    """
+    Версия JWT пользователя (claim ``ver``). Увеличивается при смене пароля,
+    прав или деактивации — выданные раньше токены перестают приниматься.
+    Нет строки — версия 0.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="token_version",
+    )
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}:v{self.version}"
+
+
+class DailyBookStat(models.Model):
+    """
+    Выдачи и возвраты книги за день — агрегат для ``/api/stats/``.
+    Ведётся инкрементально в ``services`` (см. ``stats.py``), пересобирается
+    ``manage.py refresh_stats``. Автор — на момент выдачи.
+    """
+
+    day = models.DateField()
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="+")
+    author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name="+")
+    loans = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "book"], name="uniq_book_stat_day")
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.book_id}: {self.loans}/{self.returns}"
+
+
+class DailyGenreStat(models.Model):
+    """Выдачи и возвраты по жанру за день (пустой жанр — без жанра)."""
+
+    day = models.DateField()
+    genre = models.CharField(max_length=120, blank=True)
+    loans = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "genre"], name="uniq_genre_stat_day")
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.genre or '-'}: {self.loans}/{self.returns}"
+
+
+# Поля-снимки в ChangeEvent.data (описание книги не пишем — его можно
+# дочитать по id)
+CHANGE_FIELDS = {
+    "author": ("first_name", "last_name", "birth_year"),
+    "book": ("title", "author", "book_id", "published_year", "pages", "genre"),
+    "borrow": ("book", "copy", "user", "borrowed_at", "due_at", "returned_at"),
+}
+
+
+class ChangeEvent(models.Model):
+    """
+    Журнал изменений авторов, книг и выдач (только вставки) для
+    ``/api/changes/``. Пишется в той же транзакции, что и изменение.
+
+    Курсор ленты — ``(txid, id)``: ``id`` раздаются при вставке, а
+    фиксируются транзакции в другом порядке, поэтому лента отдаёт только
+    события транзакций старше самой старой незавершённой (см. changes.py).
+    """
+
+    class Action(models.TextChoices):
+        CREATED = "created", "Создан"
+        UPDATED = "updated", "Изменён"
+        DELETED = "deleted", "Удалён"
+        CHECKED_OUT = "checked_out", "Выдача"
+        RETURNED = "returned", "Возврат"
+
+    entity = models.CharField(max_length=16)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=16, choices=Action.choices)
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    # номер транзакции записи: подставляет сама БД в том же INSERT
+    txid = models.BigIntegerField(db_default=CurrentTransactionId(), editable=False)
+
+    class Meta:
+        ordering = ["txid", "id"]
+        indexes = [
+            models.Index(fields=["txid", "id"], name="change_cursor_idx"),
+            models.Index(fields=["entity", "txid", "id"], name="change_entity_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.entity}:{self.object_id} {self.action}"
+
+    @classmethod
+    def of(cls, instance, action, **data):
+        """Несохранённое событие со снимком полей ``instance`` (+ ``data``)."""
+        opts = instance._meta
+        snapshot = {
+            name: getattr(instance, opts.get_field(name).attname)
+            for name in CHANGE_FIELDS[opts.model_name]
+        }
+        return cls(
+            entity=opts.model_name,
+            object_id=instance.pk,
+            action=action,
+            data=snapshot | data,
+        )
+
+
+class Task(models.Model):
+    """
+    Фоновая задача (очередь в БД, см. taskqueue.py). У ``running``
+    ``run_after`` — конец аренды: после него задачу заберёт другой воркер.
+    Выполненные удаляются, ``failed`` остаются для разбора.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "В очереди"
+        RUNNING = "running", "Выполняется"
+        FAILED = "failed", "Ошибка"
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # опрос воркера: WHERE status IN (...) AND run_after <= now
+            models.Index(
+                fields=["run_after", "id"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="task_due_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
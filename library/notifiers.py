@@ -0,0 +1,83 @@
+import json
+import sys
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+
+def get_notifier(path=None, **kwargs):
+    """Бэкенд уведомлений по dotted path (по умолчанию ``OVERDUE_NOTIFIER``)."""
+    return import_string(path or settings.OVERDUE_NOTIFIER)(**kwargs)
+
+
+class BaseNotifier:
+    """
+    Бэкенд напоминаний о просрочке.
+
+    ``send(notices)`` получает батч уведомлений — по одному на пользователя:
+    ``{"user_id", "username", "email", "borrows": [...]}``.
+    """
+
+    def send(self, notices):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ConsoleNotifier(BaseNotifier):
+    """Пишет уведомления строкой на пользователя (stdout по умолчанию)."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, notices):
+        for notice in notices:
+            titles = ", ".join(b["title"] for b in notice["borrows"])
+            self.stream.write(
+                f"{notice['username']}: просрочено {len(notice['borrows'])} "
+                f"— {titles}\n"
+            )
+
+
+class FileNotifier(BaseNotifier):
+    """JSON Lines в файл: одна строка — одно уведомление."""
+
+    def __init__(self, path=None):
+        self.path = path or getattr(settings, "OVERDUE_NOTIFIER_FILE", "overdue.jsonl")
+        self.stream = None
+
+    def send(self, notices):
+        if self.stream is None:
+            self.stream = open(self.path, "a", encoding="utf-8")
+        for notice in notices:
+            self.stream.write(
+                json.dumps(notice, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+            )
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+class EmailNotifier(BaseNotifier):
+    """Письма через EMAIL_BACKEND: один send_mass_mail на батч."""
+
+    subject = "Просроченные книги"
+
+    def send(self, notices):
+        messages = []
+        for notice in notices:
+            if not notice["email"]:
+                continue
+            lines = [
+                f"- {b['title']} ({b['book_id']}), срок: {b['due_at']:%Y-%m-%d}"
+                for b in notice["borrows"]
+            ]
+            body = "Пожалуйста, верните книги:\n" + "\n".join(lines)
+            messages.append((self.subject, body, None, [notice["email"]]))
+        if messages:
+            send_mass_mail(messages, fail_silently=False)
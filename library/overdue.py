@@ -0,0 +1,95 @@
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Borrow
+
+# Колонки одной просроченной выдачи (JOIN с книгой и пользователем)
+COLUMNS = (
+    "id",
+    "due_at",
+    "user_id",
+    "user__username",
+    "user__email",
+    "book_id",
+    "book__book_id",
+    "book__title",
+)
+
+
+def overdue_borrows(queryset=None, now=None):
+    """
+    Активные выдачи со сроком раньше ``now``, по (due_at, id) —
+    ровно под частичный индекс ``borrow_active_due_idx``.
+    """
+    queryset = Borrow.objects.all() if queryset is None else queryset
+    return queryset.filter(
+        returned_at__isnull=True, due_at__lt=now or timezone.now()
+    ).order_by("due_at", "id")
+
+
+def iter_overdue_batches(batch_size=1000, now=None, using=None):
+    """
+    Просроченные выдачи батчами по ``batch_size`` строк (dict'ы ``COLUMNS``).
+
+    Keyset по (due_at, id): каждый батч — отдельный короткий запрос по
+    индексу без OFFSET, в памяти одновременно только один батч.
+    """
+    now = now or timezone.now()
+    queryset = overdue_borrows(now=now).using(using).values(*COLUMNS)
+    last = None
+    while True:
+        batch = queryset
+        if last is not None:
+            due_at, pk = last
+            batch = batch.filter(Q(due_at__gt=due_at) | Q(due_at=due_at, id__gt=pk))
+        rows = list(batch[:batch_size])
+        if not rows:
+            return
+        yield rows
+        last = rows[-1]["due_at"], rows[-1]["id"]
+
+
+def group_by_user(rows, now=None):
+    """Батч строк -> уведомления по пользователям (порядок — по первой выдаче)."""
+    now = now or timezone.now()
+    notices = {}
+    for row in rows:
+        notice = notices.get(row["user_id"])
+        if notice is None:
+            notice = notices[row["user_id"]] = {
+                "user_id": row["user_id"],
+                "username": row["user__username"],
+                "email": row["user__email"],
+                "borrows": [],
+            }
+        notice["borrows"].append(
+            {
+                "id": row["id"],
+                "book": row["book_id"],
+                "book_id": row["book__book_id"],
+                "title": row["book__title"],
+                "due_at": row["due_at"],
+                "days_overdue": (now - row["due_at"]).days,
+            }
+        )
+    return list(notices.values())
+
+
+def scan_overdue(notifier, batch_size=1000, now=None, using=None):
+    """
+    Обходит просроченные выдачи и передаёт их ``notifier.send()`` батчами,
+    сгруппированными по пользователю. Возвращает сводку.
+
+    Пользователь, чьи выдачи попали в разные батчи, получит несколько
+    уведомлений — это плата за ограниченную память.
+    """
+    now = now or timezone.now()
+    report = {"batches": 0, "borrows": 0, "notices": 0}
+    for rows in iter_overdue_batches(batch_size=batch_size, now=now, using=using):
+        notices = group_by_user(rows, now=now)
+        notifier.send(notices)
+        report["batches"] += 1
+        report["borrows"] += len(rows)
+        report["notices"] += len(notices)
+    notifier.close()
+    return report
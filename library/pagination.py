@@ -0,0 +1,313 @@
+import base64
+import binascii
+import datetime
+import decimal
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+FALSE_VALUES = ("0", "false", "no", "off")
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) пагинация по текущей сортировке queryset.
+
+    Курсор хранит значения всех полей сортировки последней строки страницы,
+    следующая страница берётся условием ``WHERE (a, b, id) > (...)`` вместо
+    OFFSET. К сортировке всегда добавляется ``pk`` как уникальный
+    tie-breaker, поэтому страницы стабильны для любого ``?ordering=``.
+    COUNT(*) выполняется только по ``?count=true``.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Некорректный курсор."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_qs = self._page_queryset(queryset, request)
+        if self._wants_count(request):
+            self.count = queryset.count()
+        return self._finish_page(list(page_qs))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """То же для async-представлений: запросы через async ORM."""
+        page_qs = self._page_queryset(queryset, request)
+        if self._wants_count(request):
+            self.count = await queryset.acount()
+        return self._finish_page([row async for row in page_qs])
+
+    def _wants_count(self, request):
+        value = request.query_params.get(self.count_query_param, "")
+        return value.lower() in TRUE_VALUES
+
+    def _page_queryset(self, queryset, request):
+        """Срез queryset на страницу (+1 строка — признак следующей)."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.fields = [self._resolve_field(queryset, name) for name, _ in self.ordering]
+        self.count = None
+
+        values, reverse = self.decode_cursor(request)
+        self._cursor_values, self._reverse = values, reverse
+
+        qs = queryset.order_by(*self._order_by(reverse))
+        if values is not None:
+            qs = qs.filter(self._seek(values, reverse))
+        return qs[: self.page_size + 1]
+
+    def _finish_page(self, rows):
+        values, reverse = self._cursor_values, self._reverse
+        has_more = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        if reverse:
+            self.has_next = values is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = values is not None
+        return self.page
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size,
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, queryset):
+        """
+        Сортировка как список ``(field, descending)`` с tie-breaker ``pk``.
+        Берётся из ``order_by`` (в т.ч. выставленного OrderingFilter),
+        иначе из ``Meta.ordering`` модели.
+        """
+        query = queryset.query
+        raw = list(query.order_by)
+        if not raw and query.default_ordering:
+            raw = list(queryset.model._meta.ordering)
+
+        ordering = []
+        for item in raw:
+            if not isinstance(item, str) or item == "?":
+                raise ValueError(
+                    f"Keyset-пагинация не поддерживает сортировку {item!r}"
+                )
+            name = item.lstrip("-")
+            if name == queryset.model._meta.pk.name:
+                name = "pk"
+            ordering.append((name, item.startswith("-")))
+
+        if not any(name == "pk" for name, _ in ordering):
+            descending = ordering[-1][1] if ordering else False
+            ordering.append(("pk", descending))
+        return ordering
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict()
+        if self.count is not None:
+            payload["count"] = self.count
+        payload["next"] = self.get_next_link()
+        payload["previous"] = self.get_previous_link()
+        payload["results"] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer", "example": 123},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Курсор страницы (значение из next/previous).",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"Размер страницы (не больше {self.max_page_size}).",
+                "schema": {"type": "integer"},
+            },
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Добавить в ответ общее количество (COUNT(*)).",
+                "schema": {"type": "boolean"},
+            },
+        ]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # пустая страница после последней записи — назад к началу
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    # --- курсор ---
+
+    def encode_cursor(self, obj, reverse):
+        values = [self._dump(self._get_value(obj, name)) for name, _ in self.ordering]
+        payload = {"o": self._ordering_key(), "v": values}
+        if reverse:
+            payload["r"] = 1
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        token = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            payload = json.loads(raw)
+            if payload["o"] != self._ordering_key():
+                raise ValueError("ordering changed")
+            values = payload["v"]
+            if len(values) != len(self.fields):
+                raise ValueError("cursor length")
+            values = [
+                None if v is None else self._load(field, v)
+                for field, v in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(payload.get("r"))
+
+    def _ordering_key(self):
+        return ",".join(("-" if desc else "") + name for name, desc in self.ordering)
+
+    # --- построение запроса ---
+
+    def _order_by(self, reverse):
+        result = []
+        for (name, desc), field in zip(self.ordering, self.fields):
+            if reverse:
+                desc = not desc
+            if self._nullable(field):
+                # NULL всегда в конце (в обратном проходе — в начале),
+                # одинаково для PostgreSQL и SQLite
+                expr = F(name).desc if desc else F(name).asc
+                result.append(
+                    expr(nulls_first=True) if reverse else expr(nulls_last=True)
+                )
+            else:
+                result.append(f"-{name}" if desc else name)
+        return result
+
+    def _seek(self, values, reverse):
+        """Лексикографическое условие «строго после/до курсора»."""
+        condition = None
+        equal = Q()
+        for (name, desc), field, value in zip(self.ordering, self.fields, values):
+            nullable = self._nullable(field)
+            after = self._after(name, desc, value, nullable, reverse)
+            if after is not None:
+                term = equal & after
+                condition = term if condition is None else condition | term
+            equal &= (
+                Q(**{f"{name}__isnull": True}) if value is None else Q(**{name: value})
+            )
+        return condition
+
+    @staticmethod
+    def _after(name, desc, value, nullable, reverse):
+        if value is None:
+            # NULL-блок стоит последним
+            return Q(**{f"{name}__isnull": False}) if reverse else None
+        lookup = "lt" if desc != reverse else "gt"
+        cond = Q(**{f"{name}__{lookup}": value})
+        if nullable and not reverse:
+            cond |= Q(**{f"{name}__isnull": True})
+        return cond
+
+    # --- поля и значения ---
+
+    @staticmethod
+    def _resolve_field(queryset, name):
+        if name in queryset.query.annotations:
+            return None
+        model = queryset.model
+        field = None
+        for part in name.split("__"):
+            try:
+                field = model._meta.pk if part == "pk" else model._meta.get_field(part)
+            except FieldDoesNotExist:
+                raise ValueError(f"Неизвестное поле сортировки {name!r}")
+            if field.is_relation:
+                model = field.related_model
+        return field
+
+    @staticmethod
+    def _nullable(field):
+        return field is None or field.null
+
+    @staticmethod
+    def _get_value(obj, name):
+        if isinstance(obj, dict):
+            # строки из .values() (fast-path чтение)
+            return obj[name]
+        for part in name.split("__"):
+            obj = getattr(obj, part)
+            if obj is None:
+                break
+        # FK в сортировке — храним ключ, а не объект
+        return getattr(obj, "pk", obj)
+
+    @staticmethod
+    def _dump(value):
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        return value
+
+    @staticmethod
+    def _load(field, value):
+        if field is None:
+            return value
+        if field.is_relation:
+            field = field.target_field
+        try:
+            return field.to_python(value)
+        except Exception as exc:
+            raise ValueError(str(exc))
@@ -0,0 +1,144 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("library.perf")
+
+# Сколько разных SQL показывать в предупреждении о превышении бюджета
+BUDGET_LOG_STATEMENTS = 10
+
+
+class RequestPerf:
+    """
+    Замеры одного HTTP-запроса: SQL (через ``execute_wrapper``),
+    сериализация и рендеринг. Создаётся ``middleware.perf_middleware``
+    и лежит в ``request.perf``.
+    """
+
+    def __init__(self, budget=None):
+        self.queries = []
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.budget = settings.PERF_QUERY_BUDGET if budget is None else budget
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.db_time += duration
+            self.queries.append((sql, duration))
+
+    @contextmanager
+    def capture(self):
+        """Подключает замер SQL ко всем соединениям (в т.ч. к репликам)."""
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+    @property
+    def over_budget(self):
+        return bool(self.budget) and len(self.queries) > self.budget
+
+    def server_timing(self, total):
+        def metric(name, seconds, desc=None):
+            value = f"{name};dur={seconds * 1000:.1f}"
+            return f'{value};desc="{desc}"' if desc else value
+
+        return ", ".join(
+            [
+                metric("db", self.db_time, f"{len(self.queries)} queries"),
+                metric("serialize", self.serialize_time),
+                metric("render", self.render_time),
+                metric("total", total),
+            ]
+        )
+
+    def log_budget(self, request, route):
+        counts = Counter(sql for sql, _ in self.queries)
+        statements = "\n".join(
+            f"  {n}x {sql}" for sql, n in counts.most_common(BUDGET_LOG_STATEMENTS)
+        )
+        logger.warning(
+            "Бюджет SQL превышен: %s %s (%s) — %d запросов при бюджете %d, "
+            "%.1f мс в БД\n%s",
+            request.method,
+            request.path,
+            route,
+            len(self.queries),
+            self.budget,
+            self.db_time * 1000,
+            statements,
+        )
+
+
+def get_perf(request):
+    # у DRF Request атрибуты проксируются на HttpRequest
+    return getattr(request, "perf", None)
+
+
+@contextmanager
+def measure(request, attr):
+    """
+    Добавляет время блока к ``perf.<attr>``; SQL внутри блока
+    (ленивый queryset) не считается — он уже учтён в ``db_time``.
+    """
+    perf = get_perf(request)
+    if perf is None:
+        yield
+        return
+    db_before = perf.db_time
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start - (perf.db_time - db_before)
+        setattr(perf, attr, getattr(perf, attr) + max(0.0, elapsed))
+
+
+class InstrumentedMixin:
+    """
+    Замер сериализации и рендеринга во ViewSet'е (SQL и общее время
+    меряет middleware). ``query_budget`` — свой бюджет SQL для ViewSet'а
+    вместо ``PERF_QUERY_BUDGET``.
+    """
+
+    query_budget = None
+
+    def initial(self, request, *args, **kwargs):
+        perf = get_perf(request)
+        if perf is not None and self.query_budget is not None:
+            perf.budget = self.query_budget
+        super().initial(request, *args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if get_perf(self.request) is not None:
+            represent = serializer.to_representation
+
+            def timed(instance):
+                with measure(self.request, "serialize_time"):
+                    return represent(instance)
+
+            # ``.data`` зовёт ``self.to_representation`` — подменяем у экземпляра
+            serializer.to_representation = timed
+        return serializer
+
+    def represent_rows(self, reader, rows):
+        with measure(self.request, "serialize_time"):
+            return super().represent_rows(reader, rows)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # рендерим здесь же, чтобы отделить время рендеринга от остального
+        if getattr(response, "is_rendered", True) is False:
+            with measure(request, "render_time"):
+                response.render()
+        return response
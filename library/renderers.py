@@ -0,0 +1,64 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # опциональная зависимость (extra "fast")
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson, если он установлен. Вывод побайтно совпадает
+    с JSONRenderer: даты форматирует DRF-encoder, U+2028/2029
+    экранируются так же. Иначе (нет orjson, indent) — обычный рендер.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or data is None or indent or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.ensure_ascii:  # orjson всегда пишет UTF-8
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class _ExportRenderer(BaseRenderer):
+    """
+    Формат выгрузки для content negotiation (``?format=csv``).
+    Сами данные отдаются StreamingHttpResponse мимо рендерера,
+    сюда попадают только ошибки — их пишем JSON-ом.
+    """
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class CSVRenderer(_ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class JSONLinesRenderer(_ExportRenderer):
+    media_type = "application/jsonl"
+    format = "jsonl"
+
+
+class NDJSONRenderer(_ExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
@@ -0,0 +1,148 @@
+"""
+Чтение с реплик PostgreSQL (``DB_REPLICA_HOSTS``).
+
+По умолчанию всё идёт в ``default``. На реплику уходят только чтения,
+явно помеченные ``replica_reads(alias)``: безопасные запросы каталога и
+статистики (``ReplicaReadMixin``) и выгрузки. Записи, транзакции выдачи
+(``select_for_update``) и всё остальное — на основной БД.
+
+Реплика отстаёт на доли секунды, поэтому после записи читаем с основной:
+ответ на успешный небезопасный запрос ставит cookie и заголовок
+``X-DB-Pin`` (до какого момента), пока они не истекли — клиент читает с
+основной. Ответы каталога при этом кэшируются общими для всех, так что
+после записи в сам каталог (``pin_models``: книги, авторы) он
+``DB_PIN_SECONDS`` читается с основной для всех
+(``cache.recently_written``) — иначе в кэш попала бы отставшая копия.
+Выдачи и возвраты идут постоянно и всех на основную не переводят: ответ,
+прочитанный с реплики в этом окне, кэшируется лишь на ``DB_PIN_SECONDS``
+— доступность может отстать на время задержки реплики, но не дольше.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+from .cache import recently_written
+
+PIN_COOKIE = "db_pin"
+PIN_HEADER = "X-DB-Pin"
+
+# алиас реплики для чтений текущего запроса; None — основная БД
+_read_alias = ContextVar("read_alias", default=None)
+
+
+@contextmanager
+def replica_reads(alias):
+    """Чтения без явного ``using()`` внутри блока — с ``alias`` (None — основная)."""
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+def choose_replica():
+    """Случайная реплика из ``DATABASE_REPLICAS``; None, если их нет."""
+    if not settings.DATABASE_REPLICAS:
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def pin_value():
+    return f"{time.time() + settings.DB_PIN_SECONDS:.3f}"
+
+
+def is_pinned(request):
+    """Клиент недавно писал: cookie или заголовок ``X-DB-Pin`` ещё действуют."""
+    raw = request.COOKIES.get(PIN_COOKIE) or request.headers.get(PIN_HEADER)
+    try:
+        until = float(raw)
+    except (TypeError, ValueError):
+        return False
+    now = time.time()
+    # значение из будущего дальше окна — подделка, не верим
+    return now < until <= now + settings.DB_PIN_SECONDS
+
+
+def pin_response(request, response):
+    """После успешной записи — читать с основной ``DB_PIN_SECONDS`` секунд."""
+    if (
+        not settings.DATABASE_REPLICAS
+        or request.method in SAFE_METHODS
+        or response.status_code >= 400
+    ):
+        return
+    value = pin_value()
+    response[PIN_HEADER] = value
+    response.set_cookie(
+        PIN_COOKIE,
+        value,
+        max_age=settings.DB_PIN_SECONDS,
+        httponly=True,
+        samesite="Lax",
+    )
+
+
+class ReplicaRouter:
+    """Записи — всегда в ``default``; чтения — куда указал ``replica_reads``."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # объект с реплики можно привязать к записываемому: это одна и та же БД
+        pool = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Безопасные запросы ViewSet'а читают с реплики (``self.read_alias``).
+    Аутентификация и права проверяются до переключения — по основной БД.
+    ``pin_models`` — записи, после которых все читают с основной (по
+    умолчанию ``cache_models``).
+    """
+
+    read_alias = None
+    pin_models = None
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(None):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.read_alias = self.get_read_alias(request)
+        _read_alias.set(self.read_alias)
+
+    def get_read_alias(self, request):
+        if (
+            not settings.DATABASE_REPLICAS
+            or request.method not in SAFE_METHODS
+            or is_pinned(request)
+            or recently_written(self.get_pin_models())
+        ):
+            return None
+        return choose_replica()
+
+    def get_pin_models(self):
+        if self.pin_models is not None:
+            return self.pin_models
+        return getattr(self, "cache_models", ())
+
+    def get_cache_timeout(self):
+        # с реплики сразу после записи (выдача, возврат) — отставшие данные
+        # держим в общем кэше не дольше окна задержки
+        if self.read_alias and recently_written(self.cache_models):
+            return settings.DB_PIN_SECONDS
+        return super().get_cache_timeout()
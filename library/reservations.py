@@ -0,0 +1,188 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .exceptions import AlreadyReserved, BookOnHold, Conflict
+from .live import publish_availability
+from .models import Book, Borrow, Copy, Reservation
+from .signals import invalidate_catalog_cache
+from .taskqueue import enqueue
+from .tasks import notify_hold_ready
+
+Status = Reservation.Status
+
+
+def hold_period():
+    return timedelta(hours=settings.RESERVATION_HOLD_HOURS)
+
+
+def free_copies(book_id):
+    """
+    Число свободных экземпляров. Строки, заблокированные идущей сейчас
+    выдачей (SKIP LOCKED), не считаются: этот экземпляр уже уходит.
+    """
+    copies = Copy.objects.filter(book_id=book_id).free()
+    return len(copies.select_for_update(skip_locked=True).values_list("pk"))
+
+
+def _hold(book_id, n):
+    """
+    ``available_copies`` — свободные экземпляры за вычетом отложенных:
+    ``n`` экземпляров отложено (отрицательное — освобождено).
+    """
+    if n:
+        Book.objects.filter(pk=book_id).update(
+            available_copies=Greatest(F("available_copies") - n, 0)
+        )
+        # UPDATE не шлёт post_save — кэш каталога и подписчиков извещаем сами
+        invalidate_catalog_cache(Reservation)
+        publish_availability([book_id])
+
+
+def _leave_queue(reservation):
+    """``waiting``-бронь уходит из очереди: стоящие за ней сдвигаются на одно место."""
+    Reservation.objects.filter(
+        book_id=reservation.book_id, status=Status.WAITING, id__gt=reservation.pk
+    ).update(position=F("position") - 1)
+
+
+def _refresh(book_id, now):
+    queue = Reservation.objects.filter(book_id=book_id)
+    if not queue.filter(status__in=Reservation.OPEN_STATUSES).exists():
+        return [], None
+    released = queue.filter(status=Status.READY, ready_until__lte=now).update(
+        status=Status.EXPIRED, closed_at=now
+    )
+    held = 0
+    ready = list(queue.filter(status=Status.READY).order_by("id"))
+    free = free_copies(book_id)
+    if free > len(ready):
+        heads = list(
+            queue.filter(status=Status.WAITING).order_by("id")[: free - len(ready)]
+        )
+        if heads:
+            until = now + hold_period()
+            Reservation.objects.filter(pk__in=[r.pk for r in heads]).update(
+                status=Status.READY, ready_until=until, position=None
+            )
+            queue.filter(status=Status.WAITING).update(
+                position=F("position") - len(heads)
+            )
+            for head in heads:
+                head.status, head.ready_until = Status.READY, until
+                head.position = None
+                # письмо — фоновой задачей в этой же транзакции
+                enqueue(notify_hold_ready, head.pk)
+            ready += heads
+            held = len(heads)
+    _hold(book_id, held - released)
+    return ready, free
+
+
+def refresh_hold(book_id, now=None):
+    """
+    Приводит очередь книги в порядок; вызывать под блокировкой строки Book.
+
+    Просроченные брони ``ready`` истекают; на каждый свободный экземпляр
+    сверх уже отложенных голова очереди (наименьший id среди ``waiting``,
+    индекс ``reservation_queue_idx``) получает ``ready`` на
+    ``RESERVATION_HOLD_HOURS``. -> список текущих ``ready``-броней.
+    """
+    return _refresh(book_id, now or timezone.now())[0]
+
+
+def reserve(book, user):
+    """Ставит пользователя в очередь (или сразу откладывает свободный экземпляр)."""
+    with transaction.atomic():
+        Book.objects.select_for_update().only("pk").get(pk=book.pk)
+        if Reservation.objects.filter(
+            book=book, user=user, status__in=Reservation.OPEN_STATUSES
+        ).exists():
+            raise AlreadyReserved()
+        if Borrow.objects.filter(
+            book=book, user=user, returned_at__isnull=True
+        ).exists():
+            raise Conflict("Книга уже у вас на руках.")
+        last = (
+            Reservation.objects.filter(book=book, status=Status.WAITING)
+            .order_by("-id")
+            .values_list("position", flat=True)
+            .first()
+        )
+        reservation = Reservation.objects.create(
+            book=book, user=user, position=(last or 0) + 1
+        )
+        for ready in refresh_hold(book.pk):
+            if ready.pk == reservation.pk:
+                reservation = ready
+    return reservation
+
+
+def cancel_reservation(reservation_id):
+    """Отмена брони; отложенный экземпляр переходит следующему в очереди."""
+    with transaction.atomic():
+        book_id = Reservation.objects.values_list("book_id", flat=True).get(
+            pk=reservation_id
+        )
+        Book.objects.select_for_update().only("pk").get(pk=book_id)
+        reservation = Reservation.objects.get(pk=reservation_id)
+        if reservation.status not in Reservation.OPEN_STATUSES:
+            return reservation
+        was_ready = reservation.status == Status.READY
+        if not was_ready:
+            _leave_queue(reservation)
+        reservation.status, reservation.closed_at = Status.CANCELLED, timezone.now()
+        reservation.position = None
+        reservation.save(update_fields=["status", "closed_at", "position"])
+        if was_ready:
+            _hold(book_id, -1)
+            refresh_hold(book_id)
+    return reservation
+
+
+def claim_hold(book, user, now=None):
+    """
+    Часть выдачи (``services.checkout``, под блокировкой книги): экземпляры,
+    отложенные для других читателей, выдать нельзя; бронь получателя
+    закрывается как ``fulfilled``.
+    """
+    now = now or timezone.now()
+    ready, free = _refresh(book.pk, now)
+    mine = user.pk in {r.user_id for r in ready}
+    if ready and not mine and free <= len(ready):
+        raise BookOnHold()
+    Reservation.objects.filter(
+        book=book, user=user, status__in=Reservation.OPEN_STATUSES
+    ).update(status=Status.FULFILLED, closed_at=now, position=None)
+    if mine:
+        # отложенный экземпляр уходит получателю: снова в available_copies,
+        # а выдача вычтет его после коммита
+        _hold(book.pk, -1)
+
+
+def expire_holds(now=None, batch_size=500):
+    """
+    Истекшие брони ``ready`` (индекс ``reservation_ready_until_idx``):
+    закрывает их и передаёт экземпляры следующим в очереди. -> число истекших.
+    """
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        book_ids = list(
+            Reservation.objects.filter(status=Status.READY, ready_until__lte=now)
+            .order_by("ready_until")
+            .values_list("book_id", flat=True)[:batch_size]
+        )
+        if not book_ids:
+            return expired
+        for book_id in dict.fromkeys(book_ids):
+            with transaction.atomic():
+                Book.objects.select_for_update().only("pk").get(pk=book_id)
+                expired += Reservation.objects.filter(
+                    book_id=book_id, status=Status.READY, ready_until__lte=now
+                ).count()
+                refresh_hold(book_id, now)
@@ -0,0 +1,64 @@
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+# Конфигурации стемминга: каталог двуязычный
+SEARCH_CONFIGS = ("russian", "english")
+
+
+def is_postgres(alias):
+    return connections[alias].vendor == "postgresql"
+
+
+def build_search_query(text):
+    query = None
+    for config in SEARCH_CONFIGS:
+        part = SearchQuery(text, config=config, search_type="websearch")
+        query = part if query is None else query | part
+    return query
+
+
+def search_books(queryset, text):
+    """
+    Полнотекстовый поиск по книгам.
+
+    PostgreSQL: ``search_vector`` (GIN) по title/description/genre/имени автора
+    с ранжированием ts_rank + триграммная похожесть названия и префикс book_id.
+    Результат аннотирован ``rank`` и отсортирован по нему.
+    На других СУБД (SQLite в тестах) — icontains без ранжирования.
+    """
+    text = text.strip()
+    if not text:
+        return queryset
+
+    if not is_postgres(queryset.db):
+        return queryset.filter(
+            Q(title__icontains=text)
+            | Q(description__icontains=text)
+            | Q(genre__icontains=text)
+            | Q(book_id__istartswith=text)
+            | Q(author__last_name__icontains=text)
+            | Q(author__first_name__icontains=text)
+        )
+
+    query = build_search_query(text)
+    # cast в double precision: значение rank уходит в keyset-курсор
+    # и должно точно сравниваться при следующем запросе
+    rank = Cast(
+        SearchRank(F("search_vector"), query) + TrigramSimilarity("title", text),
+        FloatField(),
+    )
+    return (
+        queryset.annotate(rank=rank)
+        .filter(
+            Q(search_vector=query)
+            | Q(book_id__istartswith=text)
+            | Q(title__trigram_similar=text)
+        )
+        .order_by("-rank")
+    )
@@ -0,0 +1,239 @@
+import random
+from array import array
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_generation
+from .models import Author, Book, Borrow, Copy
+
+# Все синтетические книги получают book_id с этим префиксом
+BOOK_ID_PREFIX = "SEED-"
+READER_PREFIX = "reader"
+READER_PASSWORD = "Pass123456!"
+
+FIRST_NAMES = (
+    "Александр Анна Борис Вера Георгий Дарья Евгений Екатерина Иван Ирина "
+    "Константин Лидия Михаил Мария Николай Ольга Павел Софья Фёдор Юлия "
+    "Arthur Charlotte Edgar Emily George Jane Mark Mary Oscar Virginia"
+).split()
+LAST_NAMES = (
+    "Толстой Достоевский Чехов Пушкин Гоголь Тургенев Бунин Булгаков Платонов "
+    "Ахматова Цветаева Набоков Пастернак Шолохов Лермонтов Гончаров Куприн "
+    "Dickens Austen Twain Wilde Woolf Orwell Hemingway Bronte Poe Tolkien Eliot"
+).split()
+TITLE_WORDS = (
+    "война мир преступление наказание отцы дети мастер сад вишнёвый буря "
+    "остров тайна дорога город ночь море звезда время память дом зима река "
+    "пламя тень сердце путь голос письмо история песня север ветер свет "
+    "library garden river winter shadow voyage empire silence journey stone"
+).split()
+GENRES = (
+    "роман",
+    "повесть",
+    "поэзия",
+    "драма",
+    "детектив",
+    "фантастика",
+    "история",
+    "биография",
+)
+
+# Доля выдач, которые ещё не возвращены (не больше одной на книгу)
+ACTIVE_SHARE = 0.05
+
+
+def parse_count(value):
+    """``"100k"`` -> 100000, ``"2M"`` -> 2000000, ``"5_000"`` -> 5000."""
+    text = str(value).strip().replace("_", "")
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:].lower(), 1)
+    if multiplier != 1:
+        text = text[:-1]
+    count = int(float(text) * multiplier)
+    if count < 0:
+        raise ValueError(value)
+    return count
+
+
+def _batches(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+class CatalogSeeder:
+    """
+    Детерминированный генератор каталога для нагрузочных тестов.
+
+    Один и тот же ``seed`` и объёмы дают те же авторы, книги и выдачи.
+    Всё пишется ``bulk_create`` пачками по ``batch_size`` (транзакция на
+    пачку); в памяти держатся только массивы id. ``progress(label, done,
+    total)`` вызывается после каждой пачки.
+    """
+
+    def __init__(self, seed=42, batch_size=5000, using="default", progress=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.using = using
+        self.progress = progress or (lambda label, done, total: None)
+        self.now = timezone.now().replace(microsecond=0)
+
+    def run(self, authors, books, borrows, users):
+        if books and not authors:
+            raise ValueError("Книгам нужны авторы")
+        if borrows and not (books and users):
+            raise ValueError("Выдачам нужны книги и читатели")
+        report = {}
+        try:
+            user_ids = self.create_users(users)
+            author_ids = self.create_authors(authors)
+            book_ids, copy_ids = self.create_books(books, author_ids)
+            report["active"] = self.create_borrows(
+                borrows, book_ids, copy_ids, user_ids
+            )
+        finally:
+            # bulk-операции не шлют сигналы — сбрасываем кэш каталога сами
+            bump_generation(Author, Book, Borrow, Copy)
+        report.update(users=users, authors=authors, books=books, borrows=borrows)
+        return report
+
+    def _insert(self, model, objects):
+        with transaction.atomic(using=self.using):
+            created = model.objects.using(self.using).bulk_create(objects)
+        return array("q", (obj.pk for obj in created))
+
+    def create_users(self, count):
+        User = get_user_model()
+        # один хэш на всех: PBKDF2 на каждого читателя — минуты впустую
+        password = make_password(READER_PASSWORD)
+        ids = array("q")
+        for start, size in _batches(count, self.batch_size):
+            ids += self._insert(
+                User,
+                [
+                    User(
+                        username=f"{READER_PREFIX}{i}",
+                        email=f"{READER_PREFIX}{i}@example.com",
+                        password=password,
+                    )
+                    for i in range(start, start + size)
+                ],
+            )
+            self.progress("users", start + size, count)
+        return ids
+
+    def create_authors(self, count):
+        # (имя, фамилия, год) уникальны по построению — как в unique_together
+        names, surnames = len(FIRST_NAMES), len(LAST_NAMES)
+        ids = array("q")
+        for start, size in _batches(count, self.batch_size):
+            ids += self._insert(
+                Author,
+                [
+                    Author(
+                        first_name=FIRST_NAMES[i % names],
+                        last_name=LAST_NAMES[i // names % surnames],
+                        birth_year=1500 + i // (names * surnames),
+                    )
+                    for i in range(start, start + size)
+                ],
+            )
+            self.progress("authors", start + size, count)
+        return ids
+
+    def _title(self):
+        words = self.rng.sample(TITLE_WORDS, self.rng.randint(1, 4))
+        return " ".join(words).capitalize()
+
+    def create_books(self, count, author_ids):
+        """-> (id книг, id экземпляров): у каждой книги один экземпляр."""
+        rng = self.rng
+        book_ids, copy_ids = array("q"), array("q")
+        for start, size in _batches(count, self.batch_size):
+            batch = self._insert(
+                Book,
+                [
+                    Book(
+                        title=self._title(),
+                        author_id=author_ids[rng.randrange(len(author_ids))],
+                        book_id=f"{BOOK_ID_PREFIX}{i:08d}",
+                        published_year=rng.randint(1700, self.now.year),
+                        pages=rng.randint(40, 1200),
+                        genre=rng.choice(GENRES),
+                    )
+                    for i in range(start, start + size)
+                ],
+            )
+            # bulk_create не шлёт post_save — экземпляры заводим сами
+            copy_ids += self._insert(
+                Copy,
+                [
+                    Copy(book_id=pk, barcode=f"{BOOK_ID_PREFIX}{i:08d}")
+                    for i, pk in enumerate(batch, start)
+                ],
+            )
+            book_ids += batch
+            self.progress("books", start + size, count)
+        return book_ids, copy_ids
+
+    def _borrow(self, book_id, copy_id, user_ids, active):
+        rng = self.rng
+        if active:
+            # часть активных выдач уже просрочена
+            borrowed_at = self.now - timedelta(minutes=rng.randrange(30 * 24 * 60))
+            returned_at = None
+        else:
+            borrowed_at = self.now - timedelta(minutes=rng.randrange(3 * 365 * 24 * 60))
+            returned_at = min(
+                self.now,
+                borrowed_at + timedelta(minutes=rng.randrange(30 * 24 * 60)),
+            )
+        return Borrow(
+            book_id=book_id,
+            copy_id=copy_id,
+            user_id=user_ids[rng.randrange(len(user_ids))],
+            borrowed_at=borrowed_at,
+            due_at=borrowed_at + timedelta(days=14),
+            returned_at=returned_at,
+        )
+
+    def create_borrows(self, count, book_ids, copy_ids, user_ids):
+        if not count:
+            return 0
+        rng = self.rng
+        # активная выдача — не больше одной на экземпляр (uniq_active_borrow_per_copy)
+        active = rng.sample(
+            range(len(book_ids)), min(len(book_ids), int(count * ACTIVE_SHARE))
+        )
+        history = count - len(active)
+        done = 0
+        for start, size in _batches(history, self.batch_size):
+            self._insert(
+                Borrow,
+                [
+                    self._borrow(book_ids[i], copy_ids[i], user_ids, False)
+                    for i in (rng.randrange(len(book_ids)) for _ in range(size))
+                ],
+            )
+            done += size
+            self.progress("borrows", done, count)
+        for start, size in _batches(len(active), self.batch_size):
+            self._insert(
+                Borrow,
+                [
+                    self._borrow(book_ids[i], copy_ids[i], user_ids, True)
+                    for i in active[start : start + size]
+                ],
+            )
+            done += size
+            self.progress("borrows", done, count)
+        self.link_active_borrows()
+        return len(active)
+
+    def link_active_borrows(self):
+        """``available_copies`` и ``active_borrow`` синтетических книг одним UPDATE."""
+        Book.objects.using(self.using).filter(
+            book_id__startswith=BOOK_ID_PREFIX
+        ).sync_availability()
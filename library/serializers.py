@@ -2,8 +2,70 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
-from .models import Author, Book, Borrow
+from .authentication import VERSION_CLAIM, load_token_version
+from .changes import encode_cursor
+from .models import Author, Book, Borrow, ChangeEvent, Copy, Reservation
+
+
+def _csv_param(request, name):
+    raw = request.query_params.get(name, "")
+    return {part.strip() for part in raw.split(",") if part.strip()}
+
+
+def sparse_params(request):
+    """
+    ``?fields=id,title`` и ``?expand=author`` из запроса.
+    Действуют только на чтение; ``fields`` = None — все поля.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    return _csv_param(request, "fields") or None, _csv_param(request, "expand")
+
+
+class SparseFieldsMixin:
+    """
+    Sparse fieldsets для ModelSerializer: ``?fields=`` оставляет только
+    перечисленные поля, ``?expand=`` заменяет id связи вложенным объектом
+    из ``Meta.expandable_fields``. Неизвестные имена игнорируются.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expand = sparse_params(self.context.get("request"))
+        expandable = getattr(self.Meta, "expandable_fields", {})
+        for name in expand & expandable.keys():
+            self.fields[name] = expandable[name](read_only=True)
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+    @classmethod
+    def select_columns(cls, request):
+        """
+        Колонки для ``.only()`` под запрошенные поля, ``None`` — грузить всё.
+        Связь без expand грузится как FK id.
+        """
+        fields, expand = sparse_params(request)
+        if not fields:
+            return None
+        expandable = getattr(cls.Meta, "expandable_fields", {})
+        model_fields = {f.name for f in cls.Meta.model._meta.concrete_fields}
+        columns = {cls.Meta.model._meta.pk.name}
+        # аннотации (is_available и т.п.) — не колонки
+        for name in fields & set(cls.Meta.fields) & model_fields:
+            if name in expand and name in expandable:
+                nested = expandable[name].Meta.fields
+                columns.update(f"{name}__{sub}" for sub in nested)
+            columns.add(name)
+        return columns
+
+
+AVAILABILITY_FIELDS = {"is_available", "current_due_at"}
 
 
 class AuthorSerializer(serializers.ModelSerializer):
@@ -17,11 +79,15 @@ class AuthorSerializer(serializers.ModelSerializer):
         return value
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.PrimaryKeyRelatedField(queryset=Author.objects.all())
+    # из Book.objects.with_availability()
+    is_available = serializers.BooleanField(read_only=True)
+    current_due_at = serializers.DateTimeField(read_only=True, allow_null=True)
 
     class Meta:
         model = Book
+        expandable_fields = {"author": AuthorSerializer}
         fields = [
             "id",
             "title",
@@ -31,7 +97,11 @@ class BookSerializer(serializers.ModelSerializer):
             "pages",
             "genre",
             "description",
+            "available_copies",
+            "is_available",
+            "current_due_at",
         ]
+        read_only_fields = ["available_copies"]
 
     def validate_book_id(self, value):
         v = value.strip()
@@ -56,14 +126,56 @@ class BookSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Количество страниц должно быть > 0.")
         return value
 
+    def update(self, instance, validated_data):
+        # только изменённые поля: active_borrow ведут сервисы выдачи,
+        # полный save() мог бы затереть его устаревшим значением
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, "updated_at"])
+        return instance
+
+    def to_representation(self, instance):
+        wanted = AVAILABILITY_FIELDS & self.fields.keys()
+        if wanted and not hasattr(instance, "is_available"):
+            # объект не из аннотированного queryset (create/update)
+            state = (
+                Book.objects.with_availability()
+                .filter(pk=instance.pk)
+                .values(*AVAILABILITY_FIELDS)
+                .first()
+            )
+            for name, value in (state or {}).items():
+                setattr(instance, name, value)
+        return super().to_representation(instance)
+
+
+class CopySerializer(serializers.ModelSerializer):
+    # аннотация из BookViewSet.copies
+    is_available = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Copy
+        fields = ["id", "book", "barcode", "is_available", "created_at"]
+        read_only_fields = ["book", "created_at"]
+
+    def validate_barcode(self, value):
+        v = value.strip()
+        if not v:
+            raise serializers.ValidationError("Штрихкод не может быть пустым.")
+        return v
+
 
 class BorrowSerializer(serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     book = serializers.PrimaryKeyRelatedField(queryset=Book.objects.all())
+    # конкретный экземпляр (необязательно): иначе выдаётся любой свободный
+    copy = serializers.PrimaryKeyRelatedField(
+        queryset=Copy.objects.all(), required=False, allow_null=True
+    )
 
     class Meta:
         model = Borrow
-        fields = ["id", "user", "book", "borrowed_at", "due_at", "returned_at"]
+        fields = ["id", "user", "book", "copy", "borrowed_at", "due_at", "returned_at"]
         read_only_fields = ["borrowed_at", "returned_at"]
 
     def validate(self, attrs):
@@ -77,9 +189,89 @@ class BorrowSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {"due_at": "Срок возврата должен быть в будущем."}
             )
-        if Borrow.objects.filter(book=book, returned_at__isnull=True).exists():
+        copy = attrs.get("copy")
+        if copy is not None and copy.book_id != book.pk:
+            raise serializers.ValidationError(
+                {"copy": "Экземпляр относится к другой книге."}
+            )
+        copies = Copy.objects.filter(pk=copy.pk) if copy else book.copies.all()
+        if not copies.free().exists():
             raise serializers.ValidationError(
-                {"book": "Книга уже выдана (есть активный Borrow)."}
+                {"book": "Свободных экземпляров нет (все выданы)."}
+            )
+        return attrs
+
+
+class ReservationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Reservation
+        fields = [
+            "id",
+            "book",
+            "user",
+            "status",
+            "position",
+            "created_at",
+            "ready_until",
+            "closed_at",
+        ]
+        read_only_fields = fields
+
+
+class ChangeEventSerializer(serializers.ModelSerializer):
+    # курсор, с которого продолжать после этого события
+    cursor = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChangeEvent
+        fields = ["cursor", "entity", "object_id", "action", "data", "created_at"]
+        read_only_fields = fields
+
+    def get_cursor(self, event):
+        return encode_cursor(event)
+
+
+MAX_BATCH_ITEMS = 100
+
+
+class BorrowBatchSerializer(serializers.Serializer):
+    """Тело POST /api/borrows/batch/."""
+
+    books = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=MAX_BATCH_ITEMS,
+    )
+    due_at = serializers.DateTimeField()
+    atomic = serializers.BooleanField(default=True)
+
+    def validate_due_at(self, value):
+        if value <= timezone.now():
+            raise serializers.ValidationError("Срок возврата должен быть в будущем.")
+        return value
+
+
+class ReturnBatchSerializer(serializers.Serializer):
+    """Тело POST /api/borrows/return_batch/: id выдач или штрихкоды экземпляров."""
+
+    borrows = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=MAX_BATCH_ITEMS,
+        required=False,
+    )
+    barcodes = serializers.ListField(
+        child=serializers.CharField(max_length=64),
+        min_length=1,
+        max_length=MAX_BATCH_ITEMS,
+        required=False,
+    )
+    atomic = serializers.BooleanField(default=True)
+
+    def validate(self, attrs):
+        if ("borrows" in attrs) == ("barcodes" in attrs):
+            raise serializers.ValidationError(
+                "Нужно передать либо borrows, либо barcodes."
             )
         return attrs
 
@@ -90,9 +282,29 @@ User = get_user_model()
 class UserPublicSerializer(serializers.ModelSerializer):
     """Безопасные поля профиля для ответа наружу."""
 
+    # аннотации из MeView.get_object (один запрос вместе с профилем)
+    active_count = serializers.IntegerField(read_only=True)
+    overdue_count = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = User
-        fields = ("id", "username", "email", "first_name", "last_name", "is_staff")
+        fields = (
+            "id",
+            "username",
+            "email",
+            "first_name",
+            "last_name",
+            "is_staff",
+            "active_count",
+            "overdue_count",
+        )
+
+    def to_representation(self, instance):
+        if not hasattr(instance, "active_count"):
+            counts = Borrow.objects.filter(user=instance).counts()
+            instance.active_count = counts["active"]
+            instance.overdue_count = counts["overdue"]
+        return super().to_representation(instance)
 
 
 class UserRegisterSerializer(serializers.ModelSerializer):
@@ -147,3 +359,27 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         password = validated_data.pop("password")
         user = User.objects.create_user(password=password, **validated_data)
         return user
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    """JWT с claims для ClaimsJWTAuthentication: username, is_staff, ver."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["username"] = user.get_username()
+        token["is_staff"] = user.is_staff
+        token[VERSION_CLAIM] = load_token_version(user.pk) or 0
+        return token
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """Новый access выдаётся только по refresh-токену актуальной версии."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        if VERSION_CLAIM in refresh:
+            user_id = refresh.get(jwt_settings.USER_ID_CLAIM)
+            if load_token_version(user_id) != refresh[VERSION_CLAIM]:
+                raise AuthenticationFailed("Токен отозван", code="token_revoked")
+        return super().validate(attrs)
@@ -0,0 +1,450 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    BigIntegerField,
+    Case,
+    F,
+    Min,
+    OuterRef,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from rest_framework.exceptions import APIException, NotFound
+
+from .exceptions import AlreadyReturned, BatchRejected, BookUnavailable
+from .live import publish_availability
+from .models import Book, Borrow, ChangeEvent, Copy, Reservation
+from .reservations import claim_hold, refresh_hold
+from .signals import invalidate_catalog_cache
+from .stats import record_loans, record_return, record_returns
+
+
+class _Queued(Exception):
+    """Очередь брони появилась, пока выдача брала экземпляр."""
+
+
+def _queued(book_ids):
+    """Книги из ``book_ids`` с открытой очередью брони."""
+    return set(
+        Reservation.objects.filter(
+            book_id__in=book_ids, status__in=Reservation.OPEN_STATUSES
+        )
+        .order_by()
+        .values_list("book_id", flat=True)
+    )
+
+
+def _take_copy(book, copy=None, exclude=()):
+    """
+    Блокирует свободный экземпляр книги: указанный (штрихкод со стойки) —
+    с ожиданием, любой — через ``FOR UPDATE SKIP LOCKED``, чтобы параллельные
+    выдачи одного названия разбирали разные экземпляры, а не ждали друг друга.
+    ``exclude`` — экземпляры, уже взятые этой же транзакцией.
+    """
+    copies = Copy.objects.filter(book=book).free().exclude(pk__in=exclude)
+    if copy is not None:
+        taken = copies.select_for_update().filter(pk=copy.pk).first()
+    else:
+        taken = copies.select_for_update(skip_locked=True).order_by("id").first()
+    if taken is None:
+        raise BookUnavailable()
+    return taken
+
+
+def _lend(book, user, due_at, copy=None, recheck=False):
+    """
+    Экземпляр и Borrow в точке сохранения. ``recheck`` — выдача без
+    блокировки книги: после блокировки экземпляра очередь брони
+    проверяется ещё раз (``reserve`` мог закоммитить отложенный экземпляр
+    между первой проверкой и блокировкой). Если она появилась, точка
+    сохранения откатывается вместе с блокировкой экземпляра -> None.
+    """
+    try:
+        with transaction.atomic():
+            taken = _take_copy(book, copy)
+            if recheck and _queued([book.pk]):
+                raise _Queued()
+            return Borrow.objects.create(
+                book=book, copy=taken, user=user, due_at=due_at
+            )
+    except _Queued:
+        return None
+    except IntegrityError as exc:
+        # uniq_active_borrow_per_copy: экземпляр выдан в обход блокировки
+        # (например, вставкой мимо сервиса)
+        if Borrow.objects.filter(copy=taken, returned_at__isnull=True).exists():
+            raise BookUnavailable() from exc
+        raise
+
+
+def _record_checkouts(borrows):
+    """
+    Счётчики книг (``available_copies``, ``active_borrow``), агрегаты
+    статистики и уведомления — после коммита выдач, отдельными короткими
+    запросами: строки книги и дневных агрегатов общие для всех выдач
+    названия, и в транзакции выдачи их блокировка держалась бы до коммита.
+    До этого шага ``available_copies`` завышен на эти выдачи; если процесс
+    упал между коммитом и ним — ``Book.objects.sync_availability()`` и
+    ``refresh_stats`` пересчитывают всё по Copy/Borrow.
+    """
+    per_book = Counter(borrow.book_id for borrow in borrows)
+    active = Borrow.objects.filter(
+        book=OuterRef("pk"), returned_at__isnull=True
+    ).order_by("due_at", "id")
+    Book.objects.filter(pk__in=per_book).update(
+        available_copies=Greatest(F("available_copies") - _by_book(per_book), 0),
+        # указатель — активная выдача с ближайшим сроком, как при возврате
+        # и в sync_availability (эта выдача могла уже вернуться)
+        active_borrow=Subquery(active.values("pk")[:1]),
+    )
+    record_loans([borrow.book for borrow in borrows])
+    publish_availability(per_book)
+    # UPDATE не шлёт post_save — кэш каталога сбрасываем сами; поколение
+    # Borrow, а не Book: выдача — не запись в каталог (см. replicas.py)
+    invalidate_catalog_cache(Borrow)
+
+
+def checkout(book, user, due_at, copy=None):
+    """
+    Выдача экземпляра книги (вместе с закрытием брони получателя;
+    отложенные для других экземпляры не выдаются — 409).
+
+    Без очереди брони строка книги не блокируется: параллельные выдачи
+    одного названия разбирают разные экземпляры (SKIP LOCKED), а очередь
+    перепроверяется уже под блокировкой экземпляра. С очередью — сначала
+    блокировка книги (под ней очередь и меняется), затем экземпляр.
+    Счётчики книги и статистика обновляются после коммита
+    (``_record_checkouts``; внутри внешней транзакции — ``Idempotency-Key``,
+    ``checkout_batch`` — в ней же). Если гонка всё же дошла до БД, нарушение
+    ``uniq_active_borrow_per_copy`` превращается в 409, а не в 500.
+    """
+    with transaction.atomic():
+        borrow = None
+        if not _queued([book.pk]):
+            borrow = _lend(book, user, due_at, copy, recheck=True)
+        if borrow is None:
+            Book.objects.select_for_update().only("pk").get(pk=book.pk)
+            claim_hold(book, user)
+            borrow = _lend(book, user, due_at, copy)
+        ChangeEvent.of(borrow, ChangeEvent.Action.CHECKED_OUT).save()
+    _record_checkouts([borrow])
+    return borrow
+
+
+def return_borrow(borrow_id):
+    """
+    Закрывает выдачу, возвращает экземпляр в ``available_copies`` и
+    передаёт его следующему в очереди брони. Блокировки в том же порядке,
+    что и при выдаче с очередью и бронировании: сначала строка Book,
+    затем Borrow.
+    """
+    with transaction.atomic():
+        book_of_borrow = (
+            Borrow.objects.filter(pk=borrow_id).order_by().values("book_id")
+        )
+        Book.objects.select_for_update().only("pk").get(pk=Subquery(book_of_borrow))
+        borrow = Borrow.objects.select_for_update().get(pk=borrow_id)
+        if borrow.returned_at:
+            raise AlreadyReturned()
+        borrow.returned_at = timezone.now()
+        borrow.save(update_fields=["returned_at"])
+        # указатель — на другую активную выдачу с ближайшим сроком, если есть
+        others = Borrow.objects.filter(
+            book=borrow.book_id, returned_at__isnull=True
+        ).order_by("due_at", "id")
+        changes = {
+            "active_borrow": Case(
+                When(active_borrow=borrow.pk, then=Subquery(others.values("pk")[:1])),
+                default=F("active_borrow"),
+            )
+        }
+        if borrow.copy_id:
+            changes["available_copies"] = F("available_copies") + 1
+        Book.objects.filter(pk=borrow.book_id).update(**changes)
+        record_return(borrow)
+        ChangeEvent.of(borrow, ChangeEvent.Action.RETURNED).save()
+        refresh_hold(borrow.book_id)
+        publish_availability([borrow.book_id])
+    return borrow
+
+
+def add_copy(book, barcode):
+    """Новый экземпляр книги; если на неё есть очередь — он сразу откладывается."""
+    with transaction.atomic():
+        Book.objects.select_for_update().only("pk").get(pk=book.pk)
+        copy = Copy.objects.create(book=book, barcode=barcode)
+        Book.objects.filter(pk=book.pk).update(
+            available_copies=F("available_copies") + 1
+        )
+        refresh_hold(book.pk)
+        publish_availability([book.pk])
+    return copy
+
+
+def _failure(index, exc, **item):
+    return {
+        "index": index,
+        **item,
+        "status": "error",
+        "code": exc.get_codes(),
+        "detail": str(exc.detail),
+    }
+
+
+def _by_book(values):
+    """{book_id: значение} -> CASE WHEN id = ... THEN значение END."""
+    return Case(
+        *[When(pk=book_id, then=Value(value)) for book_id, value in values.items()],
+        default=Value(0),
+        output_field=BigIntegerField(),
+    )
+
+
+def _record_events(borrows, action):
+    """События журнала по пакету выдач — одним INSERT."""
+    ChangeEvent.objects.bulk_create(
+        [ChangeEvent.of(borrow, action) for borrow in borrows]
+    )
+
+
+def _insert_borrows(pending):
+    """
+    ``bulk_create`` одним запросом; если пакет упал на
+    ``uniq_active_borrow_per_copy`` (выдача мимо сервиса), вставляем
+    по одной, чтобы найти виноватые позиции.
+    """
+    try:
+        with transaction.atomic():
+            Borrow.objects.bulk_create([borrow for _, borrow in pending])
+        return [borrow for _, borrow in pending]
+    except IntegrityError:
+        pass
+    created = []
+    for result, borrow in pending:
+        try:
+            with transaction.atomic():
+                borrow.save(force_insert=True)
+        except IntegrityError:
+            borrow.pk = None
+            result.update(_failure(result["index"], BookUnavailable()))
+            continue
+        created.append(borrow)
+    return created
+
+
+def _take_batch(book_ids, books, queued, user, due_at):
+    """
+    Экземпляры пакета: первые свободные — одним SELECT (SKIP LOCKED),
+    повторы названия — поштучно; книги с очередью брони — целиком через
+    ``checkout``. -> (результаты по позициям, [(результат, Borrow), ...])
+    """
+    prefetched = {}
+    if books.keys() - queued:
+        first_free = (
+            Copy.objects.filter(book_id__in=books.keys() - queued)
+            .free()
+            .order_by()
+            .values("book_id")
+            .annotate(first=Min("pk"))
+            .values("first")
+        )
+        prefetched = {
+            copy.book_id: copy
+            for copy in Copy.objects.filter(pk__in=first_free).select_for_update(
+                skip_locked=True
+            )
+        }
+
+    results, pending, taken = [], [], set()
+    for index, book_id in enumerate(book_ids):
+        result = {"index": index, "book": book_id, "status": "created"}
+        results.append(result)
+        book = books.get(book_id)
+        try:
+            if book is None:
+                raise NotFound("Книга не найдена.")
+            if book_id in queued:
+                # очередь брони — под блокировкой книги, целиком в checkout
+                result["borrow"] = checkout(book, user, due_at)
+                continue
+            copy = prefetched.pop(book_id, None) or _take_copy(book, exclude=taken)
+        except APIException as exc:
+            result.update(_failure(index, exc, book=book_id))
+            continue
+        taken.add(copy.pk)
+        borrow = Borrow(book=book, copy=copy, user=user, due_at=due_at)
+        result["borrow"] = borrow
+        pending.append((result, borrow))
+    return results, pending
+
+
+def checkout_batch(book_ids, user, due_at, atomic=True):
+    """
+    Выдача нескольких книг одному читателю (стойка выдачи).
+
+    Книги, очередь брони и первые свободные экземпляры (SKIP LOCKED) —
+    по запросу на весь пакет; выдачи вставляются одним ``bulk_create``,
+    счётчики книг и статистика — после коммита (``_record_checkouts``).
+    Книги с очередью брони и повторные экземпляры одного названия идут
+    поштучно, как в ``checkout``. Если очередь появилась, пока брались
+    экземпляры, разбор пакета откатывается к точке сохранения и такие
+    книги тоже идут через ``checkout``.
+
+    ``atomic=True`` — всё или ничего (``BatchRejected``), иначе
+    сохраняется всё, что удалось. -> результат по каждой позиции.
+    """
+    with transaction.atomic():
+        books = (
+            Book.objects.only("pk", "author_id", "genre")
+            .order_by()
+            .in_bulk(set(book_ids))
+        )
+        queued = _queued(books)
+        while True:
+            try:
+                with transaction.atomic():
+                    results, pending = _take_batch(
+                        book_ids, books, queued, user, due_at
+                    )
+                    raced = _queued({borrow.book_id for _, borrow in pending})
+                    if raced:
+                        raise _Queued()
+                break
+            except _Queued:
+                queued |= raced
+
+        failed = [r for r in results if r["status"] == "error"]
+        if failed and atomic:
+            raise BatchRejected(failed)
+        created = _insert_borrows(pending)
+        failed = [r for r in results if r["status"] == "error"]
+        if failed and atomic:
+            raise BatchRejected(failed)
+        for result in failed:
+            result.pop("borrow", None)
+        _record_events(created, ChangeEvent.Action.CHECKED_OUT)
+    if created:
+        _record_checkouts(created)
+    return results
+
+
+def active_borrows_by_barcode(barcodes):
+    """Штрихкоды экземпляров -> id их активных выдач (одним запросом)."""
+    return dict(
+        Borrow.objects.filter(
+            copy__barcode__in=barcodes, returned_at__isnull=True
+        ).values_list("copy__barcode", "pk")
+    )
+
+
+def return_borrow_batch(borrow_ids, atomic=True):
+    """
+    Закрывает несколько выдач (ящик возврата): блокировка книг пакета
+    (по pk — без взаимоблокировок с другими пакетами) и выдач, один
+    ``UPDATE ... WHERE returned_at IS NULL``, один UPDATE счётчиков книг,
+    два upsert'а статистики; затем очередь брони по книгам, где она есть.
+
+    ``None`` в ``borrow_ids`` — позиция, для которой выдача не найдена.
+    ``atomic`` — как в ``checkout_batch``. -> результат по каждой позиции.
+    """
+    with transaction.atomic():
+        ids = {pk for pk in borrow_ids if pk is not None}
+        book_ids = Borrow.objects.filter(pk__in=ids).order_by().values("book_id")
+        list(
+            Book.objects.select_for_update()
+            .filter(pk__in=book_ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        rows = {
+            row[0]: row
+            for row in Borrow.objects.select_for_update(of=("self",))
+            .filter(pk__in=ids)
+            .values_list(
+                "pk",
+                "book_id",
+                "copy_id",
+                "returned_at",
+                "book__author_id",
+                "book__genre",
+                "user_id",
+                "borrowed_at",
+                "due_at",
+            )
+        }
+
+        results, returning = [], {}
+        for index, pk in enumerate(borrow_ids):
+            result = {"index": index, "borrow": pk, "status": "returned"}
+            results.append(result)
+            row = rows.get(pk)
+            if row is None:
+                result.update(
+                    _failure(index, NotFound("Выдача не найдена."), borrow=pk)
+                )
+            elif row[3] is not None or pk in returning:
+                result.update(_failure(index, AlreadyReturned(), borrow=pk))
+            else:
+                returning[pk] = row
+        failed = [r for r in results if r["status"] == "error"]
+        if failed and atomic:
+            raise BatchRejected(failed)
+        if not returning:
+            return results
+
+        now = timezone.now()
+        Borrow.objects.filter(pk__in=returning, returned_at__isnull=True).update(
+            returned_at=now
+        )
+        for result in results:
+            if result["status"] == "returned":
+                result["returned_at"] = now
+        copies_back = Counter(row[1] for row in returning.values() if row[2])
+        others = Borrow.objects.filter(
+            book=OuterRef("pk"), returned_at__isnull=True
+        ).order_by("due_at", "id")
+        Book.objects.filter(pk__in={row[1] for row in returning.values()}).update(
+            available_copies=F("available_copies") + _by_book(copies_back),
+            active_borrow=Case(
+                When(
+                    active_borrow__in=list(returning),
+                    then=Subquery(others.values("pk")[:1]),
+                ),
+                default=F("active_borrow"),
+            ),
+        )
+        record_returns([(row[1], row[4], row[5]) for row in returning.values()])
+        _record_events(
+            [
+                Borrow(
+                    pk=pk,
+                    book_id=book_id,
+                    copy_id=copy_id,
+                    user_id=user_id,
+                    borrowed_at=borrowed_at,
+                    due_at=due_at,
+                    returned_at=now,
+                )
+                for pk, book_id, copy_id, _, _, _, user_id, borrowed_at, due_at in (
+                    returning.values()
+                )
+            ],
+            ChangeEvent.Action.RETURNED,
+        )
+        for book_id in set(
+            Reservation.objects.filter(
+                book_id__in={row[1] for row in returning.values()},
+                status__in=Reservation.OPEN_STATUSES,
+            )
+            .order_by()
+            .values_list("book_id", flat=True)
+        ):
+            refresh_hold(book_id)
+        # UPDATE не шлёт post_save — кэш каталога сбрасываем сами
+        invalidate_catalog_cache(Borrow)
+        publish_availability(row[1] for row in returning.values())
+    return results
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import revoke_tokens
+from .cache import bump_generation
+from .models import Author, Book, Borrow, Copy
+
+User = get_user_model()
+
+# Изменение этих полей отзывает выданные JWT (claims в токене устаревают)
+TOKEN_FIELDS = ("password", "is_active", "is_staff", "is_superuser", "username")
+
+
+@receiver([post_save, post_delete], sender=Author)
+@receiver([post_save, post_delete], sender=Book)
+@receiver([post_save, post_delete], sender=Borrow)
+@receiver([post_save, post_delete], sender=Copy)
+def invalidate_catalog_cache(sender, **kwargs):
+    # Сразу — чтобы этот же процесс не отдал старый ответ, и после коммита —
+    # чтобы параллельный запрос не закэшировал данные до фиксации транзакции.
+    bump_generation(sender)
+    transaction.on_commit(lambda: bump_generation(sender))
+
+
+@receiver(post_save, sender=Book)
+def create_first_copy(sender, instance, created=False, raw=False, **kwargs):
+    # available_copies = 1 по умолчанию — заводим этот экземпляр
+    if created and not raw:
+        Copy.objects.create(book=instance, barcode=instance.book_id)
+
+
+@receiver(pre_save, sender=User)
+def detect_token_fields_change(sender, instance, raw=False, update_fields=None, **kw):
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    fields = [f for f in TOKEN_FIELDS if update_fields is None or f in update_fields]
+    if not fields:
+        # например, update_last_login
+        return
+    old = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._revoke_tokens = old is not None and any(
+        old[f] != getattr(instance, f) for f in fields
+    )
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_change(sender, instance, created=False, **kwargs):
+    if not created and getattr(instance, "_revoke_tokens", False):
+        instance._revoke_tokens = False
+        revoke_tokens(instance.pk)
@@ -0,0 +1,244 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection, connections, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Book, Borrow, DailyBookStat, DailyGenreStat
+
+PERIODS = ("day", "week", "month", "year", "all")
+
+
+def _increment(model, key, field, rows):
+    """
+    ``field += n`` в строках дня одним запросом: многострочный INSERT ...
+    ON CONFLICT DO UPDATE (PostgreSQL и SQLite), без гонки между «нет строки»
+    и вставкой. ``rows`` — [(значения колонок, n), ...], ключи — ``key``.
+    """
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    names = [*rows[0][0], "loans", "returns"]
+    columns = ", ".join(qn(c) for c in names)
+    placeholders = ", ".join(["(" + ", ".join(["%s"] * len(names)) + ")"] * len(rows))
+    conflict = ", ".join(qn(c) for c in key)
+    sql = (
+        f"INSERT INTO {table} ({columns}) VALUES {placeholders} "
+        f"ON CONFLICT ({conflict}) DO UPDATE "
+        f"SET {qn(field)} = {table}.{qn(field)} + EXCLUDED.{qn(field)}"
+    )
+    params = []
+    for values, n in rows:
+        counters = {"loans": 0, "returns": 0, field: n}
+        params += [*values.values(), counters["loans"], counters["returns"]]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _record(field, books, day):
+    """``books`` — [(book_id, author_id, genre), ...], по строке на событие."""
+    by_book, by_genre = Counter(books), Counter(genre for _, _, genre in books)
+    _increment(
+        DailyBookStat,
+        ("day", "book_id"),
+        field,
+        [
+            ({"day": day, "book_id": book_id, "author_id": author_id}, n)
+            for (book_id, author_id, _), n in sorted(by_book.items())
+        ],
+    )
+    _increment(
+        DailyGenreStat,
+        ("day", "genre"),
+        field,
+        [({"day": day, "genre": genre}, n) for genre, n in sorted(by_genre.items())],
+    )
+
+
+def record_loans(books, day=None):
+    """
+    Пакет выдач (книга на каждую выдачу, повторы допустимы); вызывается
+    после коммита выдачи (``services._record_checkouts``).
+    """
+    _record(
+        "loans",
+        [(b.pk, b.author_id, b.genre) for b in books],
+        day or timezone.localdate(),
+    )
+
+
+def record_return(borrow, day=None):
+    """Возврат в агрегатах; вызывается в транзакции ``services.return_borrow``."""
+    author_id, genre = (
+        Book.objects.filter(pk=borrow.book_id).values_list("author_id", "genre").get()
+    )
+    record_returns([(borrow.book_id, author_id, genre)], day)
+
+
+def record_returns(books, day=None):
+    """Пакет возвратов: [(book_id, author_id, genre), ...]."""
+    _record("returns", list(books), day or timezone.localdate())
+
+
+def _daily(queryset, date_field, **columns):
+    """
+    GROUP BY день + ``columns`` (колонка агрегата -> путь в Borrow): в
+    SELECT — ``c_day``, ``c_<колонка>`` и счётчик ``n``.
+    """
+    return (
+        queryset.values(
+            c_day=TruncDate(date_field),
+            **{f"c_{name}": F(path) for name, path in columns.items()},
+        )
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+
+
+def _insert_select(model, key, field, rows, using):
+    """
+    ``INSERT ... SELECT ... GROUP BY ... ON CONFLICT DO UPDATE``: агрегаты
+    считает и пишет сама БД, в Python не приходит ни строки — объём истории
+    не важен. ``rows`` — из ``_daily``, ``key`` — уникальные колонки.
+    """
+    conn = connections[using]
+    qn = conn.ops.quote_name
+    table = qn(model._meta.db_table)
+    names = [name.removeprefix("c_") for name in rows.query.annotation_select]
+    names.remove("n")
+    other = "returns" if field == "loans" else "loans"
+    select, params = rows.query.get_compiler(using).as_sql()
+    sql = (
+        f"INSERT INTO {table} ({', '.join(qn(n) for n in names)}, "
+        f"{qn(field)}, {qn(other)}) "
+        f"SELECT {', '.join(qn('c_' + n) for n in names)}, {qn('n')}, 0 "
+        # WHERE true — иначе SQLite примет ON CONFLICT за условие JOIN
+        f"FROM ({select}) agg WHERE true "
+        f"ON CONFLICT ({', '.join(qn(c) for c in key)}) DO UPDATE "
+        f"SET {qn(field)} = EXCLUDED.{qn(field)}"
+    )
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def rebuild_stats(since=None, using="default"):
+    """
+    Пересчитывает агрегаты по истории ``Borrow`` (начиная с ``since``
+    включительно или целиком) запросами ``INSERT ... SELECT`` — память не
+    зависит от числа выдач. -> ``{"books": n, "genres": n}`` строк.
+    """
+    borrows = Borrow.objects.using(using)
+    returned = borrows.filter(returned_at__isnull=False)
+    book_stats = DailyBookStat.objects.using(using)
+    genre_stats = DailyGenreStat.objects.using(using)
+    if since is not None:
+        start = timezone.make_aware(
+            timezone.datetime(since.year, since.month, since.day)
+        )
+        borrows = borrows.filter(borrowed_at__gte=start)
+        returned = returned.filter(returned_at__gte=start)
+        book_stats = book_stats.filter(day__gte=since)
+        genre_stats = genre_stats.filter(day__gte=since)
+
+    book_columns = {"book_id": "book_id", "author_id": "book__author_id"}
+    with transaction.atomic(using=using):
+        book_stats.delete()
+        genre_stats.delete()
+        # сначала выдачи (вставка), затем возвраты — дописывают те же строки
+        # или добавляют дни, когда книгу только возвращали
+        for field, queryset, date_field in (
+            ("loans", borrows, "borrowed_at"),
+            ("returns", returned, "returned_at"),
+        ):
+            _insert_select(
+                DailyBookStat,
+                ("day", "book_id"),
+                field,
+                _daily(queryset, date_field, **book_columns),
+                using,
+            )
+            _insert_select(
+                DailyGenreStat,
+                ("day", "genre"),
+                field,
+                _daily(queryset, date_field, genre="book__genre"),
+                using,
+            )
+        return {"books": book_stats.count(), "genres": genre_stats.count()}
+
+
+def period_range(period, today=None):
+    """``"month"`` -> (1-е число месяца, сегодня); ``"all"`` -> (None, сегодня)."""
+    today = today or timezone.localdate()
+    if period == "day":
+        return today, today
+    if period == "week":
+        return today - timedelta(days=today.weekday()), today
+    if period == "month":
+        return today.replace(day=1), today
+    if period == "year":
+        return today.replace(month=1, day=1), today
+    if period == "all":
+        return None, today
+    raise ValueError(f"period: одно из {', '.join(PERIODS)}")
+
+
+def _in_range(queryset, start, end):
+    if start is not None:
+        queryset = queryset.filter(day__gte=start)
+    return queryset.filter(day__lte=end)
+
+
+def top_books(start, end, limit=10):
+    rows = (
+        _in_range(DailyBookStat.objects.all(), start, end)
+        .values("book_id", "book__title", "book__book_id")
+        .annotate(loans=Sum("loans"), returns=Sum("returns"))
+        .filter(loans__gt=0)
+        .order_by("-loans", "book_id")[:limit]
+    )
+    return [
+        {
+            "book": {
+                "id": row["book_id"],
+                "title": row["book__title"],
+                "book_id": row["book__book_id"],
+            },
+            "loans": row["loans"],
+            "returns": row["returns"],
+        }
+        for row in rows
+    ]
+
+
+def top_authors(start, end, limit=10):
+    rows = (
+        _in_range(DailyBookStat.objects.all(), start, end)
+        .values("author_id", "author__first_name", "author__last_name")
+        .annotate(loans=Sum("loans"))
+        .filter(loans__gt=0)
+        .order_by("-loans", "author_id")[:limit]
+    )
+    return [
+        {
+            "author": {
+                "id": row["author_id"],
+                "first_name": row["author__first_name"],
+                "last_name": row["author__last_name"],
+            },
+            "loans": row["loans"],
+        }
+        for row in rows
+    ]
+
+
+def genre_loans(start, end):
+    return list(
+        _in_range(DailyGenreStat.objects.all(), start, end)
+        .values("genre")
+        .annotate(loans=Sum("loans"), returns=Sum("returns"))
+        .order_by("-loans", "genre")
+    )
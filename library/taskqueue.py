@@ -0,0 +1,172 @@
+"""
+Очередь фоновых задач в таблице Task.
+
+``enqueue`` пишет задачу в текущей транзакции: откатился запрос — нет и
+задачи, зафиксировался — задача не потеряется. ``manage.py run_worker``
+забирает готовые задачи пачками через ``FOR UPDATE SKIP LOCKED`` (воркеров
+может быть несколько) и ставит их на аренду ``TASKS_LEASE_SECONDS``: если
+воркер умер, задача после аренды достанется другому. Ошибка — повтор
+через ``TASKS_RETRY_BASE * 2^(попытка-1)`` секунд (не больше
+``TASKS_RETRY_MAX``), после ``max_attempts`` — статус ``failed``.
+Выполненные задачи удаляются: таблица остаётся маленькой.
+
+``TASKS_EAGER`` (тесты, локальная разработка) — задача выполняется сразу
+в ``enqueue``, ошибки не глушатся.
+"""
+
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import registry
+from .models import Task
+
+logger = logging.getLogger("library.tasks")
+
+REGISTRY = {}
+
+
+def task(func=None, *, max_attempts=5):
+    """Регистрирует функцию как задачу (имя — ``module.function``)."""
+
+    def register(func):
+        func.task_name = f"{func.__module__}.{func.__qualname__}"
+        func.max_attempts = max_attempts
+        REGISTRY[func.task_name] = func
+        return func
+
+    return register(func) if func is not None else register
+
+
+def enqueue(func, *args, run_after=None, **kwargs):
+    """
+    Ставит ``func(*args, **kwargs)`` в очередь (аргументы — JSON).
+    -> Task или ``None`` в режиме ``TASKS_EAGER``.
+    """
+    if settings.TASKS_EAGER:
+        func(*args, **kwargs)
+        return None
+    return Task.objects.create(
+        name=func.task_name,
+        args=list(args),
+        kwargs=kwargs,
+        max_attempts=func.max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(
+        seconds=min(
+            settings.TASKS_RETRY_BASE * 2 ** (attempts - 1), settings.TASKS_RETRY_MAX
+        )
+    )
+
+
+def claim(batch_size, now=None):
+    """
+    До ``batch_size`` готовых задач (и задач с истёкшей арендой) по индексу
+    ``task_due_idx``; чужие заблокированные строки пропускаются.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        tasks = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[Task.Status.QUEUED, Task.Status.RUNNING],
+                run_after__lte=now,
+            )
+            .order_by("run_after", "id")[:batch_size]
+        )
+        if tasks:
+            Task.objects.filter(pk__in=[t.pk for t in tasks]).update(
+                status=Task.Status.RUNNING,
+                run_after=now + timedelta(seconds=settings.TASKS_LEASE_SECONDS),
+                attempts=F("attempts") + 1,
+            )
+            for t in tasks:
+                t.status = Task.Status.RUNNING
+                t.attempts += 1
+    return tasks
+
+
+def execute(task):
+    """
+    Выполняет задачу в транзакции и записывает итог:
+    ``"done"`` | ``"retry"`` | ``"failed"``.
+    """
+    started = time.perf_counter()
+    func = REGISTRY.get(task.name)
+    try:
+        if func is None:
+            raise LookupError(f"Задача {task.name} не зарегистрирована")
+        with transaction.atomic():
+            func(*task.args, **task.kwargs)
+    except Exception as exc:
+        error = "".join(traceback.format_exception_only(exc)).strip()
+        outcome = "retry" if func and task.attempts < task.max_attempts else "failed"
+        logger.warning("задача %s #%s: %s (%s)", task.name, task.pk, error, outcome)
+        changes = {"last_error": error}
+        if outcome == "retry":
+            changes.update(
+                status=Task.Status.QUEUED,
+                run_after=timezone.now() + retry_delay(task.attempts),
+            )
+        else:
+            changes.update(status=Task.Status.FAILED, finished_at=timezone.now())
+        # attempts в условии: аренда истекла и задачу забрал другой воркер —
+        # его итог не затираем
+        Task.objects.filter(pk=task.pk, attempts=task.attempts).update(**changes)
+    else:
+        outcome = "done"
+        Task.objects.filter(pk=task.pk, attempts=task.attempts).delete()
+    registry.observe_task(task.name, outcome, time.perf_counter() - started)
+    return outcome
+
+
+class Worker:
+    """Цикл ``claim`` -> ``execute``; итоги копит в ``counts``."""
+
+    def __init__(self, batch_size=10, idle_sleep=1.0):
+        self.batch_size = batch_size
+        self.idle_sleep = idle_sleep
+        self.counts = {"done": 0, "retry": 0, "failed": 0}
+        self.stopping = False
+
+    def run_once(self):
+        tasks = claim(self.batch_size)
+        for t in tasks:
+            self.counts[execute(t)] += 1
+        return len(tasks)
+
+    def run(self, burst=False, report=None, report_every=60):
+        """
+        Работает до ``stop()`` (или, при ``burst``, пока очередь не опустеет).
+        ``report(counts, rate)`` вызывается раз в ``report_every`` секунд
+        и в конце; ``rate`` — задач в секунду за всё время.
+        """
+        started = last_report = time.monotonic()
+        while not self.stopping:
+            if not self.run_once():
+                if burst:
+                    break
+                time.sleep(self.idle_sleep)
+            if report and time.monotonic() - last_report >= report_every:
+                last_report = time.monotonic()
+                report(self.counts, self.rate(started))
+        if report:
+            report(self.counts, self.rate(started))
+        return self.counts
+
+    def rate(self, started):
+        elapsed = time.monotonic() - started
+        return sum(self.counts.values()) / elapsed if elapsed > 0 else 0.0
+
+    def stop(self, *args):
+        self.stopping = True
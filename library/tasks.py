@@ -0,0 +1,40 @@
+"""Фоновые задачи: ставятся ``taskqueue.enqueue``, выполняет ``run_worker``."""
+
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+
+from .models import Reservation
+from .taskqueue import task
+
+
+@task
+def send_welcome_email(user_id):
+    """Письмо после регистрации: SMTP не задерживает ответ на запрос."""
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if user is None or not user.email:
+        return
+    send_mail(
+        "Добро пожаловать в библиотеку",
+        f"{user.get_username()}, ваш читательский аккаунт создан.",
+        None,
+        [user.email],
+    )
+
+
+@task
+def notify_hold_ready(reservation_id):
+    """Письмо читателю, чья бронь дошла до ``ready``."""
+    reservation = (
+        Reservation.objects.select_related("book", "user")
+        .filter(pk=reservation_id, status=Reservation.Status.READY)
+        .first()
+    )
+    if reservation is None or not reservation.user.email:
+        return
+    send_mail(
+        "Книга ждёт вас",
+        f"«{reservation.book.title}» отложена для вас до "
+        f"{reservation.ready_until:%Y-%m-%d %H:%M}.",
+        None,
+        [reservation.user.email],
+    )
@@ -0,0 +1,157 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Атомарный token bucket в Redis: состояние — hash {tokens, ts},
+# время берётся из самого Redis, чтобы не зависеть от часов воркеров.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+def parse_rate(rate):
+    """``"10/min"`` -> ``(10, 60)``; ``None`` — без ограничения."""
+    if rate is None:
+        return None
+    num, period = rate.split("/")
+    return int(num), DURATIONS[period[0]]
+
+
+class RedisBucketStore:
+    """Бакеты в Redis: одна Lua-операция на запрос, общая для всех воркеров."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def consume(self, key, capacity, rate):
+        key = self.cache.make_and_validate_key(key)
+        # публичного API для скриптов у RedisCache нет — берём клиент redis-py
+        client = self.cache._cache.get_client(key, write=True)
+        allowed, tokens = client.eval(TOKEN_BUCKET_LUA, 1, key, capacity, rate)
+        return bool(allowed), float(tokens)
+
+
+class LocalBucketStore:
+    """
+    Бакеты поверх любого Django-кэша под блокировкой процесса.
+    Атомарно в пределах процесса — для LocMemCache (тесты, один воркер).
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def consume(self, key, capacity, rate):
+        with self._lock:
+            now = time.time()
+            tokens, ts = self.cache.get(key) or (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.cache.set(key, (tokens, now), math.ceil(capacity / rate) + 1)
+        return allowed, tokens
+
+
+def get_bucket_store():
+    cache = caches[settings.THROTTLE_CACHE_ALIAS]
+    if isinstance(cache, RedisCache):
+        return RedisBucketStore(cache)
+    return LocalBucketStore(cache)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket: ёмкость — число запросов из ставки ``"N/period"``,
+    пополнение — N токенов за period равномерно (допускает всплеск до N).
+
+    Ставки — ``REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"][scope]``. Состояние
+    лимита кладётся в запрос, ``middleware.ratelimit_headers_middleware`` отдаёт
+    его заголовками ``RateLimit-*``.
+    """
+
+    cache_format = "throttle:{scope}:{ident}"
+
+    def get_scope(self, request, view):
+        raise NotImplementedError
+
+    def get_ident_key(self, request):
+        user = request.user
+        if user and user.is_authenticated:
+            return f"user:{user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        parsed = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+        if scope is None or parsed is None:
+            return True
+        capacity, duration = parsed
+        self.rate = capacity / duration
+        key = self.cache_format.format(scope=scope, ident=self.get_ident_key(request))
+        allowed, self.tokens = get_bucket_store().consume(key, capacity, self.rate)
+        self.record(request, capacity, duration)
+        return allowed
+
+    def wait(self):
+        # до появления одного токена
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def record(self, request, capacity, duration):
+        state = {
+            "limit": capacity,
+            "remaining": max(0, math.floor(self.tokens)),
+            # секунд до полного бакета
+            "reset": math.ceil((capacity - self.tokens) / self.rate),
+            "policy": f"{capacity};w={duration}",
+        }
+        django_request = request._request
+        current = getattr(django_request, "ratelimit", None)
+        # в заголовки — самое строгое из сработавших ограничений
+        if current is None or state["remaining"] < current["remaining"]:
+            django_request.ratelimit = state
+
+
+class RoleRateThrottle(TokenBucketThrottle):
+    """Общий лимит по роли: ``anon`` (по IP), ``user``, ``staff`` (по id)."""
+
+    def get_scope(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return "anon"
+        return "staff" if user.is_staff else "user"
+
+
+class EndpointRateThrottle(TokenBucketThrottle):
+    """Дополнительный лимит эндпоинта с ``throttle_scope`` (логин, регистрация)."""
+
+    def get_scope(self, request, view):
+        return getattr(view, "throttle_scope", None)
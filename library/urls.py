@@ -1,18 +1,43 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 
-from .views import AuthorViewSet, BookViewSet, BorrowViewSet, MeView, RegisterView
+from .async_views import availability_stream
+from .views import (
+    AuthorViewSet,
+    BookViewSet,
+    BorrowViewSet,
+    ChangeFeedView,
+    MeView,
+    MyBorrowsView,
+    RegisterView,
+    ReservationViewSet,
+    StatsViewSet,
+    TokenObtainPairView,
+)
 
 router = DefaultRouter()
 router.register(r"authors", AuthorViewSet, basename="author")
 router.register(r"books", BookViewSet, basename="book")
 router.register(r"borrows", BorrowViewSet, basename="borrow")
+router.register(r"reservations", ReservationViewSet, basename="reservation")
+router.register(r"stats", StatsViewSet, basename="stats")
 
 urlpatterns = [
+    # до роутера: иначе "stream" разобрался бы как pk книги
+    path("books/stream/", availability_stream, name="book-stream"),
     path("auth/jwt/create/", TokenObtainPairView.as_view(), name="jwt-create"),
     path("auth/jwt/refresh/", TokenRefreshView.as_view(), name="jwt-refresh"),
     path("", include(router.urls)),
     path("auth/register/", RegisterView.as_view(), name="auth-register"),
     path("auth/me/", MeView.as_view(), name="auth-me"),
+    path("auth/me/borrows/", MyBorrowsView.as_view(), name="auth-me-borrows"),
+    path("changes/", ChangeFeedView.as_view(), name="changes"),
 ]
+
+if settings.ASYNC_CATALOG_READS:
+    # под ASGI чтение каталога обслуживают async-представления
+    from .async_views import catalog_urlpatterns
+
+    urlpatterns = catalog_urlpatterns() + urlpatterns
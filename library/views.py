@@ -1,23 +1,100 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from rest_framework import generics, permissions, status, viewsets
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import (
+    filters,
+    generics,
+    permissions,
+    serializers,
+    status,
+    views,
+    viewsets,
+)
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.exceptions import (
+    NotFound,
+    PermissionDenied,
+    UnsupportedMediaType,
+    ValidationError,
+)
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from rest_framework_simplejwt import views as jwt_views
 
-from .models import Author, Book, Borrow
+from .cache import CachedReadMixin
+from .changes import LATEST, START, InvalidCursor, latest_cursor, wait_for_changes
+from .exporters import aiter_export, export_rows, iter_export, parse_updated_since
+from .fastread import FastListMixin
+from .idempotency import idempotent
+from .importers import CatalogImporter, detect_format, iter_rows
+from .models import (
+    BORROW_STATUSES,
+    CHANGE_FIELDS,
+    Author,
+    Book,
+    Borrow,
+    Copy,
+    Reservation,
+)
+from .overdue import overdue_borrows
+from .pagination import FALSE_VALUES, TRUE_VALUES
+from .perf import InstrumentedMixin
 from .permissions import IsAdminOrReadOnly, IsStaffForMutationOrOwnerRead
+from .renderers import (
+    CSVRenderer,
+    JSONLinesRenderer,
+    NDJSONRenderer,
+    ORJSONRenderer,
+)
+from .replicas import ReplicaReadMixin
+from .reservations import cancel_reservation, reserve
+from .search import search_books
 from .serializers import (
     AuthorSerializer,
     BookSerializer,
+    BorrowBatchSerializer,
     BorrowSerializer,
+    ChangeEventSerializer,
+    CopySerializer,
+    ReservationSerializer,
+    ReturnBatchSerializer,
     UserPublicSerializer,
     UserRegisterSerializer,
+    sparse_params,
 )
+from .services import (
+    active_borrows_by_barcode,
+    add_copy,
+    checkout,
+    checkout_batch,
+    return_borrow,
+    return_borrow_batch,
+)
+from .stats import PERIODS, genre_loans, period_range, top_authors, top_books
+from .taskqueue import enqueue
+from .tasks import send_welcome_email
 
 User = get_user_model()
 
+# list отдаётся fast-path'ом (см. fastread.py), JSON — через orjson, если есть
+FAST_RENDERER_CLASSES = [ORJSONRenderer, BrowsableAPIRenderer]
+
 
-class AuthorViewSet(viewsets.ModelViewSet):
+class AuthorViewSet(
+    InstrumentedMixin,
+    ReplicaReadMixin,
+    CachedReadMixin,
+    FastListMixin,
+    viewsets.ModelViewSet,
+):
+    cache_models = (Author,)
+    fast_read = True
+    renderer_classes = FAST_RENDERER_CLASSES
     queryset = Author.objects.all().order_by("last_name", "first_name")
     serializer_class = AuthorSerializer
     permission_classes = [IsAdminOrReadOnly]
@@ -25,8 +102,28 @@ class AuthorViewSet(viewsets.ModelViewSet):
     ordering_fields = ["last_name", "birth_year", "first_name"]
 
 
-class BookViewSet(viewsets.ModelViewSet):
-    queryset = Book.objects.select_related("author").all().order_by("title")
+class BookViewSet(
+    InstrumentedMixin,
+    ReplicaReadMixin,
+    CachedReadMixin,
+    FastListMixin,
+    viewsets.ModelViewSet,
+):
+    # ?q= ищет и по имени автора — зависим и от Author;
+    # is_available меняется при выдаче/возврате, с экземплярами и бронями —
+    # Borrow, Copy, Reservation
+    cache_models = (Book, Author, Borrow, Copy, Reservation)
+    # выдачи и возвраты идут постоянно — всех на основную переводят только
+    # записи в сам каталог (см. replicas.py)
+    pin_models = (Book, Author)
+    fast_read = True
+    renderer_classes = FAST_RENDERER_CLASSES
+    queryset = (
+        Book.objects.select_related("author")
+        .defer("search_vector")
+        .all()
+        .order_by("title")
+    )
     serializer_class = BookSerializer
     permission_classes = [IsAdminOrReadOnly]
     search_fields = [
@@ -39,8 +136,12 @@ class BookViewSet(viewsets.ModelViewSet):
     ordering_fields = ["title", "published_year", "pages"]
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        qs = super().get_queryset().with_availability()
         q = self.request.query_params
+        if available := q.get("available"):  # ?available=true|false
+            if available.lower() not in TRUE_VALUES + FALSE_VALUES:
+                raise ValidationError({"available": "Ожидается true или false."})
+            qs = qs.filter(is_available=available.lower() in TRUE_VALUES)
         if title := q.get("title"):
             qs = qs.filter(title__icontains=title)
         if author := q.get("author"):  # ID автора
@@ -49,10 +150,140 @@ class BookViewSet(viewsets.ModelViewSet):
             qs = qs.filter(genre__icontains=genre)
         if book_id := q.get("book_id"):
             qs = qs.filter(book_id__icontains=book_id)
+        if text := q.get("q"):  # полнотекстовый поиск с ранжированием
+            qs = search_books(qs, text)
         return qs
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        _, expand = sparse_params(self.request)
+        if "author" not in expand:
+            # без ?expand=author автор отдаётся id — JOIN не нужен
+            queryset = queryset.select_related(None)
+        columns = self.get_serializer_class().select_columns(self.request)
+        if columns is not None:
+            # ?fields= — грузим только нужные колонки (+ поля сортировки
+            # для курсора пагинации)
+            columns |= {
+                name.lstrip("-")
+                for name in queryset.query.order_by
+                if name.lstrip("-") not in queryset.query.annotations
+            }
+            queryset = queryset.only(*columns)
+        return queryset
+
+    @action(detail=True, methods=["get", "post"])
+    def copies(self, request, pk=None):
+        """
+        GET /api/books/{id}/copies/ — экземпляры книги со статусом;
+        POST ``{"barcode": ...}`` — добавить экземпляр (только staff).
+        """
+        book = self.get_object()
+        if request.method == "POST":
+            serializer = CopySerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            copy = add_copy(book, serializer.validated_data["barcode"])
+            copy.is_available = True
+            return Response(CopySerializer(copy).data, status=status.HTTP_201_CREATED)
+        active = Borrow.objects.filter(copy=OuterRef("pk"), returned_at__isnull=True)
+        copies = book.copies.annotate(is_available=~Exists(active))
+        return Response(CopySerializer(copies, many=True).data)
+
+    @action(
+        detail=True,
+        methods=["post", "delete"],
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def reserve(self, request, pk=None):
+        """
+        POST /api/books/{id}/reserve/ — встать в очередь на книгу
+        (если книга свободна — она сразу откладывается, статус ``ready``).
+        DELETE — отменить свою бронь; отложенная книга переходит следующему.
+        """
+        book = self.get_object()
+        if request.method == "DELETE":
+            reservation = (
+                Reservation.objects.filter(
+                    book=book,
+                    user=request.user,
+                    status__in=Reservation.OPEN_STATUSES,
+                )
+                .only("pk")
+                .first()
+            )
+            if reservation is None:
+                raise NotFound("Активной брони на эту книгу нет.")
+            cancel_reservation(reservation.pk)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        reservation = reserve(book, request.user)
+        return Response(
+            ReservationSerializer(reservation).data, status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        POST /api/books/bulk/
+        Upsert книг из CSV / JSON Lines: тело запроса (Content-Type text/csv
+        или application/x-ndjson) либо multipart-поле ``file``.
+        Возвращает отчёт с ошибками по строкам.
+        """
+        if request.content_type.startswith("multipart/"):
+            upload = request.FILES.get("file")
+            if upload is None:
+                raise ValidationError({"file": "Нужно передать файл."})
+            stream = upload
+            fmt = detect_format(upload.name, upload.content_type)
+        else:
+            stream = request.stream
+            fmt = detect_format(content_type=request.content_type)
+        if fmt is None:
+            raise UnsupportedMediaType(request.content_type)
+        if stream is None:
+            raise ValidationError({"detail": "Пустое тело запроса."})
 
-class BorrowViewSet(viewsets.ModelViewSet):
+        report = CatalogImporter().run(iter_rows(stream, fmt))
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="export",
+        permission_classes=[permissions.IsAdminUser],
+        renderer_classes=[CSVRenderer, JSONLinesRenderer, NDJSONRenderer],
+        pagination_class=None,
+    )
+    def export(self, request):
+        """
+        GET /api/books/export/?format=csv|jsonl&updated_since=<ISO>
+        Потоковая выгрузка каталога (только staff). Строки читаются уже
+        после выхода из представления — реплику передаём явно.
+        """
+        try:
+            since = parse_updated_since(request.query_params.get("updated_since"))
+        except ValueError as exc:
+            raise ValidationError({"updated_since": str(exc)})
+
+        renderer = request.accepted_renderer
+        rows = export_rows(updated_since=since, using=self.read_alias)
+        # итератор под сервер: «чужой» Django перед отдачей собирает в память
+        if isinstance(request._request, ASGIRequest):
+            chunks = aiter_export(renderer.format, rows)
+        else:
+            chunks = iter_export(renderer.format, rows)
+        response = StreamingHttpResponse(
+            chunks,
+            content_type=f"{renderer.media_type}; charset=utf-8",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="books.{renderer.format}"'
+        )
+        return response
+
+
+class BorrowViewSet(InstrumentedMixin, FastListMixin, viewsets.ModelViewSet):
+    fast_read = True
+    renderer_classes = FAST_RENDERER_CLASSES
     queryset = Borrow.objects.select_related("book", "user").all()
     serializer_class = BorrowSerializer
     permission_classes = [IsStaffForMutationOrOwnerRead]
@@ -61,16 +292,14 @@ class BorrowViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         qs = super().get_queryset()
+        if self.action == "overdue":
+            qs = overdue_borrows(qs)
         user = self.request.user
         if user and user.is_staff:
             return qs
         return qs.filter(user=user)
 
-    def perform_create(self, serializer):
-        # только staff может создавать выдачи
-        if not self.request.user.is_staff:
-            raise PermissionDenied("Только персонал может создавать выдачи.")
-
+    def get_target_user(self):
         # берем ID пользователя: сначала из тела, затем из query(?user= / ?target_user=)
         user_id = (
             self.request.data.get("user")
@@ -83,30 +312,245 @@ class BorrowViewSet(viewsets.ModelViewSet):
             if not user:
                 # отдаём 400, а не 404 на весь запрос
                 raise ValidationError({"user": "Пользователь не найден."})
-        else:
-            # если не передали — выдаём на текущего staff-пользователя
-            user = self.request.user
+            return user
+        # если не передали — выдаём на текущего staff-пользователя
+        return self.request.user
+
+    def perform_create(self, serializer):
+        # только staff может создавать выдачи
+        if not self.request.user.is_staff:
+            raise PermissionDenied("Только персонал может создавать выдачи.")
+        user = self.get_target_user()
+
+        # свободный экземпляр под блокировкой + 409 при гонке за последний
+        serializer.instance = checkout(
+            book=serializer.validated_data["book"],
+            user=user,
+            due_at=serializer.validated_data["due_at"],
+            copy=serializer.validated_data.get("copy"),
+        )
 
-        serializer.save(user=user)
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @action(detail=False, methods=["get"])
+    def overdue(self, request):
+        """
+        GET /api/borrows/overdue/
+        Активные выдачи с истёкшим сроком, от самых старых
+        (staff — все, пользователь — свои).
+        """
+        return self.list(request)
 
     @action(detail=True, methods=["post"])
+    @idempotent
     def return_book(self, request, pk=None):
         if not request.user.is_staff:
             return Response(
                 {"detail": "Только персонал может закрывать выдачу."},
                 status=status.HTTP_403_FORBIDDEN,
             )
-        borrow = self.get_object()
-        if borrow.returned_at:
-            return Response(
-                {"detail": "Книга уже возвращена."}, status=status.HTTP_400_BAD_REQUEST
-            )
-        from django.utils import timezone
-
-        borrow.returned_at = timezone.now()
-        borrow.save(update_fields=["returned_at"])
+        borrow = return_borrow(self.get_object().pk)
         return Response(BorrowSerializer(borrow).data, status=status.HTTP_200_OK)
 
+    @staticmethod
+    def batch_response(results, success_status):
+        """Всё прошло — ``success_status``, частичный успех (atomic=false) — 207."""
+        failed = sum(r["status"] == "error" for r in results)
+        return Response(
+            {
+                "succeeded": len(results) - failed,
+                "failed": failed,
+                "items": results,
+            },
+            status=status.HTTP_207_MULTI_STATUS if failed else success_status,
+        )
+
+    @action(detail=False, methods=["post"])
+    @idempotent
+    def batch(self, request):
+        """
+        POST /api/borrows/batch/ ``{"books": [id, ...], "due_at": ...,
+        "user": id, "atomic": true}`` — выдача нескольких книг одному
+        читателю (только staff). ``atomic=false`` — сохранить всё, что можно.
+        """
+        serializer = BorrowBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        results = checkout_batch(
+            data["books"], self.get_target_user(), data["due_at"], atomic=data["atomic"]
+        )
+        for result in results:
+            if "borrow" in result:
+                result["borrow"] = BorrowSerializer(result["borrow"]).data
+        return self.batch_response(results, status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["post"])
+    @idempotent
+    def return_batch(self, request):
+        """
+        POST /api/borrows/return_batch/ ``{"borrows": [id, ...]}`` или
+        ``{"barcodes": [...]}`` (ящик возврата), ``"atomic": true`` —
+        закрыть несколько выдач (только staff).
+        """
+        serializer = ReturnBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        barcodes = data.get("barcodes")
+        if barcodes is None:
+            borrow_ids = data["borrows"]
+        else:
+            found = active_borrows_by_barcode(barcodes)
+            borrow_ids = [found.get(code) for code in barcodes]
+        results = return_borrow_batch(borrow_ids, atomic=data["atomic"])
+        returned_at = serializers.DateTimeField()
+        for result in results:
+            if barcodes is not None:
+                result["barcode"] = barcodes[result["index"]]
+            if "returned_at" in result:
+                result["returned_at"] = returned_at.to_representation(
+                    result["returned_at"]
+                )
+        return self.batch_response(results, status.HTTP_200_OK)
+
+
+class ReservationViewSet(InstrumentedMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    GET /api/reservations/ — брони: пользователь видит свои, staff — все;
+    ``?status=waiting|ready|...``, ``?book=<id>``. ``position`` — место
+    в очереди (1 — следующий), хранится в строке брони.
+    """
+
+    serializer_class = ReservationSerializer
+    permission_classes = [IsStaffForMutationOrOwnerRead]
+    filter_backends = []
+
+    def get_queryset(self):
+        qs = Reservation.objects.all()
+        q = self.request.query_params
+        if status_param := q.get("status"):
+            if status_param not in Reservation.Status.values:
+                raise ValidationError(
+                    {"status": f"Одно из: {', '.join(Reservation.Status.values)}."}
+                )
+            qs = qs.filter(status=status_param)
+        if book := q.get("book"):
+            qs = qs.filter(book_id=book)
+        if self.request.user.is_staff:
+            return qs
+        return qs.filter(user=self.request.user)
+
+
+class StatsViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """
+    GET /api/stats/ (все три разреза), /api/stats/books/, /api/stats/authors/,
+    /api/stats/genres/ — по агрегатам DailyBookStat/DailyGenreStat (см. stats.py).
+
+    Читается с реплики, если они настроены (см. replicas.py).
+
+    Период: ``?period=day|week|month|year|all`` (по умолчанию month)
+    или ``?from=YYYY-MM-DD&to=YYYY-MM-DD``; ``?limit=`` — размер топа (до 100).
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+    max_limit = 100
+
+    def get_range(self):
+        q = self.request.query_params
+        if "from" in q or "to" in q:
+            start, end = parse_date(q.get("from", "")), parse_date(q.get("to", ""))
+            if start is None or end is None or start > end:
+                raise ValidationError(
+                    {"from": "Нужны обе даты YYYY-MM-DD, from <= to."}
+                )
+            return start, end
+        try:
+            return period_range(q.get("period", "month"))
+        except ValueError:
+            raise ValidationError({"period": f"Одно из: {', '.join(PERIODS)}."})
+
+    def get_limit(self):
+        raw = self.request.query_params.get("limit", "10")
+        if not raw.isdigit() or not 0 < int(raw) <= self.max_limit:
+            raise ValidationError({"limit": f"Целое от 1 до {self.max_limit}."})
+        return int(raw)
+
+    def respond(self, start, end, **data):
+        return Response(
+            {"from": start.isoformat() if start else None, "to": end.isoformat()} | data
+        )
+
+    def list(self, request):
+        start, end = self.get_range()
+        limit = self.get_limit()
+        return self.respond(
+            start,
+            end,
+            books=top_books(start, end, limit),
+            authors=top_authors(start, end, limit),
+            genres=genre_loans(start, end),
+        )
+
+    @action(detail=False)
+    def books(self, request):
+        start, end = self.get_range()
+        return self.respond(start, end, results=top_books(start, end, self.get_limit()))
+
+    @action(detail=False)
+    def authors(self, request):
+        start, end = self.get_range()
+        return self.respond(
+            start, end, results=top_authors(start, end, self.get_limit())
+        )
+
+    @action(detail=False)
+    def genres(self, request):
+        start, end = self.get_range()
+        return self.respond(start, end, results=genre_loans(start, end))
+
+
+class ChangeFeedView(views.APIView):
+    """
+    GET /api/changes/?since=<cursor> — журнал изменений авторов, книг и
+    выдач по порядку (см. changes.py): ``results``, ``next`` — курсор
+    следующего запроса, ``has_more``. Без ``since`` — с начала журнала,
+    ``since=latest`` — только курсор текущего конца (взять перед полной
+    выгрузкой). ``?entity=author|book|borrow``, ``?limit=`` (до 1000),
+    ``?wait=`` — long polling: ждать до N секунд, пока нет событий.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+    max_limit = 1000
+
+    def get(self, request):
+        q = request.query_params
+        since = q.get("since", START)
+        if since == LATEST:
+            return Response({"results": [], "next": latest_cursor(), "has_more": False})
+        entity = q.get("entity")
+        if entity and entity not in CHANGE_FIELDS:
+            raise ValidationError({"entity": f"Одно из: {', '.join(CHANGE_FIELDS)}."})
+        raw_limit, raw_wait = q.get("limit", "100"), q.get("wait", "0")
+        if not raw_limit.isdigit() or not 0 < int(raw_limit) <= self.max_limit:
+            raise ValidationError({"limit": f"Целое от 1 до {self.max_limit}."})
+        max_wait = settings.CHANGES_MAX_WAIT
+        if not raw_wait.isdigit() or int(raw_wait) > max_wait:
+            raise ValidationError({"wait": f"Целое от 0 до {max_wait} (секунды)."})
+        try:
+            events, cursor, has_more = wait_for_changes(
+                since, int(raw_limit), entity, timeout=int(raw_wait)
+            )
+        except InvalidCursor:
+            raise ValidationError({"since": "Некорректный курсор."})
+        return Response(
+            {
+                "results": ChangeEventSerializer(events, many=True).data,
+                "next": cursor,
+                "has_more": has_more,
+            }
+        )
+
 
 class RegisterView(generics.CreateAPIView):
     """
@@ -116,6 +560,19 @@ class RegisterView(generics.CreateAPIView):
 
     serializer_class = UserRegisterSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = "register"
+
+    def perform_create(self, serializer):
+        # хэш пароля нужен до ответа (сразу логин), письмо — в фоне
+        with transaction.atomic():
+            user = serializer.save()
+            enqueue(send_welcome_email, user.pk)
+
+
+class TokenObtainPairView(jwt_views.TokenObtainPairView):
+    """POST /api/auth/jwt/create/ — с отдельным лимитом на подбор пароля."""
+
+    throttle_scope = "login"
 
 
 class MeView(generics.RetrieveAPIView):
@@ -128,4 +585,45 @@ class MeView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # request.user собран из claims токена — профиль читаем из БД,
+        # счётчики выдач — тем же запросом
+        active = Q(borrows__returned_at__isnull=True)
+        overdue = active & Q(borrows__due_at__lt=timezone.now())
+        return User.objects.annotate(
+            active_count=Count("borrows", filter=active),
+            overdue_count=Count("borrows", filter=overdue),
+        ).get(pk=self.request.user.pk)
+
+
+class MyBorrowsView(InstrumentedMixin, FastListMixin, generics.ListAPIView):
+    """
+    GET /api/auth/me/borrows/
+    История выдач текущего пользователя (и у персонала — только своя),
+    ``?status=active|returned|overdue``. В ответе — ``counts`` по всем
+    статусам одним агрегатным запросом.
+    """
+
+    fast_read = True
+    renderer_classes = FAST_RENDERER_CLASSES
+    serializer_class = BorrowSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ["borrowed_at", "due_at", "returned_at"]
+
+    def get_queryset(self):
+        # по умолчанию -borrowed_at, -id — индекс borrow_user_recent_idx
+        qs = Borrow.objects.filter(user=self.request.user)
+        if status_param := self.request.query_params.get("status"):
+            try:
+                qs = qs.with_status(status_param)
+            except ValueError:
+                raise ValidationError(
+                    {"status": f"Одно из: {', '.join(BORROW_STATUSES)}."}
+                )
+        return qs
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        counts = Borrow.objects.filter(user=self.request.user).counts()
+        response.data["counts"] = counts
+        return response
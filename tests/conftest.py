@@ -1,7 +1,15 @@
+from contextlib import ExitStack, contextmanager
+
 import pytest
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 
+from library.authentication import token_versions
+
 User = get_user_model()
 
 
@@ -16,6 +24,41 @@ def fast_password_hashers(settings):
     settings.PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # LocMemCache живёт весь процесс — изолируем тесты друг от друга
+    cache.clear()
+    token_versions.clear()
+    yield
+    cache.clear()
+    token_versions.clear()
+
+
+@pytest.fixture
+def query_budget():
+    """
+    ``with query_budget(3) as queries:`` — не больше 3 SQL по всем БД.
+    В ``queries`` — выполненные запросы; при превышении они же в ошибке.
+    """
+
+    @contextmanager
+    def budget(limit=None):
+        queries = []
+        with ExitStack() as stack:
+            contexts = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                # основная и подключённые реплики (см. library/replicas.py)
+                for alias in (DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS)
+            ]
+            yield queries
+        queries.extend(q["sql"] for ctx in contexts for q in ctx.captured_queries)
+        if limit is not None and len(queries) > limit:
+            listing = "\n".join(f"  {sql}" for sql in queries)
+            pytest.fail(f"{len(queries)} SQL при бюджете {limit}:\n{listing}")
+
+    return budget
+
+
 @pytest.fixture
 def user(db):
     return User.objects.create_user(
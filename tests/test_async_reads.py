@@ -0,0 +1,112 @@
+import pytest
+from asgiref.sync import async_to_sync
+from conftest import login_and_get_headers
+from django.core.cache import cache
+from django.test import AsyncClient
+from django.urls import include, path, resolve
+
+import library.urls
+from library.async_views import AsyncCatalogReadView, catalog_urlpatterns
+from library.models import Author, Book
+
+# URLconf с async-чтением каталога, как при ASYNC_CATALOG_READS=1
+urlpatterns = [
+    path("api/", include(catalog_urlpatterns() + library.urls.urlpatterns)),
+]
+
+
+@pytest.fixture
+def books(db):
+    author = Author.objects.create(
+        first_name="Лев", last_name="Толстой", birth_year=1828
+    )
+    for i in range(7):
+        Book.objects.create(
+            title=f"Том {i}",
+            author=author,
+            book_id=f"AS-{i}",
+            published_year=1860 + i,
+        )
+    return author
+
+
+def _get_both(client, settings, url, **headers):
+    sync = client.get(url, **headers)
+    cache.clear()
+    settings.ROOT_URLCONF = __name__
+    assert resolve(url.split("?")[0]).func.view_class is AsyncCatalogReadView
+    response = async_to_sync(AsyncClient().get)(url, **headers)
+    settings.ROOT_URLCONF = "config.urls"
+    return sync, response
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/api/books/",
+        "/api/books/?page_size=2&ordering=-published_year&count=true",
+        "/api/books/?fields=id,title&expand=author&available=true",
+        "/api/authors/",
+        "/api/books/?cursor=garbage",
+        "/api/books/?available=garbage",
+    ],
+)
+def test_async_list_matches_sync(client, settings, books, url):
+    sync, response = _get_both(client, settings, url)
+    assert response.status_code == sync.status_code
+    assert response.content == sync.content
+    assert response["Content-Type"] == sync["Content-Type"]
+
+
+@pytest.mark.django_db
+def test_async_detail_and_cursor(client, settings, books):
+    book = Book.objects.get(book_id="AS-3")
+    sync, response = _get_both(client, settings, f"/api/books/{book.id}/")
+    assert response.status_code == 200
+    assert response.content == sync.content
+
+    _, missing = _get_both(client, settings, "/api/books/999999/")
+    assert missing.status_code == 404
+
+    settings.ROOT_URLCONF = __name__
+    aclient = AsyncClient()
+    first = async_to_sync(aclient.get)("/api/books/?page_size=4").json()
+    second = async_to_sync(aclient.get)(first["next"]).json()
+    ids = [b["book_id"] for b in first["results"] + second["results"]]
+    assert ids == [f"AS-{i}" for i in range(7)]
+
+
+@pytest.mark.django_db
+def test_async_conditional_get_and_query_count(
+    settings, books, django_assert_num_queries
+):
+    settings.ROOT_URLCONF = __name__
+    aclient = AsyncClient()
+    with django_assert_num_queries(1):
+        first = async_to_sync(aclient.get)("/api/books/")
+    assert first.status_code == 200
+    again = async_to_sync(aclient.get)(
+        "/api/books/", headers={"If-None-Match": first["ETag"]}
+    )
+    assert again.status_code == 304
+
+
+@pytest.mark.django_db
+def test_writes_fall_back_to_viewset(api, settings, staff, books):
+    token = login_and_get_headers(api, "librarian", "Pass123456!")
+    headers = {"headers": {"Authorization": token["HTTP_AUTHORIZATION"]}}
+    settings.ROOT_URLCONF = __name__
+    aclient = AsyncClient()
+    payload = {"title": "Новая", "author": books.id, "book_id": "AS-NEW"}
+
+    anon = async_to_sync(aclient.post)("/api/books/", payload)
+    assert anon.status_code == 401
+
+    created = async_to_sync(aclient.post)(
+        "/api/books/", payload, content_type="application/json", **headers
+    )
+    assert created.status_code == 201
+    # запись инвалидирует кэш и для async-чтения
+    listing = async_to_sync(aclient.get)("/api/books/?count=true", **headers)
+    assert listing.json()["count"] == 8
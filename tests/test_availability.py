@@ -0,0 +1,133 @@
+import pytest
+
+from library.models import Author, Book
+
+DUE = "2099-12-31T23:59:00Z"
+
+
+@pytest.fixture(params=["subquery", "pointer"])
+def source(request, settings):
+    settings.AVAILABILITY_SOURCE = request.param
+    return request.param
+
+
+@pytest.fixture
+def books(db):
+    author = Author.objects.create(first_name="Лев", last_name="Толстой")
+    return [
+        Book.objects.create(title=f"Том {i}", author=author, book_id=f"AV-{i}")
+        for i in range(3)
+    ]
+
+
+def _checkout(api, book):
+    r = api.post("/api/borrows/", {"book": book.id, "due_at": DUE}, format="json")
+    assert r.status_code == 201
+    return r.json()["id"]
+
+
+@pytest.mark.django_db
+def test_available_filter_follows_checkout_and_return(
+    api, staff, books, source, django_assert_num_queries
+):
+    api.force_authenticate(staff)
+    borrow_id = _checkout(api, books[1])
+
+    with django_assert_num_queries(1):
+        results = api.get("/api/books/").json()["results"]
+    state = {b["book_id"]: (b["is_available"], b["current_due_at"]) for b in results}
+    assert state == {
+        "AV-0": (True, None),
+        "AV-1": (False, DUE),
+        "AV-2": (True, None),
+    }
+
+    r = api.get("/api/books/?available=false&fields=book_id")
+    assert r.json()["results"] == [{"book_id": "AV-1"}]
+    r = api.get("/api/books/?available=true&fields=book_id")
+    assert [b["book_id"] for b in r.json()["results"]] == ["AV-0", "AV-2"]
+    assert len(api.get("/api/books/?available=0").json()["results"]) == 1
+    # опечатка — не «недоступные», а ошибка
+    r = api.get("/api/books/?available=garbage")
+    assert r.status_code == 400
+    assert "available" in r.json()
+
+    # возврат сбрасывает закэшированный список
+    api.post(f"/api/borrows/{borrow_id}/return_book/")
+    assert api.get("/api/books/?available=false").json()["results"] == []
+    assert Book.objects.filter(active_borrow__isnull=False).count() == 0
+
+
+@pytest.mark.django_db
+def test_detail_and_write_responses_include_availability(api, staff, books):
+    api.force_authenticate(staff)
+    _checkout(api, books[0])
+
+    assert api.get(f"/api/books/{books[0].id}/").json()["is_available"] is False
+
+    # PATCH книги не затирает указатель на активную выдачу
+    r = api.patch(f"/api/books/{books[0].id}/", {"pages": 100}, format="json")
+    assert r.status_code == 200
+    assert r.json()["is_available"] is False
+    assert r.json()["current_due_at"] == DUE
+    books[0].refresh_from_db()
+    assert books[0].active_borrow_id is not None
+
+    r = api.post(
+        "/api/books/",
+        {"title": "Новая", "author": books[0].author_id, "book_id": "AV-NEW"},
+        format="json",
+    )
+    assert r.json()["is_available"] is True
+
+
+@pytest.mark.django_db
+def test_copy_held_for_reader_is_not_available(api, staff, user, books, source):
+    book = books[0]
+    api.force_authenticate(staff)
+    borrow_id = _checkout(api, book)
+    api.force_authenticate(user)
+    assert api.post(f"/api/books/{book.id}/reserve/").json()["status"] == "waiting"
+    api.force_authenticate(staff)
+    api.post(f"/api/borrows/{borrow_id}/return_book/")
+
+    # единственный экземпляр отложен для user1 — другим выдать нельзя
+    body = api.get(f"/api/books/{book.id}/").json()
+    assert (body["is_available"], body["available_copies"]) == (False, 0)
+    r = api.get("/api/books/?available=true&fields=book_id")
+    assert [b["book_id"] for b in r.json()["results"]] == ["AV-1", "AV-2"]
+    r = api.get("/api/books/?available=false&fields=book_id")
+    assert r.json()["results"] == [{"book_id": "AV-0"}]
+    assert (
+        api.post(
+            "/api/borrows/", {"book": book.id, "due_at": DUE}, format="json"
+        ).status_code
+        == 409
+    )
+    Book.objects.filter(pk=book.pk).sync_availability()
+    book.refresh_from_db()
+    assert book.available_copies == 0
+
+    # выдача получателю брони — экземпляр ушёл, счётчик не уходит в минус
+    r = api.post(
+        f"/api/borrows/?target_user={user.pk}",
+        {"book": book.id, "due_at": DUE},
+        format="json",
+    )
+    assert r.status_code == 201, r.content
+    body = api.get(f"/api/books/{book.id}/").json()
+    assert (body["is_available"], body["available_copies"]) == (False, 0)
+    api.post(f"/api/borrows/{r.json()['id']}/return_book/")
+    body = api.get(f"/api/books/{book.id}/").json()
+    assert (body["is_available"], body["available_copies"]) == (True, 1)
+
+
+@pytest.mark.django_db
+def test_hold_resets_cached_availability(api, user, books):
+    url = f"/api/books/{books[0].id}/"
+    assert api.get(url).json()["is_available"] is True
+    api.force_authenticate(user)
+    assert api.post(f"{url}reserve/").json()["status"] == "ready"
+    api.force_authenticate(None)
+    body = api.get(url).json()
+    assert (body["is_available"], body["available_copies"]) == (False, 0)
@@ -0,0 +1,131 @@
+import asyncio
+import json
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient
+from django.utils import timezone
+
+from library import live
+from library.models import Author, Book
+from library.services import checkout, checkout_batch, return_borrow
+
+
+@pytest.fixture
+def book(db):
+    author = Author.objects.create(first_name="Лев", last_name="Толстой")
+    return Book.objects.create(title="Война и мир", author=author, book_id="WM-1")
+
+
+def _parse(chunk):
+    event, data = chunk.decode().strip().split("\n")
+    assert event == "event: availability"
+    return json.loads(data.removeprefix("data: "))
+
+
+def _due():
+    return timezone.now() + timedelta(days=14)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_sends_snapshot_then_changes(book, user):
+    async def scenario():
+        response = await AsyncClient().get(f"/api/books/stream/?books={book.pk}")
+        assert response.status_code == 200
+        assert response["Content-Type"] == "text/event-stream"
+        events = aiter(response.streaming_content)
+        assert await anext(events) == b"retry: 3000\n\n"
+        snapshot = _parse(await anext(events))
+        assert snapshot == {
+            "book": book.pk,
+            "available_copies": 1,
+            "is_available": True,
+            "current_due_at": None,
+        }
+
+        # выдача в другом «запросе»: после коммита — событие в поток
+        borrow = await sync_to_async(checkout)(book, user, _due())
+        taken = _parse(await asyncio.wait_for(anext(events), 5))
+        assert (taken["available_copies"], taken["is_available"]) == (0, False)
+        assert taken["current_due_at"] is not None
+
+        await sync_to_async(return_borrow)(borrow.pk)
+        back = _parse(await asyncio.wait_for(anext(events), 5))
+        assert back["is_available"] is True
+
+        hub = live.get_hub()
+        assert set(hub.subscribers) == {book.pk}
+        # клиент отключился: ASGI-обработчик отменяет задачу ответа
+        waiting = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert not hub.subscribers
+
+    async_to_sync(scenario)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_idle_stream_sends_ping(book, settings):
+    settings.AVAILABILITY_STREAM_HEARTBEAT = 0.05
+
+    async def scenario():
+        response = await AsyncClient().get(f"/api/books/stream/?books={book.pk}")
+        events = aiter(response.streaming_content)
+        await anext(events)
+        await anext(events)
+        assert await asyncio.wait_for(anext(events), 5) == b": ping\n\n"
+        await events.aclose()
+
+    async_to_sync(scenario)()
+
+
+@pytest.fixture
+def published(settings, monkeypatch):
+    sent = []
+
+    class RecordingBroker(live.BaseBroker):
+        def publish(self, book_ids):
+            sent.append(book_ids)
+
+    monkeypatch.setitem(live._brokers, "recording", RecordingBroker())
+    settings.AVAILABILITY_BROKER = "recording"
+    return sent
+
+
+@pytest.mark.django_db
+def test_publishes_after_commit(
+    book, user, published, django_capture_on_commit_callbacks
+):
+    other = Book.objects.create(title="Анна Каренина", author=book.author, book_id="AK")
+    with django_capture_on_commit_callbacks() as callbacks:
+        borrow = checkout(book, user, _due())
+    # транзакция ещё не зафиксирована — подписчикам рано
+    assert published == []
+    for callback in callbacks:
+        callback()
+    assert published == [[book.pk]]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        checkout_batch([other.pk], user, _due())
+        return_borrow(borrow.pk)
+    assert published[1:] == [[other.pk], [book.pk]]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "query",
+    ["", "?books=", "?books=1,x", f"?books={','.join(map(str, range(1, 102)))}"],
+)
+def test_stream_rejects_bad_books(query):
+    response = async_to_sync(AsyncClient().get)(f"/api/books/stream/{query}")
+    assert response.status_code == 400
+    assert "books" in response.json()
+
+
+@pytest.mark.django_db
+def test_stream_needs_asgi(client, book):
+    response = client.get(f"/api/books/stream/?books={book.pk}")
+    assert response.status_code == 501
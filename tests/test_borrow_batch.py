@@ -0,0 +1,162 @@
+import pytest
+from conftest import login_and_get_headers
+
+from library.models import Author, Book, Borrow, DailyBookStat, Reservation
+from library.services import add_copy
+
+DUE = "2099-12-31T23:59:00Z"
+
+
+@pytest.fixture
+def shelf(db):
+    author = Author.objects.create(first_name="Антон", last_name="Чехов")
+    books = [
+        Book.objects.create(title=f"Рассказы {i}", author=author, book_id=f"BT-{i}")
+        for i in range(4)
+    ]
+    add_copy(books[0], "BT-0-2")
+    return books
+
+
+@pytest.fixture
+def desk(api, staff):
+    return login_and_get_headers(api, "librarian", "Pass123456!")
+
+
+def _batch(api, desk, books, **extra):
+    return api.post(
+        "/api/borrows/batch/",
+        {"books": books, "due_at": DUE, **extra},
+        format="json",
+        **desk,
+    )
+
+
+@pytest.mark.django_db
+def test_batch_checkout_in_bulk(api, desk, user, shelf, django_assert_max_num_queries):
+    ids = [shelf[0].pk, shelf[0].pk, shelf[1].pk, shelf[2].pk]
+    # пакет на 4 книги — не 4 x POST /api/borrows/; + точка сохранения и
+    # перепроверка очереди брони после блокировки экземпляров
+    with django_assert_max_num_queries(18):
+        r = _batch(api, desk, ids, user=user.pk)
+    assert r.status_code == 201, r.content
+    body = r.json()
+    assert (body["succeeded"], body["failed"]) == (4, 0)
+    assert [item["book"] for item in body["items"]] == ids
+    borrows = [item["borrow"] for item in body["items"]]
+    assert {b["user"] for b in borrows} == {user.pk}
+    # два экземпляра одного названия — разные
+    assert borrows[0]["copy"] != borrows[1]["copy"]
+
+    shelf[0].refresh_from_db()
+    assert shelf[0].available_copies == 0
+    assert shelf[0].active_borrow_id == borrows[0]["id"]
+    assert DailyBookStat.objects.get(book=shelf[0]).loans == 2
+    r = api.get("/api/books/?available=false&fields=book_id")
+    assert {b["book_id"] for b in r.json()["results"]} == {"BT-0", "BT-1", "BT-2"}
+
+
+@pytest.mark.django_db
+def test_batch_checkout_atomic_or_best_effort(api, desk, user, shelf):
+    _batch(api, desk, [shelf[1].pk])
+    ids = [shelf[2].pk, shelf[1].pk, 999999]
+
+    r = _batch(api, desk, ids)
+    assert r.status_code == 409
+    assert [(i["index"], i["code"]) for i in r.json()["items"]] == [
+        (1, "book_unavailable"),
+        (2, "not_found"),
+    ]
+    assert Borrow.objects.count() == 1
+
+    r = _batch(api, desk, ids, atomic=False)
+    assert r.status_code == 207
+    assert [i["status"] for i in r.json()["items"]] == ["created", "error", "error"]
+    assert Borrow.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_batch_checkout_respects_holds(api, desk, user, staff, shelf):
+    reader = login_and_get_headers(api, "user1", "Pass123456!")
+    api.post(f"/api/books/{shelf[3].pk}/reserve/", **reader)
+
+    r = _batch(api, desk, [shelf[3].pk, shelf[2].pk], atomic=False)
+    assert [i.get("code") for i in r.json()["items"]] == ["book_on_hold", None]
+
+    r = _batch(api, desk, [shelf[3].pk], user=user.pk)
+    assert r.status_code == 201
+    assert Reservation.objects.get().status == "fulfilled"
+
+
+@pytest.mark.django_db
+def test_return_batch(api, desk, user, staff, shelf, django_assert_max_num_queries):
+    r = _batch(api, desk, [b.pk for b in shelf], user=user.pk)
+    borrow_ids = [i["borrow"]["id"] for i in r.json()["items"]]
+    api.post(f"/api/books/{shelf[1].pk}/reserve/", **desk)
+
+    # + задача «книга ждёт вас» для брони, дошедшей до ready, отложенный
+    # экземпляр в available_copies и сдвиг оставшейся очереди
+    with django_assert_max_num_queries(19):
+        r = api.post(
+            "/api/borrows/return_batch/",
+            {"borrows": borrow_ids[:3]},
+            format="json",
+            **desk,
+        )
+    assert r.status_code == 200, r.content
+    assert all(i["status"] == "returned" for i in r.json()["items"])
+    assert Borrow.objects.filter(returned_at__isnull=True).count() == 1
+    shelf[0].refresh_from_db()
+    assert (shelf[0].available_copies, shelf[0].active_borrow_id) == (2, None)
+    assert DailyBookStat.objects.get(book=shelf[2]).returns == 1
+    # возвращённый экземпляр ушёл следующему в очереди
+    assert Reservation.objects.get(book=shelf[1]).status == "ready"
+
+    # повтор в atomic — отказ целиком, последний экземпляр не закрыт
+    r = api.post(
+        "/api/borrows/return_batch/",
+        {"borrows": [borrow_ids[3], borrow_ids[0]]},
+        format="json",
+        **desk,
+    )
+    assert r.status_code == 409
+    assert r.json()["items"][0]["code"] == "already_returned"
+    assert Borrow.objects.filter(returned_at__isnull=True).count() == 1
+
+    # по штрихкодам из ящика возврата
+    r = api.post(
+        "/api/borrows/return_batch/",
+        {"barcodes": ["BT-3", "NO-SUCH"], "atomic": False},
+        format="json",
+        **desk,
+    )
+    assert r.status_code == 207
+    items = r.json()["items"]
+    assert [(i["barcode"], i["status"]) for i in items] == [
+        ("BT-3", "returned"),
+        ("NO-SUCH", "error"),
+    ]
+    assert not Borrow.objects.filter(returned_at__isnull=True).exists()
+
+
+@pytest.mark.django_db
+def test_batch_validation_and_access(api, desk, user, shelf):
+    assert _batch(api, desk, []).status_code == 400
+    assert _batch(api, desk, [1] * 101).status_code == 400
+    r = api.post(
+        "/api/borrows/batch/",
+        {"books": [shelf[0].pk], "due_at": "2000-01-01T00:00:00Z"},
+        format="json",
+        **desk,
+    )
+    assert r.status_code == 400
+    r = api.post(
+        "/api/borrows/return_batch/",
+        {"borrows": [1], "barcodes": ["X"]},
+        format="json",
+        **desk,
+    )
+    assert r.status_code == 400
+
+    reader = login_and_get_headers(api, "user1", "Pass123456!")
+    assert _batch(api, reader, [shelf[0].pk]).status_code == 403
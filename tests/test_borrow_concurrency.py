@@ -0,0 +1,148 @@
+import threading
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from library.exceptions import BookUnavailable
+from library.models import Author, Book, Borrow
+from library.serializers import BorrowSerializer
+from library.services import checkout
+
+DUE = "2099-12-31T23:59:00Z"
+
+postgres_only = pytest.mark.skipif(
+    connection.vendor != "postgresql",
+    reason="нужен PostgreSQL: DJANGO_TEST_POSTGRES=1",
+)
+
+
+@pytest.fixture
+def book(db):
+    author = Author.objects.create(first_name="Лев", last_name="Толстой")
+    return Book.objects.create(title="Война и мир", author=author, book_id="CC-1")
+
+
+@pytest.mark.django_db
+def test_race_after_validation_returns_409(api, staff, user, book, monkeypatch):
+    api.force_authenticate(staff)
+    original = BorrowSerializer.validate
+
+    def validate_then_lose_race(self, attrs):
+        attrs = original(self, attrs)
+        # параллельный запрос успел выдать книгу после проверки
+        Borrow.objects.create(
+            book=book,
+            copy=book.copies.get(),
+            user=user,
+            due_at=timezone.now() + timedelta(days=1),
+        )
+        return attrs
+
+    monkeypatch.setattr(BorrowSerializer, "validate", validate_then_lose_race)
+    r = api.post("/api/borrows/", {"book": book.id, "due_at": DUE}, format="json")
+    assert r.status_code == 409
+    assert r.json()["detail"]
+    assert Borrow.objects.filter(book=book).count() == 1
+
+
+@pytest.mark.django_db
+def test_idempotent_checkout_replays_response(api, staff, book):
+    api.force_authenticate(staff)
+    payload = {"book": book.id, "due_at": DUE}
+    r1 = api.post(
+        "/api/borrows/", payload, format="json", HTTP_IDEMPOTENCY_KEY="kiosk-1"
+    )
+    r2 = api.post(
+        "/api/borrows/", payload, format="json", HTTP_IDEMPOTENCY_KEY="kiosk-1"
+    )
+    assert r1.status_code == r2.status_code == 201
+    assert r1.json() == r2.json()
+    assert r2["Idempotent-Replayed"] == "true"
+    assert Borrow.objects.count() == 1
+
+    # тот же ключ с другим телом — ошибка клиента
+    other = Book.objects.create(title="Другая", author=book.author, book_id="CC-2")
+    r3 = api.post(
+        "/api/borrows/",
+        {"book": other.id, "due_at": DUE},
+        format="json",
+        HTTP_IDEMPOTENCY_KEY="kiosk-1",
+    )
+    assert r3.status_code == 422
+
+    # повтор возврата с ключом не превращается в 400 «уже возвращена»
+    url = f"/api/borrows/{r1.json()['id']}/return_book/"
+    assert api.post(url, HTTP_IDEMPOTENCY_KEY="ret-1").status_code == 200
+    assert api.post(url, HTTP_IDEMPOTENCY_KEY="ret-1").status_code == 200
+    assert api.post(url).status_code == 400
+
+
+@pytest.mark.django_db
+def test_failed_request_does_not_burn_key(api, staff, book):
+    api.force_authenticate(staff)
+    bad = api.post(
+        "/api/borrows/",
+        {"book": book.id, "due_at": "2000-01-01T00:00:00Z"},
+        format="json",
+        HTTP_IDEMPOTENCY_KEY="k",
+    )
+    assert bad.status_code == 400
+    ok = api.post(
+        "/api/borrows/",
+        {"book": book.id, "due_at": DUE},
+        format="json",
+        HTTP_IDEMPOTENCY_KEY="k",
+    )
+    assert ok.status_code == 201
+
+
+def _run_concurrently(n, target):
+    barrier = threading.Barrier(n)
+    results = []
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(target())
+        except Exception as exc:
+            results.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+@postgres_only
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_checkouts_single_winner(book, staff):
+    due = timezone.now() + timedelta(days=14)
+    results = _run_concurrently(8, lambda: checkout(book, staff, due))
+    winners = [r for r in results if isinstance(r, Borrow)]
+    assert len(winners) == 1
+    assert all(isinstance(r, BookUnavailable) for r in results if r not in winners)
+    assert Borrow.objects.filter(book=book, returned_at__isnull=True).count() == 1
+
+
+@postgres_only
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_retries_with_same_key(book, staff):
+    def post():
+        client = APIClient()
+        client.force_authenticate(staff)
+        return client.post(
+            "/api/borrows/",
+            {"book": book.id, "due_at": DUE},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY="same",
+        ).status_code
+
+    assert _run_concurrently(5, post) == [201] * 5
+    assert Borrow.objects.count() == 1
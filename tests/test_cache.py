@@ -0,0 +1,78 @@
+import pytest
+from conftest import login_and_get_headers
+
+from library.models import Author, Book
+
+
+@pytest.fixture
+def book(db):
+    author = Author.objects.create(first_name="Лев", last_name="Толстой")
+    return Book.objects.create(title="Война и мир", author=author, book_id="C-1")
+
+
+@pytest.mark.django_db
+def test_repeated_list_served_from_cache(api, book, django_assert_num_queries):
+    first = api.get("/api/books/")
+    assert first.status_code == 200
+    with django_assert_num_queries(0):
+        second = api.get("/api/books/")
+    assert second.json() == first.json()
+    assert second["ETag"] == first["ETag"]
+
+
+@pytest.mark.django_db
+def test_query_params_are_normalized(api, book, django_assert_num_queries):
+    api.get("/api/books/?genre=&title=Война")
+    with django_assert_num_queries(0):
+        api.get("/api/books/?title=Война&genre=")
+    # другой набор параметров — другой ключ
+    with django_assert_num_queries(1):
+        api.get("/api/books/?title=Мир")
+
+
+@pytest.mark.django_db
+def test_etag_and_last_modified_give_304(api, book):
+    r = api.get(f"/api/books/{book.id}/")
+    assert r.status_code == 200
+    etag, last_modified = r["ETag"], r["Last-Modified"]
+
+    assert api.get(f"/api/books/{book.id}/", HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert (
+        api.get(
+            f"/api/books/{book.id}/", HTTP_IF_MODIFIED_SINCE=last_modified
+        ).status_code
+        == 304
+    )
+    assert (
+        api.get(f"/api/books/{book.id}/", HTTP_IF_NONE_MATCH='"stale"').status_code
+        == 200
+    )
+
+
+@pytest.mark.django_db
+def test_write_invalidates_list_and_detail(api, staff, book):
+    headers = login_and_get_headers(api, "librarian", "Pass123456!")
+    etag = api.get(f"/api/books/{book.id}/")["ETag"]
+    assert len(api.get("/api/books/").json()["results"]) == 1
+
+    r = api.patch(
+        f"/api/books/{book.id}/", {"title": "Анна Каренина"}, format="json", **headers
+    )
+    assert r.status_code == 200
+    detail = api.get(f"/api/books/{book.id}/", HTTP_IF_NONE_MATCH=etag)
+    assert detail.status_code == 200
+    assert detail.json()["title"] == "Анна Каренина"
+
+    Book.objects.create(title="Воскресение", author=book.author, book_id="C-2")
+    assert len(api.get("/api/books/").json()["results"]) == 2
+
+
+@pytest.mark.django_db
+def test_author_change_invalidates_books(api, book, django_assert_num_queries):
+    api.get("/api/books/")
+    api.get("/api/authors/")
+    book.author.save()
+    with django_assert_num_queries(1):
+        api.get("/api/books/")
+    with django_assert_num_queries(1):
+        api.get("/api/authors/")
@@ -0,0 +1,164 @@
+import io
+from datetime import timedelta
+
+import pytest
+from conftest import login_and_get_headers
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from library import changes
+from library.importers import CatalogImporter, iter_rows
+from library.models import Author, Book, ChangeEvent
+from library.services import checkout, checkout_batch, return_borrow_batch
+
+CSV_HEADER = (
+    "title,book_id,author_first_name,author_last_name,author_birth_year,"
+    "published_year,pages,genre,description\n"
+)
+
+
+@pytest.fixture
+def feed(api, staff):
+    headers = login_and_get_headers(api, "librarian", "Pass123456!")
+
+    def get(**params):
+        r = api.get("/api/changes/", params, **headers)
+        assert r.status_code == 200, r.content
+        return r.json()
+
+    return get
+
+
+def _actions(body):
+    return [(e["entity"], e["action"]) for e in body["results"]]
+
+
+@pytest.mark.django_db
+def test_feed_follows_catalog_and_loans_by_cursor(api, feed, user):
+    headers = login_and_get_headers(api, "librarian", "Pass123456!")
+    r = api.post(
+        "/api/authors/", {"first_name": "Иван", "last_name": "Бунин"}, **headers
+    )
+    author = r.json()["id"]
+    r = api.post(
+        "/api/books/",
+        {"title": "Тёмные аллеи", "author": author, "book_id": "TA-1"},
+        **headers,
+    )
+    book = Book.objects.get(pk=r.json()["id"])
+    api.patch(f"/api/books/{book.pk}/", {"pages": 300}, format="json", **headers)
+
+    first = feed(limit=2)
+    assert _actions(first) == [("author", "created"), ("book", "created")]
+    assert first["has_more"] is True
+    assert first["results"][1]["data"]["book_id"] == "TA-1"
+    assert first["results"][1]["data"]["author"] == author
+
+    # выдача и возврат через API, затем продолжение с курсора
+    borrow = checkout(book, user, timezone.now() + timedelta(days=7))
+    api.post(f"/api/borrows/{borrow.pk}/return_book/", **headers)
+    spare = Book.objects.create(title="Черновик", author_id=author, book_id="TA-2")
+    spare.delete()
+    rest = feed(since=first["next"])
+    assert _actions(rest) == [
+        ("book", "updated"),
+        ("borrow", "checked_out"),
+        ("borrow", "returned"),
+        ("book", "created"),
+        ("book", "deleted"),
+    ]
+    assert rest["results"][0]["data"]["pages"] == 300
+    assert rest["results"][1]["object_id"] == borrow.pk
+    assert rest["results"][1]["data"]["user"] == user.pk
+    assert rest["results"][2]["data"]["returned_at"] is not None
+    assert rest["results"][4]["object_id"] == rest["results"][3]["object_id"]
+    assert rest["has_more"] is False
+
+    # курсор конца: пусто, курсор не двигается
+    tail = feed(since=rest["next"])
+    assert tail == {"results": [], "next": rest["next"], "has_more": False}
+    assert feed(since="latest")["next"] == rest["next"]
+
+
+@pytest.mark.django_db
+def test_event_written_in_same_transaction(feed):
+    author = Author.objects.create(first_name="Лев", last_name="Толстой")
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            Book.objects.create(title="Воскресение", author=author, book_id="VS-1")
+            raise RuntimeError
+    assert _actions(feed()) == [("author", "created")]
+
+
+@pytest.mark.django_db
+def test_batches_and_import_write_events(feed, user):
+    author = Author.objects.create(first_name="Антон", last_name="Чехов")
+    books = [
+        Book.objects.create(title=f"Пьеса {i}", author=author, book_id=f"PL-{i}")
+        for i in range(2)
+    ]
+    cursor = feed(since="latest")["next"]
+    due = timezone.now() + timedelta(days=7)
+    results = checkout_batch([b.pk for b in books], user, due)
+    return_borrow_batch([r["borrow"].pk for r in results])
+    body = feed(since=cursor, entity="borrow")
+    assert (
+        _actions(body) == [("borrow", "checked_out")] * 2 + [("borrow", "returned")] * 2
+    )
+    # DjangoJSONEncoder пишет время с точностью до миллисекунд
+    assert {parse_datetime(e["data"]["due_at"]) for e in body["results"]} == {
+        due.replace(microsecond=due.microsecond // 1000 * 1000)
+    }
+
+    cursor = body["next"]
+    csv = (
+        CSV_HEADER
+        + "Чайка,PL-0,Антон,Чехов,,1896,,пьеса,\n"
+        + "Бесы,BS-1,Фёдор,Достоевский,,1872,,роман,\n"
+    )
+    CatalogImporter().run(iter_rows(io.StringIO(csv), "csv"))
+    body = feed(since=cursor)
+    assert sorted(_actions(body)) == [
+        ("author", "created"),
+        ("book", "created"),
+        ("book", "updated"),
+    ]
+    updated = next(e for e in body["results"] if e["action"] == "updated")
+    assert updated["object_id"] == books[0].pk
+    assert updated["data"]["title"] == "Чайка"
+
+
+@pytest.mark.django_db
+def test_long_poll_returns_when_event_arrives(feed, monkeypatch):
+    cursor = feed(since="latest")["next"]
+    sleeps = []
+
+    def sleep(seconds):
+        # «другой процесс» пишет событие, пока запрос ждёт
+        sleeps.append(seconds)
+        Author.objects.create(first_name="Марина", last_name="Цветаева")
+
+    monkeypatch.setattr(changes.time, "sleep", sleep)
+    body = feed(since=cursor, wait=5)
+    assert _actions(body) == [("author", "created")]
+    assert len(sleeps) == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "params",
+    [{"since": "abc"}, {"limit": "0"}, {"wait": "999"}, {"entity": "copy"}],
+)
+def test_feed_rejects_bad_params(api, staff, params):
+    headers = login_and_get_headers(api, "librarian", "Pass123456!")
+    r = api.get("/api/changes/", params, **headers)
+    assert r.status_code == 400
+    assert set(r.json()) == set(params)
+
+
+@pytest.mark.django_db
+def test_feed_is_staff_only(api, user):
+    headers = login_and_get_headers(api, "user1", "Pass123456!")
+    assert api.get("/api/changes/", **headers).status_code == 403
+    assert ChangeEvent.objects.count() == 0
@@ -0,0 +1,254 @@
+import threading
+from datetime import timedelta
+
+import pytest
+from conftest import login_and_get_headers
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from library import services
+from library.exceptions import BookOnHold
+from library.models import Author, Book, Borrow, Copy, Reservation
+from library.reservations import reserve
+from library.services import add_copy, checkout, checkout_batch
+
+DUE = "2099-12-31T23:59:00Z"
+
+User = get_user_model()
+
+
+@pytest.fixture
+def textbook(db):
+    author = Author.objects.create(first_name="Григорий", last_name="Фихтенгольц")
+    book = Book.objects.create(title="Курс анализа", author=author, book_id="CP-1")
+    for n in (2, 3):
+        add_copy(book, f"CP-1-{n}")
+    return book
+
+
+def _checkout(api, headers, book, **extra):
+    return api.post(
+        "/api/borrows/", {"book": book.pk, "due_at": DUE, **extra}, **headers
+    )
+
+
+def _book(api, book):
+    return api.get(f"/api/books/{book.pk}/").json()
+
+
+@pytest.mark.django_db
+def test_checkout_takes_free_copies_until_none_left(api, staff, textbook):
+    headers = login_and_get_headers(api, "librarian", "Pass123456!")
+    assert _book(api, textbook)["available_copies"] == 3
+
+    taken = []
+    for left in (2, 1, 0):
+        r = _checkout(api, headers, textbook)
+        assert r.status_code == 201, r.content
+        taken.append(r.json()["copy"])
+        body = _book(api, textbook)
+        assert body["available_copies"] == left
+        assert body["is_available"] is (left > 0)
+    assert len(set(taken)) == 3
+    # в поиске по-прежнему одна книга
+    assert api.get("/api/books/?q=анализа").json()["results"][0]["id"] == textbook.pk
+
+    assert _checkout(api, headers, textbook).status_code == 400
+
+    borrow = Borrow.objects.get(copy_id=taken[1])
+    api.post(f"/api/borrows/{borrow.pk}/return_book/", **headers)
+    body = _book(api, textbook)
+    assert (body["available_copies"], body["is_available"]) == (1, True)
+    r = _checkout(api, headers, textbook)
+    assert r.json()["copy"] == taken[1]
+
+
+@pytest.mark.django_db
+def test_specific_copy_and_copies_endpoint(api, staff, user, textbook):
+    headers = login_and_get_headers(api, "librarian", "Pass123456!")
+    other = Book.objects.create(title="Другая", author=textbook.author, book_id="CP-2")
+    second = Copy.objects.get(barcode="CP-1-2")
+
+    r = _checkout(api, headers, textbook, copy=other.copies.get().pk)
+    assert r.status_code == 400
+    assert _checkout(api, headers, textbook, copy=second.pk).json()["copy"] == (
+        second.pk
+    )
+    assert _checkout(api, headers, textbook, copy=second.pk).status_code == 400
+
+    r = api.get(f"/api/books/{textbook.pk}/copies/")
+    assert [(c["barcode"], c["is_available"]) for c in r.json()] == [
+        ("CP-1", True),
+        ("CP-1-2", False),
+        ("CP-1-3", True),
+    ]
+
+    r = api.post(f"/api/books/{textbook.pk}/copies/", {"barcode": "CP-1-4"}, **headers)
+    assert r.status_code == 201
+    assert _book(api, textbook)["available_copies"] == 3
+    r = api.post(f"/api/books/{textbook.pk}/copies/", {"barcode": "CP-1-4"}, **headers)
+    assert r.status_code == 400
+    user_headers = login_and_get_headers(api, "user1", "Pass123456!")
+    r = api.post(
+        f"/api/books/{textbook.pk}/copies/", {"barcode": "CP-1-5"}, **user_headers
+    )
+    assert r.status_code == 403
+
+
+@pytest.mark.django_db
+def test_holds_are_per_copy(api, staff, textbook):
+    readers = [
+        User.objects.create_user(username=f"reader{i}", password="Pass123456!")
+        for i in range(4)
+    ]
+    due = timezone.now() + timedelta(days=7)
+    for _ in range(3):
+        checkout(textbook, readers[3], due)
+    for reader in readers[:3]:
+        r = api.post(
+            f"/api/books/{textbook.pk}/reserve/",
+            **login_and_get_headers(api, reader.username, "Pass123456!"),
+        )
+        assert r.json()["status"] == "waiting"
+
+    # два возвращённых экземпляра — две брони ready, третий ждёт
+    headers = login_and_get_headers(api, "librarian", "Pass123456!")
+    for borrow in Borrow.objects.filter(book=textbook)[:2]:
+        api.post(f"/api/borrows/{borrow.pk}/return_book/", **headers)
+    statuses = dict(Reservation.objects.values_list("user__username", "status"))
+    assert statuses == {"reader0": "ready", "reader1": "ready", "reader2": "waiting"}
+    r = api.post(
+        f"/api/borrows/?target_user={staff.pk}",
+        {"book": textbook.pk, "due_at": DUE},
+        **headers,
+    )
+    assert r.status_code == 409
+
+    # новый экземпляр сразу уходит следующему в очереди
+    add_copy(textbook, "CP-1-NEW")
+    assert Reservation.objects.get(user=readers[2]).status == "ready"
+
+
+@pytest.fixture
+def late_hold(monkeypatch, textbook, staff, user):
+    """
+    Свободен один экземпляр, и бронь на него закоммичена между первой
+    проверкой очереди и блокировкой экземпляра: первая проверка её не видит.
+    """
+    due = timezone.now() + timedelta(days=7)
+    for _ in range(2):
+        checkout(textbook, staff, due)
+    hold = reserve(textbook, user)
+    assert hold.status == "ready"
+    real, calls = services._queued, []
+
+    def queued(book_ids):
+        calls.append(book_ids)
+        return set() if len(calls) == 1 else real(book_ids)
+
+    monkeypatch.setattr(services, "_queued", queued)
+    reader = User.objects.create_user(username="walkin", password="Pass123456!")
+    return hold, reader, due
+
+
+@pytest.mark.django_db
+def test_checkout_rechecks_queue_after_taking_copy(late_hold):
+    hold, reader, due = late_hold
+    with pytest.raises(BookOnHold):
+        checkout(hold.book, reader, due)
+    hold.refresh_from_db()
+    assert hold.status == "ready"
+    assert checkout(hold.book, hold.user, due).user == hold.user
+
+
+@pytest.mark.django_db
+def test_batch_checkout_rechecks_queue_after_taking_copies(late_hold):
+    hold, reader, due = late_hold
+    [item] = checkout_batch([hold.book_id], reader, due, atomic=False)
+    assert item["status"] == "error"
+    assert not Borrow.objects.filter(user=reader).exists()
+    hold.refresh_from_db()
+    assert hold.status == "ready"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_counters_are_written_after_checkout_commits(monkeypatch, textbook, staff):
+    # строка книги и агрегаты общие для всех выдач названия — не в транзакции выдачи
+    in_transaction, real = [], services.record_loans
+
+    def record_loans(books, day=None):
+        in_transaction.append(transaction.get_connection().in_atomic_block)
+        return real(books, day)
+
+    monkeypatch.setattr(services, "record_loans", record_loans)
+    due = timezone.now() + timedelta(days=7)
+    checkout(textbook, staff, due)
+    checkout_batch([textbook.pk, textbook.pk], staff, due)
+    assert in_transaction == [False, False]
+    textbook.refresh_from_db()
+    assert textbook.available_copies == 0
+    assert textbook.active_borrow.user == staff
+
+
+@pytest.mark.django_db
+def test_pointer_follows_earliest_due_date(settings, textbook, staff, user):
+    now = timezone.now()
+    checkout(textbook, staff, now + timedelta(days=10))
+    checkout(textbook, user, now + timedelta(days=2))
+    checkout_batch([textbook.pk], user, now + timedelta(days=1))
+
+    due = {}
+    for source in ("subquery", "pointer"):
+        settings.AVAILABILITY_SOURCE = source
+        due[source] = Book.objects.with_availability().get(pk=textbook.pk)
+    assert due["pointer"].current_due_at == due["subquery"].current_due_at
+    assert due["pointer"].current_due_at == now + timedelta(days=1)
+
+
+@pytest.mark.django_db
+def test_sync_availability_repairs_counters(textbook, user):
+    Borrow.objects.create(
+        book=textbook,
+        copy=textbook.copies.first(),
+        user=user,
+        due_at=timezone.now() + timedelta(days=1),
+    )
+    Book.objects.filter(pk=textbook.pk).update(available_copies=3, active_borrow=None)
+    Book.objects.filter(pk=textbook.pk).sync_availability()
+    textbook.refresh_from_db()
+    assert textbook.available_copies == 2
+    assert textbook.active_borrow.copy_id == textbook.copies.first().pk
+
+
+postgres_only = pytest.mark.skipif(
+    connection.vendor != "postgresql",
+    reason="нужен PostgreSQL: DJANGO_TEST_POSTGRES=1",
+)
+
+
+@postgres_only
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_checkouts_take_different_copies(textbook, staff):
+    due = timezone.now() + timedelta(days=14)
+    barrier = threading.Barrier(3)
+    results = []
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(checkout(textbook, staff, due))
+        except Exception as exc:
+            results.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(isinstance(r, Borrow) for r in results)
+    assert len({r.copy_id for r in results}) == 3
+    textbook.refresh_from_db()
+    assert textbook.available_copies == 0
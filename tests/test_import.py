@@ -0,0 +1,153 @@
+import io
+import json
+
+import pytest
+from conftest import login_and_get_headers
+from django.core.management import call_command
+
+from library.importers import CatalogImporter, iter_rows
+from library.models import Author, Book, ChangeEvent
+
+CSV_HEADER = (
+    "title,book_id,author_first_name,author_last_name,author_birth_year,"
+    "published_year,pages,genre,description\n"
+)
+
+
+@pytest.mark.django_db
+def test_bulk_csv_upsert_and_row_errors(api, staff):
+    headers = login_and_get_headers(api, "librarian", "Pass123456!")
+    Author.objects.create(first_name="Лев", last_name="Толстой", birth_year=1828)
+    Book.objects.create(
+        title="Старое название",
+        author=Author.objects.create(first_name="X", last_name="Y"),
+        book_id="WP-1",
+    )
+    body = CSV_HEADER + (
+        "Война и мир,WP-1,Лев,Толстой,1828,1869,1225,роман,Эпопея\n"
+        "Анна Каренина,AK-1,Лев,Толстой,1828,1877,864,роман,\n"
+        "Без страниц,BAD-1,Лев,Толстой,1828,1877,0,,\n"
+        ",BAD-2,Фёдор,Достоевский,,,,,\n"
+        "Бесы,BS-1,Фёдор,Достоевский,,1872,,роман,\n"
+    )
+    r = api.post("/api/books/bulk/", body, content_type="text/csv", **headers)
+    assert r.status_code == 200, r.content
+    report = r.json()
+    assert report["processed"] == 5
+    assert report["upserted"] == 3
+    assert report["authors_created"] == 1
+    assert [(e["line"], list(e["errors"])) for e in report["errors"]] == [
+        (4, ["pages"]),
+        (5, ["title"]),
+    ]
+
+    book = Book.objects.select_related("author").get(book_id="WP-1")
+    assert book.title == "Война и мир" and book.author.last_name == "Толстой"
+    assert Author.objects.filter(last_name="Толстой").count() == 1
+    assert Book.objects.get(book_id="BS-1").author.birth_year is None
+
+
+@pytest.mark.django_db
+def test_bulk_jsonl_nested_author(api, staff):
+    headers = login_and_get_headers(api, "librarian", "Pass123456!")
+    lines = [
+        {
+            "title": "1984",
+            "book_id": "O-1",
+            "author": {"first_name": "George", "last_name": "Orwell"},
+        },
+        "not json",
+        {
+            "title": "Animal Farm",
+            "book_id": "O-2",
+            "author_first_name": "George",
+            "author_last_name": "Orwell",
+            "pages": "112",
+        },
+    ]
+    body = "\n".join(x if isinstance(x, str) else json.dumps(x) for x in lines)
+    r = api.post(
+        "/api/books/bulk/", body, content_type="application/x-ndjson", **headers
+    )
+    assert r.status_code == 200, r.content
+    assert r.json()["upserted"] == 2
+    assert r.json()["errors"][0]["line"] == 2
+    assert Author.objects.get(last_name="Orwell").books.count() == 2
+
+
+@pytest.mark.django_db
+def test_bulk_requires_staff_and_known_format(api, user, staff):
+    h_user = login_and_get_headers(api, "user1", "Pass123456!")
+    r = api.post("/api/books/bulk/", CSV_HEADER, content_type="text/csv", **h_user)
+    assert r.status_code == 403
+
+    h_staff = login_and_get_headers(api, "librarian", "Pass123456!")
+    r = api.post("/api/books/bulk/", "x", content_type="text/plain", **h_staff)
+    assert r.status_code == 415
+
+
+@pytest.mark.django_db
+def test_importer_queries_scale_with_batches(django_assert_max_num_queries):
+    rows = (
+        (
+            i,
+            {
+                "title": f"Книга {i}",
+                "book_id": f"N-{i}",
+                "author_first_name": "Автор",
+                "author_last_name": f"Фамилия {i % 7}",
+            },
+        )
+        for i in range(1, 251)
+    )
+    # 3 пачки: на каждую поиск/создание авторов + один upsert книг
+    with django_assert_max_num_queries(3 * 8):
+        report = CatalogImporter(batch_size=100).run(rows)
+    assert report["upserted"] == 250
+    assert Book.objects.count() == 250
+
+
+@pytest.mark.django_db
+def test_import_catalog_command(tmp_path):
+    path = tmp_path / "feed.csv"
+    path.write_text(
+        CSV_HEADER + "Мы,Z-1,Евгений,Замятин,1884,1920,,,\n", encoding="utf-8"
+    )
+    call_command("import_catalog", str(path))
+    assert Book.objects.get(book_id="Z-1").author.last_name == "Замятин"
+
+    with open(path, "rb") as stream:
+        assert [row["book_id"] for _, row in iter_rows(stream, "csv")] == ["Z-1"]
+
+
+@pytest.mark.django_db
+def test_authors_created_counts_only_own_inserts(monkeypatch):
+    fetch = CatalogImporter._fetch_authors
+    raced = []
+
+    def racing_fetch(keys):
+        if not raced:
+            # между нашим SELECT и INSERT автора вставил параллельный импорт
+            raced.append(
+                Author.objects.create(
+                    first_name="Николай", last_name="Гоголь", birth_year=1809
+                )
+            )
+            return {}
+        return fetch(keys)
+
+    monkeypatch.setattr(CatalogImporter, "_fetch_authors", staticmethod(racing_fetch))
+    csv = (
+        CSV_HEADER
+        + "Нос,GN-1,Николай,Гоголь,1809,1836,,,\n"
+        + "Муму,IT-1,Иван,Тургенев,1818,1854,,,\n"
+    )
+    report = CatalogImporter().run(iter_rows(io.StringIO(csv), "csv"))
+    assert report["upserted"] == 2
+    assert report["authors_created"] == 1
+    assert Book.objects.get(book_id="GN-1").author_id == raced[0].pk
+    # событие о создании Гоголя — одно, от того, кто его вставил
+    created = ChangeEvent.objects.filter(entity="author", action="created")
+    assert sorted(created.values_list("object_id", flat=True)) == sorted(
+        Author.objects.values_list("pk", flat=True)
+    )
@@ -0,0 +1,116 @@
+import time
+from datetime import timedelta
+
+import pytest
+from conftest import login_and_get_headers
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from library.authentication import revoke_tokens, token_versions
+from library.models import Author, Book, Borrow
+
+
+def _user_queries(ctx):
+    return [q["sql"] for q in ctx.captured_queries if '"auth_user"' in q["sql"]]
+
+
+@pytest.mark.django_db
+def test_token_claims_and_no_user_query(api, user):
+    headers = login_and_get_headers(api, "user1", "Pass123456!")
+    token = AccessToken(headers["HTTP_AUTHORIZATION"].split()[1])
+    assert token["username"] == "user1"
+    assert token["is_staff"] is False
+    assert token["ver"] == 0
+
+    api.get("/api/borrows/", **headers)  # версия попадает в LRU
+    with CaptureQueriesContext(connection) as ctx:
+        r = api.get("/api/borrows/", **headers)
+    assert r.status_code == 200
+    assert _user_queries(ctx) == []
+
+    # профиль — из БД, а не из токена
+    r = api.get("/api/auth/me/", **headers)
+    assert r.json()["email"] == "user1@example.com"
+
+
+@pytest.mark.django_db
+def test_owner_check_with_claims_user(api, user, staff):
+    author = Author.objects.create(first_name="Лев", last_name="Толстой")
+    book = Book.objects.create(title="Война и мир", author=author, book_id="JW-1")
+    borrow = Borrow.objects.create(
+        book=book, user=user, due_at=timezone.now() + timedelta(days=7)
+    )
+    headers = login_and_get_headers(api, "user1", "Pass123456!")
+    assert api.get(f"/api/borrows/{borrow.id}/", **headers).status_code == 200
+
+
+@pytest.mark.django_db
+def test_staff_demotion_revokes_tokens(api, staff, settings):
+    settings.AUTH_TOKEN_VERSION_TTL = 0
+    headers = login_and_get_headers(api, "librarian", "Pass123456!")
+    assert api.get("/api/books/export/?format=csv", **headers).status_code == 200
+
+    staff.is_staff = False
+    staff.save()
+    r = api.get("/api/books/export/?format=csv", **headers)
+    assert r.status_code == 401
+
+    fresh = login_and_get_headers(api, "librarian", "Pass123456!")
+    assert api.get("/api/books/export/?format=csv", **fresh).status_code == 403
+
+
+@pytest.mark.django_db
+def test_revocation_takes_effect_within_ttl(api, user, settings, monkeypatch):
+    settings.AUTH_TOKEN_VERSION_TTL = 30
+    headers = login_and_get_headers(api, "user1", "Pass123456!")
+    assert api.get("/api/borrows/", **headers).status_code == 200
+
+    # другой процесс отозвал токены: здесь старая версия ещё в LRU
+    revoke_tokens(user.pk)
+    token_versions.set(user.pk, 0)
+    assert api.get("/api/borrows/", **headers).status_code == 200
+
+    clock = time.monotonic() + 31
+    monkeypatch.setattr("library.authentication.time.monotonic", lambda: clock)
+    assert api.get("/api/borrows/", **headers).status_code == 401
+
+
+@pytest.mark.django_db
+def test_deactivation_and_password_change(api, user):
+    headers = login_and_get_headers(api, "user1", "Pass123456!")
+    user.set_password("NewPass123456!")
+    user.save()
+    assert api.get("/api/borrows/", **headers).status_code == 401
+
+    headers = login_and_get_headers(api, "user1", "NewPass123456!")
+    user.is_active = False
+    user.save(update_fields=["is_active"])
+    assert api.get("/api/borrows/", **headers).status_code == 401
+
+
+@pytest.mark.django_db
+def test_refresh_checks_version(api, user):
+    r = api.post(
+        "/api/auth/jwt/create/",
+        {"username": "user1", "password": "Pass123456!"},
+        format="json",
+    )
+    refresh = r.json()["refresh"]
+    r = api.post("/api/auth/jwt/refresh/", {"refresh": refresh}, format="json")
+    assert r.status_code == 200
+    assert AccessToken(r.json()["access"])["ver"] == 0
+
+    revoke_tokens(user.pk)
+    r = api.post("/api/auth/jwt/refresh/", {"refresh": refresh}, format="json")
+    assert r.status_code == 401
+
+
+@pytest.mark.django_db
+def test_legacy_token_without_claims_uses_db(api, user):
+    access = RefreshToken.for_user(user).access_token
+    with CaptureQueriesContext(connection) as ctx:
+        r = api.get("/api/borrows/", HTTP_AUTHORIZATION=f"Bearer {access}")
+    assert r.status_code == 200
+    assert _user_queries(ctx)
@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+import pytest
+from conftest import login_and_get_headers
+from django.utils import timezone
+
+from library.models import Author, Book, Borrow
+
+
+@pytest.fixture
+def history(user, staff):
+    author = Author.objects.create(first_name="Лев", last_name="Толстой")
+    now = timezone.now()
+    books = [
+        Book.objects.create(title=f"Том {i}", author=author, book_id=f"MB-{i}")
+        for i in range(5)
+    ]
+    # 2 возвращены, 1 на руках, 1 просрочена; одна выдача — чужая
+    rows = [
+        (books[0], user, now - timedelta(days=30), now - timedelta(days=20)),
+        (books[1], user, now - timedelta(days=25), now - timedelta(days=10)),
+        (books[2], user, now - timedelta(days=3), None),
+        (books[3], user, now - timedelta(days=20), None),
+        (books[4], staff, now - timedelta(days=1), None),
+    ]
+    return [
+        Borrow.objects.create(
+            book=book,
+            user=owner,
+            borrowed_at=borrowed_at,
+            due_at=borrowed_at + timedelta(days=14),
+            returned_at=returned_at,
+        )
+        for book, owner, borrowed_at, returned_at in rows
+    ]
+
+
+@pytest.mark.django_db
+def test_my_borrows_list_and_counts(api, history, django_assert_num_queries):
+    headers = login_and_get_headers(api, "user1", "Pass123456!")
+    api.get("/api/auth/me/", **headers)  # версия токена — в LRU
+
+    with django_assert_num_queries(2):  # страница + счётчики
+        r = api.get("/api/auth/me/borrows/", **headers)
+    assert r.status_code == 200
+    body = r.json()
+    # новые сверху, чужих нет
+    assert [row["id"] for row in body["results"]] == [
+        history[2].id,
+        history[3].id,
+        history[1].id,
+        history[0].id,
+    ]
+    assert body["counts"] == {"total": 4, "active": 2, "returned": 2, "overdue": 1}
+
+    r = api.get("/api/auth/me/borrows/?status=overdue", **headers)
+    assert [row["id"] for row in r.json()["results"]] == [history[3].id]
+    r = api.get("/api/auth/me/borrows/?status=returned", **headers)
+    assert len(r.json()["results"]) == 2
+    assert api.get("/api/auth/me/borrows/?status=lost", **headers).status_code == 400
+
+
+@pytest.mark.django_db
+def test_my_borrows_pages_by_cursor(api, history):
+    headers = login_and_get_headers(api, "user1", "Pass123456!")
+    r = api.get("/api/auth/me/borrows/?page_size=3", **headers)
+    first = r.json()
+    assert len(first["results"]) == 3
+    second = api.get(first["next"], **headers).json()
+    assert [row["id"] for row in second["results"]] == [history[0].id]
+    assert second["counts"]["total"] == 4
+
+
+@pytest.mark.django_db
+def test_me_embeds_counts(api, history, staff, django_assert_num_queries):
+    headers = login_and_get_headers(api, "user1", "Pass123456!")
+    api.get("/api/auth/me/", **headers)
+    with django_assert_num_queries(1):
+        r = api.get("/api/auth/me/", **headers)
+    assert r.json()["active_count"] == 2
+    assert r.json()["overdue_count"] == 1
+
+    # у персонала в /me/borrows/ — только свои выдачи
+    headers = login_and_get_headers(api, "librarian", "Pass123456!")
+    r = api.get("/api/auth/me/borrows/", **headers)
+    assert [row["id"] for row in r.json()["results"]] == [history[4].id]
+    assert api.get("/api/auth/me/", **headers).json()["active_count"] == 1
+
+
+@pytest.mark.django_db
+def test_my_borrows_requires_auth(api):
+    assert api.get("/api/auth/me/borrows/").status_code == 401
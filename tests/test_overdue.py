@@ -0,0 +1,104 @@
+import io
+import json
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+
+from library.models import Author, Book, Borrow
+from library.notifiers import ConsoleNotifier, EmailNotifier
+from library.overdue import iter_overdue_batches, scan_overdue
+
+
+@pytest.fixture
+def loans(db, user, staff):
+    author = Author.objects.create(first_name="Лев", last_name="Толстой")
+    now = timezone.now()
+    due = now - timedelta(days=3)
+
+    def lend(i, who, due_at, returned=False):
+        book = Book.objects.create(title=f"Том {i}", author=author, book_id=f"OD-{i}")
+        return Borrow.objects.create(
+            book=book,
+            user=who,
+            borrowed_at=now - timedelta(days=30),
+            due_at=due_at,
+            returned_at=now if returned else None,
+        )
+
+    overdue = [
+        # одинаковый due_at — курсору нужен id как tie-breaker
+        lend(0, user, due),
+        lend(1, staff, due),
+        lend(2, user, due),
+        lend(3, user, now - timedelta(days=1)),
+    ]
+    lend(4, user, now + timedelta(days=7))  # срок не вышел
+    lend(5, user, due, returned=True)  # уже вернули
+    return overdue
+
+
+@pytest.mark.django_db
+def test_overdue_endpoint(api, user, staff, loans, django_assert_num_queries):
+    api.force_authenticate(staff)
+    with django_assert_num_queries(1):
+        r = api.get("/api/borrows/overdue/")
+    assert r.status_code == 200
+    assert [b["id"] for b in r.json()["results"]] == [b.id for b in loans]
+
+    api.force_authenticate(user)
+    r = api.get("/api/borrows/overdue/")
+    assert [b["id"] for b in r.json()["results"]] == [
+        b.id for b in loans if b.user_id == user.id
+    ]
+
+
+@pytest.mark.django_db
+def test_batches_walk_every_overdue_loan_once(loans):
+    batches = list(iter_overdue_batches(batch_size=3))
+    assert [len(b) for b in batches] == [3, 1]
+    assert [row["id"] for b in batches for row in b] == [b.id for b in loans]
+
+
+@pytest.mark.django_db
+def test_scan_groups_per_user_and_notifies(loans, user, staff):
+    out = io.StringIO()
+    report = scan_overdue(ConsoleNotifier(stream=out), batch_size=100)
+    assert report == {"batches": 1, "borrows": 4, "notices": 2}
+    lines = out.getvalue().splitlines()
+    assert lines == [
+        f"{user.username}: просрочено 3 — Том 0, Том 2, Том 3",
+        f"{staff.username}: просрочено 1 — Том 1",
+    ]
+
+    Borrow.objects.filter(user=staff).update(returned_at=timezone.now())
+    user.email = "reader@example.com"
+    user.save()
+    scan_overdue(EmailNotifier())
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].to == ["reader@example.com"]
+    assert "OD-3" in mail.outbox[0].body
+
+
+@pytest.mark.django_db
+def test_scan_overdue_command_file_notifier(tmp_path, settings, loans):
+    settings.OVERDUE_NOTIFIER_FILE = str(tmp_path / "overdue.jsonl")
+    err = io.StringIO()
+    call_command(
+        "scan_overdue",
+        "--batch-size",
+        "2",
+        "--notifier",
+        "library.notifiers.FileNotifier",
+        stderr=err,
+    )
+    notices = [
+        json.loads(line)
+        for line in (tmp_path / "overdue.jsonl").read_text().splitlines()
+    ]
+    assert sum(len(n["borrows"]) for n in notices) == 4
+    assert all(b["days_overdue"] >= 1 for n in notices for b in n["borrows"])
+    assert "Просрочено выдач: 4" in err.getvalue()
+    assert "батчей: 2" in err.getvalue()
@@ -0,0 +1,90 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from library.models import Author, Book
+
+
+@pytest.fixture
+def catalog(db):
+    author = Author.objects.create(first_name="Лев", last_name="Толстой")
+    years = [1900, None, 1869, 1900, None, 1877, 1900, 1869, None, 1912, 1900, 1886]
+    for i, year in enumerate(years):
+        # одинаковые названия — проверяем tie-breaker по id
+        Book.objects.create(
+            title=f"Книга {i % 4}",
+            author=author,
+            book_id=f"PG-{i:02d}",
+            published_year=year,
+        )
+    return author
+
+
+def _walk(api, url):
+    ids, pages = [], 0
+    while url:
+        r = api.get(url)
+        assert r.status_code == 200, r.content
+        body = r.json()
+        assert "count" not in body
+        ids += [b["id"] for b in body["results"]]
+        url = body["next"]
+        pages += 1
+    return ids, pages
+
+
+@pytest.mark.django_db
+def test_cursor_walk_matches_full_ordering(api, catalog):
+    ids, pages = _walk(api, "/api/books/")
+    expected = list(Book.objects.order_by("title", "id").values_list("id", flat=True))
+    assert ids == expected
+    assert pages == 3
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("ordering", ["published_year", "-published_year", "-title"])
+def test_cursor_stable_for_client_ordering(api, catalog, ordering):
+    ids, _ = _walk(api, f"/api/books/?ordering={ordering}&page_size=2")
+    assert len(ids) == len(set(ids)) == Book.objects.count()
+
+
+@pytest.mark.django_db
+def test_previous_link_returns_same_page(api, catalog):
+    first = api.get("/api/books/?page_size=4").json()
+    assert first["previous"] is None
+    second = api.get(first["next"]).json()
+    back = api.get(second["previous"]).json()
+    assert [b["id"] for b in back["results"]] == [b["id"] for b in first["results"]]
+
+
+@pytest.mark.django_db
+def test_count_only_on_request(api, catalog):
+    with CaptureQueriesContext(connection) as ctx:
+        r = api.get("/api/books/")
+    assert "count" not in r.json()
+    # COUNT по экземплярам и броням одной книги (is_available) — не в счёт:
+    # нет общего COUNT(*) по всей выборке
+    assert not any('"__COUNT"' in q["sql"].upper() for q in ctx.captured_queries)
+
+    r = api.get("/api/books/?count=true")
+    assert r.json()["count"] == 12
+
+
+@pytest.mark.django_db
+def test_page_size_is_capped(api, db):
+    author = Author.objects.create(first_name="A", last_name="B")
+    Book.objects.bulk_create(
+        Book(title=f"T{i:03d}", author=author, book_id=f"CAP-{i}") for i in range(120)
+    )
+    r = api.get("/api/books/?page_size=1000")
+    assert len(r.json()["results"]) == 100
+
+
+@pytest.mark.django_db
+def test_invalid_or_foreign_cursor(api, catalog):
+    assert api.get("/api/books/?cursor=garbage").status_code == 404
+    # курсор, выпущенный для другой сортировки, не принимается
+    nxt = api.get("/api/books/?page_size=2").json()["next"]
+    cursor = nxt.split("cursor=")[1].split("&")[0]
+    r = api.get(f"/api/books/?ordering=-pages&cursor={cursor}")
+    assert r.status_code == 404
@@ -0,0 +1,90 @@
+import logging
+import re
+
+import pytest
+from conftest import login_and_get_headers
+
+from library.metrics import registry
+from library.models import Author, Book
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    registry.clear()
+    yield
+    registry.clear()
+
+
+@pytest.fixture
+def books(db):
+    author = Author.objects.create(first_name="Лев", last_name="Толстой")
+    return [
+        Book.objects.create(title=f"Книга {i}", author=author, book_id=f"PF-{i}")
+        for i in range(3)
+    ]
+
+
+def _timing(response):
+    return dict(
+        re.match(r"(\w+);dur=([\d.]+)", part.strip()).groups()
+        for part in response["Server-Timing"].split(",")
+    )
+
+
+@pytest.mark.django_db
+def test_server_timing_header(api, books):
+    r = api.get("/api/books/")
+    assert r.status_code == 200
+    timing = _timing(r)
+    assert set(timing) == {"db", "serialize", "render", "total"}
+    assert float(timing["total"]) >= float(timing["db"])
+    assert re.search(r'db;dur=[\d.]+;desc="\d+ queries"', r["Server-Timing"])
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint(api, books, settings):
+    api.get("/api/books/")
+    api.get(f"/api/books/{books[0].pk}/")
+
+    r = api.get("/metrics")
+    assert r.status_code == 200
+    assert r["Content-Type"].startswith("text/plain; version=0.0.4")
+    body = r.content.decode()
+    assert (
+        'library_http_requests_total{route="book-list",method="GET",status="200"} 1'
+        in body
+    )
+    assert (
+        'library_http_request_duration_seconds_bucket{route="book-detail",'
+        'method="GET",le="+Inf"} 1' in body
+    )
+    assert 'library_db_queries_per_request_count{route="book-list"' in body
+    assert 'library_response_size_bytes_sum{route="book-list"' in body
+
+    settings.METRICS_TOKEN = "secret"
+    assert api.get("/metrics").status_code == 401
+    r = api.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+    assert r.status_code == 200
+
+
+@pytest.mark.django_db
+def test_query_budget_logs_sql(api, user, books, settings, caplog):
+    headers = login_and_get_headers(api, "user1", "Pass123456!")
+    settings.PERF_QUERY_BUDGET = 1
+    with caplog.at_level(logging.WARNING, logger="library.perf"):
+        api.get("/api/borrows/", **headers)
+    [record] = caplog.records
+    message = record.getMessage()
+    assert "/api/borrows/" in message
+    assert "library_borrow" in message
+
+    body = api.get("/metrics").content.decode()
+    assert 'library_query_budget_exceeded_total{route="borrow-list"' in body
+
+
+@pytest.mark.django_db
+def test_instrumentation_can_be_disabled(api, books, settings):
+    settings.PERF_INSTRUMENTATION = False
+    r = api.get("/api/books/")
+    assert r.status_code == 200
+    assert "Server-Timing" not in r
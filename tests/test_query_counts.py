@@ -0,0 +1,213 @@
+import itertools
+from datetime import timedelta
+
+import pytest
+from conftest import login_and_get_headers
+from django.core.cache import cache
+from django.utils import timezone
+
+from library.models import Author, Book, Borrow
+from library.views import AuthorViewSet, BookViewSet, BorrowViewSet
+
+# Число SQL не должно зависеть от объёма данных: меряем на SMALL и LARGE
+# наборах (LARGE заполняет страницу пагинации целиком, PAGE_SIZE=5)
+SMALL, LARGE = 1, 6
+
+_seq = itertools.count()
+
+
+def seed(n, user):
+    """n авторов, у каждого книга на руках у ``user`` и свободная книга."""
+    now = timezone.now()
+    for _ in range(n):
+        i = next(_seq)
+        author = Author.objects.create(first_name=f"Имя{i}", last_name=f"Автор{i}")
+        taken = Book.objects.create(
+            title=f"Выдана {i}", author=author, book_id=f"QB-{i}"
+        )
+        Book.objects.create(title=f"Свободна {i}", author=author, book_id=f"QF-{i}")
+        Borrow.objects.create(book=taken, user=user, due_at=now - timedelta(days=i % 2))
+
+
+def free_book():
+    return Book.objects.filter(borrows__isnull=True).latest("id")
+
+
+def active_borrow():
+    return Borrow.objects.filter(returned_at__isnull=True).latest("id")
+
+
+def new_author():
+    i = next(_seq)
+    return {"first_name": f"Новый{i}", "last_name": f"Автор{i}"}
+
+
+def new_book():
+    i = next(_seq)
+    return {
+        "title": f"Новая {i}",
+        "author": Author.objects.latest("id").pk,
+        "book_id": f"QN-{i}",
+    }
+
+
+def new_borrow():
+    due = timezone.now() + timedelta(days=14)
+    return {"book": free_book().pk, "due_at": due.isoformat()}
+
+
+def new_borrow_batch():
+    # 1 книга на SMALL, 3 на LARGE: число SQL не должно зависеть и от размера пакета
+    books = Book.objects.filter(borrows__isnull=True).order_by("-id")[:3]
+    due = timezone.now() + timedelta(days=14)
+    return {"books": [b.pk for b in books], "due_at": due.isoformat()}
+
+
+def return_borrow_batch():
+    active = Borrow.objects.filter(returned_at__isnull=True).order_by("-id")[:3]
+    return {"borrows": [b.pk for b in active]}
+
+
+# (роль, метод, URL, тело, бюджет SQL); URL и тело — функции, считаются
+# до замера. В бюджете нет проверки токена: версия уже в LRU.
+ENDPOINTS = {
+    "author-list": ("user", "get", lambda: "/api/authors/", None, 1),
+    "author-detail": (
+        "user",
+        "get",
+        lambda: f"/api/authors/{Author.objects.latest('id').pk}/",
+        None,
+        1,
+    ),
+    # INSERT автора и события журнала изменений
+    "author-create": ("staff", "post", lambda: "/api/authors/", new_author, 2),
+    "book-list": ("user", "get", lambda: "/api/books/", None, 1),
+    "book-list-expand": ("user", "get", lambda: "/api/books/?expand=author", None, 1),
+    "book-list-staff": ("staff", "get", lambda: "/api/books/", None, 1),
+    "book-detail": (
+        "user",
+        "get",
+        lambda: f"/api/books/{free_book().pk}/?expand=author",
+        None,
+        1,
+    ),
+    # выборка автора, 2x проверка book_id (валидатор поля + UniqueValidator),
+    # INSERT книги, события журнала и первого экземпляра, доступность для ответа
+    "book-create": ("staff", "post", lambda: "/api/books/", new_book, 7),
+    "borrow-list": ("user", "get", lambda: "/api/borrows/", None, 1),
+    "borrow-list-staff": ("staff", "get", lambda: "/api/borrows/", None, 1),
+    "borrow-overdue": ("user", "get", lambda: "/api/borrows/overdue/", None, 1),
+    "borrow-detail": (
+        "user",
+        "get",
+        lambda: f"/api/borrows/{active_borrow().pk}/",
+        None,
+        1,
+    ),
+    "borrow-detail-staff": (
+        "staff",
+        "get",
+        lambda: f"/api/borrows/{active_borrow().pk}/",
+        None,
+        1,
+    ),
+    "me": ("user", "get", lambda: "/api/auth/me/", None, 1),
+    # страница + счётчики по статусам
+    "me-borrows": ("user", "get", lambda: "/api/auth/me/borrows/", None, 2),
+    # валидация + services.checkout: проверка очереди брони, свободный
+    # экземпляр (SKIP LOCKED), перепроверка очереди, SAVEPOINT'ы, событие
+    # журнала; после коммита — счётчик книги, два upsert'а статистики
+    "borrow-create": ("staff", "post", lambda: "/api/borrows/", new_borrow, 14),
+    # + блокировка книги, счётчик/указатель книги, автор/жанр,
+    # два upsert'а статистики, событие журнала, проверка очереди брони
+    "borrow-return": (
+        "staff",
+        "post",
+        lambda: f"/api/borrows/{active_borrow().pk}/return_book/",
+        None,
+        12,
+    ),
+    # книги, очередь брони, первые свободные экземпляры и перепроверка
+    # очереди (в точке сохранения), bulk_create, события журнала; после
+    # коммита — UPDATE счётчиков книг, два upsert'а статистики — на любой
+    # размер пакета
+    "borrow-batch": (
+        "staff",
+        "post",
+        lambda: "/api/borrows/batch/",
+        new_borrow_batch,
+        15,
+    ),
+    # блокировки книг и выдач, UPDATE выдач, UPDATE книг, статистика,
+    # события журнала, очередь
+    "borrow-return-batch": (
+        "staff",
+        "post",
+        lambda: "/api/borrows/return_batch/",
+        return_borrow_batch,
+        10,
+    ),
+}
+
+
+@pytest.fixture(params=[True, False], ids=["fast", "serializer"])
+def fast_read(request, monkeypatch):
+    # list через .values() и через обычный сериализатор — оба пути
+    for viewset in (AuthorViewSet, BookViewSet, BorrowViewSet):
+        monkeypatch.setattr(viewset, "fast_read", request.param)
+    return request.param
+
+
+@pytest.fixture
+def clients(api, user, staff):
+    headers = {
+        "user": login_and_get_headers(api, "user1", "Pass123456!"),
+        "staff": login_and_get_headers(api, "librarian", "Pass123456!"),
+    }
+    for role_headers in headers.values():
+        # версия токена попадает в LRU до замеров
+        assert api.get("/api/borrows/", **role_headers).status_code == 200
+    return headers
+
+
+def run(api, headers, query_budget, method, url, data, budget):
+    url, data = url(), data() if data else None
+    # замеряем без кэша каталога — иначе list/detail вообще без SQL
+    cache.clear()
+    with query_budget(budget) as queries:
+        r = getattr(api, method)(url, data, format="json", **headers)
+    assert r.status_code in (200, 201), r.content
+    return len(queries)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("name", ENDPOINTS)
+def test_queries_do_not_grow_with_data(
+    name, api, user, clients, fast_read, query_budget
+):
+    role, method, url, data, budget = ENDPOINTS[name]
+    headers = clients[role]
+
+    seed(SMALL, user)
+    small = run(api, headers, query_budget, method, url, data, budget)
+    seed(LARGE - SMALL, user)
+    large = run(api, headers, query_budget, method, url, data, budget)
+    assert small == large
+
+
+@pytest.mark.django_db
+def test_suite_catches_missing_select_related(
+    api, user, clients, monkeypatch, query_budget
+):
+    # без select_related("author") ?expand=author даёт N+1 — тест должен это видеть
+    monkeypatch.setattr(BookViewSet, "fast_read", False)
+    monkeypatch.setattr(BookViewSet, "queryset", Book.objects.order_by("title"))
+
+    def url():
+        return "/api/books/?expand=author"
+
+    seed(SMALL, user)
+    small = run(api, clients["user"], query_budget, "get", url, None, None)
+    seed(LARGE - SMALL, user)
+    large = run(api, clients["user"], query_budget, "get", url, None, None)
+    assert large > small
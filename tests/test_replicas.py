@@ -0,0 +1,141 @@
+import io
+import time
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync
+from conftest import login_and_get_headers
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncClient
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+import library.urls
+from library.async_views import catalog_urlpatterns
+from library.models import Author, Book
+from library.replicas import (
+    PIN_COOKIE,
+    PIN_HEADER,
+    ReplicaRouter,
+    pin_value,
+    replica_reads,
+)
+from library.services import checkout
+from library.views import BookViewSet
+
+# «реплика» — отдельная пустая БД: что прочитано с неё, того в ответе нет
+pytestmark = pytest.mark.django_db(databases=["default", "replica"])
+
+urlpatterns = [
+    path("api/", include(catalog_urlpatterns() + library.urls.urlpatterns)),
+]
+
+
+@pytest.fixture
+def book(settings):
+    settings.DATABASE_REPLICAS = ["replica"]
+    author = Author.objects.create(first_name="Иван", last_name="Гончаров")
+    book = Book.objects.create(title="Обломов", author=author, book_id="OB-1")
+    # окно после записи прошло — реплики догнали
+    cache.clear()
+    return book
+
+
+def test_catalog_reads_go_to_replica(api, book):
+    assert api.get("/api/books/").json()["results"] == []
+    assert api.get("/api/authors/").json()["results"] == []
+    assert api.get(f"/api/books/{book.pk}/").status_code == 404
+    assert Book.objects.filter(pk=book.pk).exists()
+
+
+def test_writer_reads_own_writes(api, staff, book):
+    headers = login_and_get_headers(api, "librarian", "Pass123456!")
+    r = api.post(
+        "/api/books/",
+        {"title": "Обрыв", "author": book.author_id, "book_id": "OB-2"},
+        **headers,
+    )
+    assert r.status_code == 201, r.content
+    pin = r[PIN_HEADER]
+    assert api.cookies[PIN_COOKIE].value == pin
+    url = f"/api/books/{r.json()['id']}/"
+    assert api.get(url, **headers).status_code == 200
+    # каталог только что изменился: и чужой ответ не закэширует старую копию
+    assert APIClient().get(url).status_code == 200
+
+    cache.clear()
+    api.cookies.clear()
+    assert api.get(url, **headers).status_code == 404
+    # клиент без cookie возвращает заголовок из ответа на запись
+    assert api.get(url, HTTP_X_DB_PIN=pin, **headers).status_code == 200
+    # ответ выше закэширован — сбрасываем, чтобы чтение дошло до БД
+    cache.clear()
+    forged = f"{time.time() + 3600:.3f}"
+    assert api.get(url, HTTP_X_DB_PIN=forged, **headers).status_code == 404
+
+
+def test_loans_on_primary_stats_and_export_on_replica(api, staff, book):
+    borrow = checkout(book, staff, timezone.now() + timedelta(days=7))
+    headers = login_and_get_headers(api, "librarian", "Pass123456!")
+    cache.clear()
+    api.cookies.clear()
+
+    r = api.get("/api/borrows/", **headers)
+    assert [row["id"] for row in r.json()["results"]] == [borrow.pk]
+
+    r = api.get("/api/stats/books/?period=all", **headers)
+    assert r.json()["results"] == []
+    r = api.get("/api/stats/books/?period=all", HTTP_X_DB_PIN=pin_value(), **headers)
+    assert [row["book"]["book_id"] for row in r.json()["results"]] == ["OB-1"]
+
+    r = api.get("/api/books/export/?format=jsonl", **headers)
+    assert b"".join(r.streaming_content) == b""
+    out = io.StringIO()
+    call_command("export_catalog", stdout=out)
+    assert out.getvalue() == ""
+    call_command("export_catalog", "--database", "default", stdout=out)
+    assert "OB-1" in out.getvalue()
+
+
+def test_checkouts_do_not_send_catalog_reads_to_primary(api, staff, book, settings):
+    settings.DB_PIN_SECONDS = 5
+    checkout(book, staff, timezone.now() + timedelta(days=7))
+    # выдача — не запись в каталог: аноним по-прежнему читает с реплики
+    assert api.get("/api/books/").json()["results"] == []
+    assert api.get(f"/api/books/{book.pk}/").status_code == 404
+
+    # ...но прочитанное с реплики сразу после выдачи в кэше живёт недолго
+    view = BookViewSet()
+    view.read_alias = "replica"
+    assert view.get_cache_timeout() == 5
+    cache.clear()
+    assert view.get_cache_timeout() == settings.CATALOG_CACHE_TIMEOUT
+    view.read_alias = None
+    assert view.get_cache_timeout() == settings.CATALOG_CACHE_TIMEOUT
+
+
+def test_async_catalog_reads_follow_pin(settings, book):
+    settings.ROOT_URLCONF = __name__
+    client = AsyncClient()
+    url = f"/api/books/{book.pk}/"
+    assert async_to_sync(client.get)(url).status_code == 404
+    r = async_to_sync(client.get)(url, headers={PIN_HEADER: pin_value()})
+    assert r.status_code == 200
+    assert r.json()["book_id"] == "OB-1"
+
+
+def test_router(book):
+    router = ReplicaRouter()
+    assert router.db_for_read(Book) is None
+    with replica_reads("replica"):
+        assert router.db_for_read(Book) == "replica"
+        assert router.db_for_write(Book) == "default"
+        assert not Book.objects.exists()
+        # запись из «читающего» блока всё равно уходит на основную
+        Author.objects.create(first_name="Пётр", last_name="Чаадаев")
+    assert Author.objects.count() == 2
+    on_replica = Author(first_name="Иван", last_name="Гончаров")
+    on_replica._state.db = "replica"
+    assert router.allow_relation(book, on_replica)
@@ -0,0 +1,203 @@
+from datetime import timedelta
+
+import pytest
+from conftest import login_and_get_headers
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+
+from library.models import Author, Book, Borrow, Reservation
+from library.services import add_copy
+
+User = get_user_model()
+
+
+@pytest.fixture
+def book(db):
+    author = Author.objects.create(first_name="Фёдор", last_name="Достоевский")
+    return Book.objects.create(title="Идиот", author=author, book_id="RS-1")
+
+
+@pytest.fixture
+def readers(db):
+    return [
+        User.objects.create_user(username=f"reader{i}", password="Pass123456!")
+        for i in range(3)
+    ]
+
+
+def _headers(api, username):
+    return login_and_get_headers(api, username, "Pass123456!")
+
+
+def _due():
+    return (timezone.now() + timedelta(days=7)).isoformat()
+
+
+def _lend(api, staff_headers, book, user):
+    r = api.post(
+        f"/api/borrows/?target_user={user.pk}",
+        {"book": book.pk, "due_at": _due()},
+        **staff_headers,
+    )
+    return r
+
+
+@pytest.mark.django_db
+def test_queue_is_fifo_and_return_promotes_head(api, staff, user, book, readers):
+    staff_headers = _headers(api, "librarian")
+    assert _lend(api, staff_headers, book, user).status_code == 201
+    borrow = Borrow.objects.get(book=book)
+
+    ids = []
+    for reader in readers:
+        r = api.post(f"/api/books/{book.pk}/reserve/", **_headers(api, reader.username))
+        assert r.status_code == 201, r.content
+        assert r.json()["status"] == "waiting"
+        ids.append(r.json()["id"])
+    assert r.json()["position"] == 3
+
+    r = api.get("/api/reservations/", **staff_headers)
+    positions = {row["id"]: row["position"] for row in r.json()["results"]}
+    assert [positions[i] for i in ids] == [1, 2, 3]
+
+    r = api.post(f"/api/borrows/{borrow.pk}/return_book/", **staff_headers)
+    assert r.status_code == 200
+    first = Reservation.objects.get(pk=ids[0])
+    assert first.status == Reservation.Status.READY
+    assert first.ready_until > timezone.now() + timedelta(hours=71)
+
+    # очередь сдвинулась
+    r = api.get("/api/reservations/", **_headers(api, "reader2"))
+    assert [row["position"] for row in r.json()["results"]] == [2]
+
+    # отложенную книгу не выдать другому, а получателю — можно
+    r = _lend(api, staff_headers, book, readers[1])
+    assert r.status_code == 409
+    assert "другого читателя" in r.json()["detail"]
+    r = _lend(api, staff_headers, book, readers[0])
+    assert r.status_code == 201
+    first.refresh_from_db()
+    assert first.status == Reservation.Status.FULFILLED
+
+
+@pytest.mark.django_db
+def test_position_shifts_when_someone_leaves_the_queue(
+    api, staff, user, book, readers, django_assert_num_queries
+):
+    staff_headers = _headers(api, "librarian")
+    _lend(api, staff_headers, book, user)
+    more = [
+        User.objects.create_user(username=f"late{i}", password="Pass123456!")
+        for i in range(2)
+    ]
+    for reader in readers + more:
+        api.post(f"/api/books/{book.pk}/reserve/", **_headers(api, reader.username))
+
+    def positions():
+        return dict(
+            Reservation.objects.filter(status="waiting").values_list(
+                "user__username", "position"
+            )
+        )
+
+    # из середины очереди
+    api.delete(f"/api/books/{book.pk}/reserve/", **_headers(api, "reader1"))
+    assert positions() == {"reader0": 1, "reader2": 2, "late0": 3, "late1": 4}
+
+    # два новых экземпляра — две головы очереди уходят в ready
+    for n in (2, 3):
+        add_copy(book, f"RS-1-{n}")
+    assert positions() == {"late0": 1, "late1": 2}
+    api.delete(f"/api/books/{book.pk}/reserve/", **_headers(api, "late0"))
+    assert positions() == {"late1": 1}
+
+    # место в очереди — поле строки, без подзапроса на каждую бронь
+    with django_assert_num_queries(1):
+        r = api.get("/api/reservations/?status=waiting", **staff_headers)
+    assert [row["position"] for row in r.json()["results"]] == [1]
+
+
+@pytest.mark.django_db
+def test_free_book_is_held_immediately(api, staff, user, book):
+    headers = _headers(api, "user1")
+    r = api.post(f"/api/books/{book.pk}/reserve/", **headers)
+    assert r.status_code == 201
+    assert r.json()["status"] == "ready"
+    assert r.json()["position"] is None
+
+    assert api.post(f"/api/books/{book.pk}/reserve/", **headers).status_code == 409
+    r = _lend(api, _headers(api, "librarian"), book, staff)
+    assert r.status_code == 409
+
+
+@pytest.mark.django_db
+def test_cancel_ready_hold_passes_book_on(api, staff, user, book, readers):
+    assert (
+        api.post(f"/api/books/{book.pk}/reserve/", **_headers(api, "reader0")).json()[
+            "status"
+        ]
+        == "ready"
+    )
+    api.post(f"/api/books/{book.pk}/reserve/", **_headers(api, "reader1"))
+
+    headers = _headers(api, "reader0")
+    assert api.delete(f"/api/books/{book.pk}/reserve/", **headers).status_code == 204
+    assert api.delete(f"/api/books/{book.pk}/reserve/", **headers).status_code == 404
+    statuses = dict(Reservation.objects.values_list("user__username", "status"))
+    assert statuses == {"reader0": "cancelled", "reader1": "ready"}
+    book.refresh_from_db()
+    assert book.available_copies == 0
+    api.delete(f"/api/books/{book.pk}/reserve/", **_headers(api, "reader1"))
+    book.refresh_from_db()
+    assert book.available_copies == 1
+
+
+@pytest.mark.django_db
+def test_expired_hold_moves_to_next(api, staff, book, readers):
+    for reader in readers[:2]:
+        api.post(f"/api/books/{book.pk}/reserve/", **_headers(api, reader.username))
+    Reservation.objects.filter(status="ready").update(
+        ready_until=timezone.now() - timedelta(minutes=1)
+    )
+
+    call_command("expire_reservations")
+    statuses = dict(Reservation.objects.values_list("user__username", "status"))
+    assert statuses == {"reader0": "expired", "reader1": "ready"}
+
+    # без команды бронь истекает при попытке выдачи
+    Reservation.objects.filter(status="ready").update(
+        ready_until=timezone.now() - timedelta(minutes=1)
+    )
+    r = _lend(api, _headers(api, "librarian"), book, readers[2])
+    assert r.status_code == 201
+    assert Reservation.objects.filter(status="expired").count() == 2
+    book.refresh_from_db()
+    assert book.available_copies == 0
+    api.post(
+        f"/api/borrows/{r.json()['id']}/return_book/", **_headers(api, "librarian")
+    )
+    book.refresh_from_db()
+    assert book.available_copies == 1
+
+
+@pytest.mark.django_db
+def test_reservation_visibility_and_validation(api, staff, user, book, readers):
+    api.post(f"/api/books/{book.pk}/reserve/", **_headers(api, "reader0"))
+    api.post(f"/api/books/{book.pk}/reserve/", **_headers(api, "reader1"))
+
+    r = api.get("/api/reservations/", **_headers(api, "user1"))
+    assert r.json()["results"] == []
+    r = api.get("/api/reservations/?status=waiting", **_headers(api, "librarian"))
+    assert [row["user"] for row in r.json()["results"]] == [readers[1].pk]
+    assert (
+        api.get(
+            "/api/reservations/?status=lost", **_headers(api, "librarian")
+        ).status_code
+        == 400
+    )
+    assert api.post(f"/api/books/{book.pk}/reserve/").status_code == 401
+    # на руках у пользователя — бронировать незачем
+    assert _lend(api, _headers(api, "librarian"), book, readers[0]).status_code == 201
+    r = api.post(f"/api/books/{book.pk}/reserve/", **_headers(api, "reader0"))
+    assert r.status_code == 409
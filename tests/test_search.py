@@ -0,0 +1,72 @@
+import pytest
+from django.db import connection
+
+from library.models import Author, Book
+
+
+@pytest.fixture
+def books(db):
+    tolstoy = Author.objects.create(first_name="Лев", last_name="Толстой")
+    orwell = Author.objects.create(first_name="George", last_name="Orwell")
+    Book.objects.create(
+        title="Война и мир",
+        author=tolstoy,
+        book_id="WAR-001",
+        genre="роман",
+        description="Эпопея о войне 1812 года",
+    )
+    Book.objects.create(
+        title="Анна Каренина", author=tolstoy, book_id="ANNA-002", genre="роман"
+    )
+    Book.objects.create(
+        title="Nineteen Eighty-Four",
+        author=orwell,
+        book_id="ORW-1984",
+        genre="dystopia",
+        description="Big Brother is watching the war",
+    )
+    return tolstoy, orwell
+
+
+def _titles(api, url):
+    r = api.get(url)
+    assert r.status_code == 200, r.content
+    return [b["title"] for b in r.json()["results"]]
+
+
+@pytest.mark.django_db
+def test_search_by_author_name(api, books):
+    assert set(_titles(api, "/api/books/?q=Толстой")) == {
+        "Война и мир",
+        "Анна Каренина",
+    }
+
+
+@pytest.mark.django_db
+def test_search_by_book_id_prefix(api, books):
+    assert _titles(api, "/api/books/?q=ORW") == ["Nineteen Eighty-Four"]
+
+
+@pytest.mark.django_db
+def test_search_combines_with_filters(api, books):
+    tolstoy, _ = books
+    titles = _titles(api, f"/api/books/?q=роман&author={tolstoy.id}")
+    assert set(titles) == {"Война и мир", "Анна Каренина"}
+    assert _titles(api, "/api/books/?q=nothing-like-this") == []
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="ранжирование только на PostgreSQL"
+)
+def test_search_ranks_title_above_description(api, books):
+    # «war» в названии весит больше, чем в описании; стемминг: wars -> war
+    Book.objects.create(
+        title="The War of the Worlds",
+        author=books[1],
+        book_id="WOW-1",
+        description="Martians",
+    )
+    titles = _titles(api, "/api/books/?q=wars")
+    assert titles[0] == "The War of the Worlds"
+    assert "Nineteen Eighty-Four" in titles
@@ -0,0 +1,84 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import Count, F
+
+from library.models import Author, Book, Borrow
+from library.seeding import parse_count
+
+
+def test_parse_count():
+    assert parse_count("100k") == 100_000
+    assert parse_count("2M") == 2_000_000
+    assert parse_count("1.5k") == 1500
+    assert parse_count("5_000") == 5000
+
+
+def _snapshot():
+    return {
+        "authors": list(
+            Author.objects.order_by("id").values_list(
+                "first_name", "last_name", "birth_year"
+            )
+        ),
+        "books": list(
+            Book.objects.order_by("id").values_list(
+                "book_id", "title", "author__last_name", "genre", "pages"
+            )
+        ),
+        # даты отсчитываются от текущего момента — сравниваем без них
+        "borrows": list(
+            Borrow.objects.order_by("id").values_list("book__book_id", "user__username")
+        ),
+        "active": sorted(
+            Borrow.objects.filter(returned_at__isnull=True).values_list(
+                "book__book_id", flat=True
+            )
+        ),
+    }
+
+
+def _seed():
+    # строками, как из CLI: проверяем и суффиксы k/M
+    call_command(
+        "seed_catalog",
+        "--authors=50",
+        "--books=200",
+        "--borrows=1k",
+        "--users=20",
+        "--batch-size=64",
+        "--seed=7",
+    )
+
+
+@pytest.mark.django_db
+def test_seed_catalog_counts_and_consistency():
+    _seed()
+    assert Author.objects.count() == 50
+    assert Book.objects.count() == 200
+    assert Borrow.objects.count() == 1000
+
+    active = Borrow.objects.filter(returned_at__isnull=True)
+    assert active.count() == 50
+    # не больше одной активной выдачи на книгу, указатель на неё проставлен
+    assert not active.values("book").annotate(n=Count("id")).filter(n__gt=1)
+    assert Book.objects.filter(active_borrow__isnull=False).count() == 50
+    assert not Book.objects.exclude(active_borrow=None).exclude(
+        active_borrow__book_id=F("pk")
+    )
+
+    with pytest.raises(CommandError):
+        _seed()
+
+
+@pytest.mark.django_db
+def test_seed_catalog_is_deterministic():
+    _seed()
+    first = _snapshot()
+    Borrow.objects.all().delete()
+    Book.objects.all().delete()
+    Author.objects.all().delete()
+    get_user_model().objects.filter(username__startswith="reader").delete()
+
+    _seed()
+    assert _snapshot() == first
@@ -0,0 +1,97 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from library.models import Author, Book
+from library.views import BookViewSet
+
+
+@pytest.fixture
+def books(db):
+    author = Author.objects.create(
+        first_name="Лев", last_name="Толстой", birth_year=1828
+    )
+    for i in range(3):
+        Book.objects.create(
+            title=f"Том {i}",
+            author=author,
+            book_id=f"SP-{i}",
+            published_year=1860 + i,
+            description="очень длинное описание " * 50,
+        )
+    return author
+
+
+@pytest.fixture(params=[True, False], ids=["fast", "serializer"])
+def read_path(request, monkeypatch):
+    monkeypatch.setattr(BookViewSet, "fast_read", request.param)
+
+
+@pytest.mark.django_db
+def test_fields_limit_json_and_select(api, books, read_path):
+    with CaptureQueriesContext(connection) as ctx:
+        r = api.get("/api/books/?fields=id,title,author")
+    assert r.status_code == 200
+    assert all(set(b) == {"id", "title", "author"} for b in r.json()["results"])
+    assert r.json()["results"][0]["author"] == books.id
+    assert len(ctx.captured_queries) == 1
+    sql = ctx.captured_queries[0]["sql"]
+    assert "description" not in sql and "library_author" not in sql
+
+
+@pytest.mark.django_db
+def test_expand_author_inline(api, books, read_path):
+    with CaptureQueriesContext(connection) as ctx:
+        r = api.get("/api/books/?expand=author")
+    assert len(ctx.captured_queries) == 1
+    assert r.json()["results"][0]["author"] == {
+        "id": books.id,
+        "first_name": "Лев",
+        "last_name": "Толстой",
+        "birth_year": 1828,
+    }
+
+    r = api.get("/api/books/?fields=title,author&expand=author")
+    first = r.json()["results"][0]
+    assert set(first) == {"title", "author"}
+    assert first["author"]["last_name"] == "Толстой"
+
+
+@pytest.mark.django_db
+def test_fast_and_serializer_paths_agree(api, books, monkeypatch):
+    url = "/api/books/?fields=id,author,published_year&expand=author"
+    fast = api.get(url).content
+    cache.clear()
+    monkeypatch.setattr(BookViewSet, "fast_read", False)
+    assert api.get(url).content == fast
+
+
+@pytest.mark.django_db
+def test_sparse_detail_and_cursor_ordering(api, books, read_path):
+    book = Book.objects.first()
+    r = api.get(f"/api/books/{book.id}/?fields=title")
+    assert r.json() == {"title": book.title}
+
+    # поле сортировки не запрошено, но курсор строится без лишних запросов
+    url = "/api/books/?fields=id&ordering=-published_year&page_size=2"
+    with CaptureQueriesContext(connection) as ctx:
+        first = api.get(url).json()
+    assert len(ctx.captured_queries) == 1
+    second = api.get(first["next"]).json()
+    ids = [b["id"] for b in first["results"] + second["results"]]
+    assert ids == list(
+        Book.objects.order_by("-published_year").values_list("id", flat=True)
+    )
+
+
+@pytest.mark.django_db
+def test_fields_param_ignored_on_write(api, staff, books):
+    api.force_authenticate(staff)
+    r = api.post(
+        "/api/books/?fields=id",
+        {"title": "Новая", "author": books.id, "book_id": "SP-NEW"},
+        format="json",
+    )
+    assert r.status_code == 201
+    assert r.json()["book_id"] == "SP-NEW"
@@ -0,0 +1,132 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from library.metrics import registry
+from library.models import Author, Book, Task
+from library.reservations import reserve
+from library.services import checkout, return_borrow
+from library.taskqueue import Worker, claim, enqueue, execute, task
+from library.tasks import send_welcome_email
+
+calls = []
+
+
+@task(max_attempts=2)
+def remember(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise RuntimeError("сломалось")
+
+
+@pytest.fixture
+def queued(settings):
+    # как в продакшене: задачи в таблицу, выполняет воркер
+    settings.TASKS_EAGER = False
+    settings.TASKS_RETRY_BASE = 10
+    calls.clear()
+    return settings
+
+
+@pytest.mark.django_db
+def test_worker_runs_and_deletes_done_tasks(queued, capsys):
+    for value in ("a", "b", "c"):
+        enqueue(remember, value)
+    later = enqueue(remember, "d", run_after=timezone.now() + timedelta(hours=1))
+
+    call_command("run_worker", "--burst", "--batch-size", "2")
+    assert calls == ["a", "b", "c"]
+    # выполненные удалены, отложенная ждёт своего времени
+    assert list(Task.objects.values_list("pk", flat=True)) == [later.pk]
+    assert "выполнено 3" in capsys.readouterr().err
+    assert (
+        'library_tasks_total{task="test_tasks.remember",outcome="done"}'
+        in registry.render()
+    )
+
+
+@pytest.mark.django_db
+def test_retry_with_backoff_then_failed(queued):
+    t = enqueue(explode)
+    [claimed] = claim(10)
+    assert execute(claimed) == "retry"
+    t.refresh_from_db()
+    assert (t.status, t.attempts) == ("queued", 1)
+    assert "сломалось" in t.last_error
+    delay = t.run_after - timezone.now()
+    assert timedelta(seconds=8) < delay <= timedelta(seconds=10)
+    # до конца паузы воркер задачу не видит
+    assert claim(10) == []
+
+    [claimed] = claim(10, now=t.run_after)
+    assert execute(claimed) == "failed"
+    t.refresh_from_db()
+    assert (t.status, t.attempts) == ("failed", 2)
+    assert t.finished_at is not None
+    assert claim(10, now=timezone.now() + timedelta(days=1)) == []
+
+
+@pytest.mark.django_db
+def test_expired_lease_is_claimed_again(queued):
+    t = enqueue(remember, "x")
+    assert [c.pk for c in claim(10)] == [t.pk]
+    # воркер умер: пока аренда не истекла — задача занята
+    assert claim(10) == []
+    t.refresh_from_db()
+    [again] = claim(10, now=t.run_after)
+    assert again.attempts == 2
+    assert execute(again) == "done"
+    assert calls == ["x"]
+
+
+@pytest.mark.django_db
+def test_enqueue_is_part_of_transaction(queued):
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            enqueue(remember, "lost")
+            raise RuntimeError
+    assert not Task.objects.exists()
+    assert Worker().run(burst=True) == {"done": 0, "retry": 0, "failed": 0}
+
+
+@pytest.mark.django_db
+def test_register_enqueues_welcome_email(api, queued, mailoutbox):
+    r = api.post(
+        "/api/auth/register/",
+        {
+            "username": "reader",
+            "email": "reader@example.com",
+            "password": "Pass123456!",
+            "password2": "Pass123456!",
+        },
+        format="json",
+    )
+    assert r.status_code == 201, r.content
+    # ответ не ждал SMTP
+    assert mailoutbox == []
+    assert Task.objects.get().name == send_welcome_email.task_name
+
+    Worker().run(burst=True)
+    assert [m.to for m in mailoutbox] == [["reader@example.com"]]
+
+
+@pytest.mark.django_db
+def test_hold_ready_notifies_reader(user, staff, mailoutbox):
+    # TASKS_EAGER в тестах: задача выполняется сразу
+    user.email = "user1@example.com"
+    user.save()
+    author = Author.objects.create(first_name="Антон", last_name="Чехов")
+    book = Book.objects.create(title="Чайка", author=author, book_id="CH-1")
+    borrow = checkout(book, staff, timezone.now() + timedelta(days=7))
+    reserve(book, user)
+    assert mailoutbox == []
+
+    return_borrow(borrow.pk)
+    assert [m.to for m in mailoutbox] == [["user1@example.com"]]
+    assert "Чайка" in mailoutbox[0].body
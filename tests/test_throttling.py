@@ -0,0 +1,79 @@
+import time
+
+import pytest
+from conftest import login_and_get_headers
+
+RATES = {
+    "anon": "3/min",
+    "user": "5/min",
+    "staff": "100/min",
+    "login": "2/min",
+    "register": "1/hour",
+}
+
+
+@pytest.fixture
+def rates(settings):
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": RATES,
+    }
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr("library.throttling.time.time", lambda: now[0])
+    return now
+
+
+@pytest.mark.django_db
+def test_anon_bucket_headers_and_refill(api, rates, clock):
+    remaining = []
+    for _ in range(3):
+        r = api.get("/api/books/")
+        assert r.status_code == 200
+        assert r["RateLimit-Limit"] == "3"
+        assert r["RateLimit-Policy"] == "3;w=60"
+        remaining.append(int(r["RateLimit-Remaining"]))
+    assert remaining == [2, 1, 0]
+
+    r = api.get("/api/books/")
+    assert r.status_code == 429
+    assert r["RateLimit-Remaining"] == "0"
+    assert int(r["Retry-After"]) == 20  # 1 токен из 3 в минуту
+
+    # через 20 секунд в бакете снова один токен
+    clock[0] += 20
+    assert api.get("/api/books/").status_code == 200
+    assert api.get("/api/books/").status_code == 429
+
+
+@pytest.mark.django_db
+def test_login_and_register_have_own_limits(api, user, rates, clock):
+    payload = {"username": "user1", "password": "wrong"}
+    codes = [
+        api.post("/api/auth/jwt/create/", payload, format="json").status_code
+        for _ in range(3)
+    ]
+    assert codes == [401, 401, 429]
+
+    # общий anon-бакет (3/min) тоже потрачен логинами — ждём минуту
+    clock[0] += 60
+    register = {"username": "new", "password": "Pass123456!", "password2": "x"}
+    assert api.post("/api/auth/register/", register).status_code == 400
+    assert api.post("/api/auth/register/", register).status_code == 429
+
+
+@pytest.mark.django_db
+def test_user_and_staff_scopes(api, user, staff, rates, clock):
+    headers = login_and_get_headers(api, "user1", "Pass123456!")
+    staff_headers = login_and_get_headers(api, "librarian", "Pass123456!")
+
+    codes = [api.get("/api/borrows/", **headers).status_code for _ in range(6)]
+    assert codes == [200] * 5 + [429]
+
+    # лимит у каждого пользователя свой, у staff — больше
+    r = api.get("/api/borrows/", **staff_headers)
+    assert r.status_code == 200
+    assert r["RateLimit-Limit"] == "100"